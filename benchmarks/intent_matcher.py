@@ -0,0 +1,120 @@
+"""
+Microbenchmark: single-pass intent matcher vs the per-intent keyword scans it replaced.
+
+    python -m benchmarks.intent_matcher --iterations 5000 --repeat 15
+
+The routes are timed in interleaved rounds, so drift on a busy host hits
+all of them alike; the median and spread over the rounds are reported.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from toyota_intents import fold, intent_matcher  # noqa: E402
+
+UTTERANCES = [
+    "السلام عليكم، أبي أشوف صورة الكامري لو سمحت",
+    "وين أقرب معرض لتويوتا في الأحمدي؟",
+    "Hello, can you show me a picture of the Land Cruiser?",
+    "أبي أحجز موعد صيانة للبرادو مالتي الأسبوع الجاي إذا ممكن",
+    "Where is the nearest service center and what are the working hours?",
+    "هلا والله، شلونكم؟ عندي سؤال عن سعر الهايلكس",
+    "شكراً، يعطيك العافية",
+    "I want to know more about the Corolla hybrid and its fuel consumption",
+]
+
+
+# The scans ToyotaKuwaitAgent.on_message ran before the matcher existed
+def _is_greeting(text):
+    greetings = ["هلا", "سلام عليكم", "السلام عليكم", "مرحبا", "أهلا"]
+    return any(greeting in text for greeting in greetings)
+
+
+def _is_car_image_request(text):
+    image_keywords = ["أبي أشوف صورة", "صورة السيارة", "شكل السيارة", "show me", "image", "picture"]
+    return any(keyword in text.lower() for keyword in image_keywords)
+
+
+def _is_location_request(text):
+    location_keywords = ["وين", "أقرب معرض", "مركز الخدمة", "موقع", "عنوان", "where", "location", "address"]
+    return any(keyword in text.lower() for keyword in location_keywords)
+
+
+def _extract_car_name(text):
+    car_models = {
+        "كورولا": "Corolla", "كامري": "Camry", "برادو": "Prado", "لاند كروزر": "Land Cruiser",
+        "هايلكس": "Hilux", "ريز": "Raize", "فورتنر": "Fortuner",
+    }
+    for arabic_name, english_name in car_models.items():
+        if arabic_name in text or english_name.lower() in text.lower():
+            return arabic_name
+    return "كامري"
+
+
+def _determine_location_type(text):
+    if "معرض" in text or "showroom" in text.lower():
+        return "showroom"
+    elif "خدمة" in text or "service" in text.lower():
+        return "service"
+    return "showroom"
+
+
+def legacy_route(text):
+    greeting = _is_greeting(text)
+    car_name = _extract_car_name(text) if _is_car_image_request(text) else None
+    location_type = _determine_location_type(text) if _is_location_request(text) else None
+    return greeting, car_name, location_type
+
+
+def matcher_route(text):
+    return intent_matcher.match(text)
+
+
+# The matcher's keywords as one unfactored alternation (longest first), to isolate the trie's share
+_alternation = re.compile("|".join(sorted(map(re.escape, intent_matcher._entries), key=len, reverse=True)))
+
+
+def alternation_scan(text):
+    return _alternation.findall(fold(text))
+
+
+def trie_scan(text):
+    return intent_matcher._pattern.findall(fold(text))
+
+
+ROUTES = (
+    ("legacy scans", legacy_route),
+    ("single pass", matcher_route),
+    ("  trie scan", trie_scan),
+    ("  plain alt.", alternation_scan),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent matcher microbenchmark")
+    parser.add_argument("--iterations", type=int, default=5000, help="passes over the utterance set per round")
+    parser.add_argument("--repeat", type=int, default=15, help="interleaved timing rounds")
+    args = parser.parse_args()
+
+    rounds = {name: [] for name, _ in ROUTES}
+    for _ in range(args.repeat):
+        for name, route in ROUTES:
+            seconds = timeit.timeit(lambda: [route(text) for text in UTTERANCES], number=args.iterations)
+            rounds[name].append(seconds / (args.iterations * len(UTTERANCES)) * 1e6)
+
+    print(f"{len(intent_matcher._entries)} folded keywords, {len(UTTERANCES)} utterances")
+    for name, samples in rounds.items():
+        q1, median, q3 = statistics.quantiles(samples, n=4)
+        print(f"{name:<14}{median:>8.2f} µs per utterance (IQR {q1:.2f}-{q3:.2f})")
+    ratios = [new / old for new, old in zip(rounds["single pass"], rounds["legacy scans"])]
+    print(f"single pass / legacy: {statistics.median(ratios):.2f}x (per-round median)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Concurrent-call load benchmark for the tool layer against local CRM/WhatsApp stand-ins.
+
+Starts the mock servers from benchmarks/mock_servers.py and runs every
+simulated call in a fresh process, as LiveKit runs one job per process: the
+process imports the agent modules and does the prewarm steps the tool layer
+needs (host-shared caches from disk, HTTP pools), then drives one caller
+conversation through the same code the agent uses: the session-start
+prefetch followed by ToyotaTools calls. Nothing in memory carries over from
+one call to the next; the client and media caches carry over through their
+host-shared files, as on a real host (start cold with a fresh --cache-dir).
+Reports throughput, per-step tail latency, per-process bootstrap time and
+peak memory per call process.
+
+    python -m benchmarks.load_benchmark --sessions 200 --concurrency 16 --clients 20000
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_servers import Latency, build_dataset, start_mock_servers  # noqa: E402
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+class StepTimer:
+    """Wall-clock samples per conversation step"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def time(self, step: str, call):
+        started = time.perf_counter()
+        try:
+            result = await call
+        except Exception:
+            self.errors[step] = self.errors.get(step, 0) + 1
+            raise
+        finally:
+            self.samples.setdefault(step, []).append(time.perf_counter() - started)
+        if isinstance(result, dict) and result.get("status") == "error":
+            self.errors[step] = self.errors.get(step, 0) + 1
+        return result
+
+    def merge(self, samples: Dict[str, List[float]], errors: Dict[str, int]):
+        for step, values in samples.items():
+            self.samples.setdefault(step, []).extend(values)
+        for step, count in errors.items():
+            self.errors[step] = self.errors.get(step, 0) + count
+
+    def report(self) -> dict:
+        return {
+            step: {
+                "count": len(samples),
+                "errors": self.errors.get(step, 0),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1),
+            }
+            for step, samples in self.samples.items()
+        }
+
+
+async def run_conversation(phone_number: str, timer: StepTimer, think_time: float):
+    """One simulated call: prefetch at session start, then the usual tool turns"""
+    from toyota_caller_context import prefetch_caller_context
+    from toyota_tools import ToyotaTools
+
+    def context(tool_name: str):
+        return SimpleNamespace(speech_handle=None, function_call=SimpleNamespace(name=tool_name))
+
+    caller = await timer.time("session_prefetch", prefetch_caller_context(phone_number))
+    tools = ToyotaTools(session=None, client_data=caller.summary(), client_phone=phone_number)
+    if not caller.client_id:
+        return
+
+    async def turn(step: str, call):
+        await timer.time(step, call)
+        if think_time:
+            await asyncio.sleep(think_time)
+
+    await turn("get_client_data", tools.get_client_data(context("get_client_data"), phone_number))
+    await turn("get_vehicle_data", tools.get_vehicle_data(context("get_vehicle_data"), caller.client_id))
+    await turn("get_service_tickets", tools.get_service_tickets(context("get_service_tickets"), caller.client_id))
+    await turn("send_car_image", tools.send_car_image(context("send_car_image"), "كامري"))
+    if caller.vehicles:
+        await turn("create_service_ticket", tools.create_service_ticket(
+            context("create_service_ticket"),
+            client_id=caller.client_id,
+            vehicle_id=caller.vehicles[0]["_id"],
+            service_type="صيانة دورية",
+            description="Load test ticket",
+        ))
+
+
+def call_in_job_process(phone_number: str, think_time: float) -> dict:
+    """One call in its own process: import and prewarm, then the conversation"""
+    started = time.perf_counter()
+    from get_client_data_tool import client_directory
+    from toyota_http import aclose_http_clients, init_http_clients
+    from toyota_media import media_cache
+    from toyota_whatsapp import whatsapp_dispatcher
+
+    media_cache.load()
+    client_directory.load()
+    init_http_clients()
+    bootstrap_ms = (time.perf_counter() - started) * 1000
+
+    timer = StepTimer()
+
+    async def _call():
+        try:
+            await timer.time("conversation", run_conversation(phone_number, timer, think_time))
+        except Exception:
+            pass
+        finally:
+            # The call's shutdown: queued WhatsApp sends go out before the process exits
+            await whatsapp_dispatcher.aclose()
+            await aclose_http_clients()
+
+    asyncio.run(_call())
+    return {
+        "samples": timer.samples,
+        "errors": timer.errors,
+        "bootstrap_ms": bootstrap_ms,
+        # KiB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "delivered": whatsapp_dispatcher.delivered,
+        "failed": whatsapp_dispatcher.failed,
+    }
+
+
+def _spread(samples: List[float]) -> dict:
+    return {
+        "p50": round(_percentile(samples, 50), 1),
+        "p95": round(_percentile(samples, 95), 1),
+        "max": round(max(samples), 1) if samples else 0.0,
+    }
+
+
+async def run(args) -> dict:
+    dataset = build_dataset(args.clients, args.vehicles_per_client, args.tickets_per_client)
+    servers = await start_mock_servers(
+        dataset,
+        Latency(args.crm_latency_ms, args.jitter_ms),
+        Latency(args.whatsapp_latency_ms, args.jitter_ms),
+    )
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix="toyota-load-")
+    # Call processes are spawned with this environment; toyota_http and the caches read it at import
+    os.environ["TOYOTA_CRM_BASE_URL"] = servers.crm_url
+    os.environ["WHATSAPP_GRAPH_BASE_URL"] = servers.whatsapp_url
+    os.environ["TOYOTA_CLIENT_CACHE_PATH"] = os.path.join(cache_dir, "client_cache.json")
+    os.environ["WHATSAPP_MEDIA_CACHE_PATH"] = os.path.join(cache_dir, "whatsapp_media_cache.json")
+
+    rng = random.Random(args.seed)
+    phones = [rng.choice(dataset.phones) for _ in range(args.sessions)]
+    loop = asyncio.get_running_loop()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.concurrency,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=1,
+        ) as pool:
+            started = time.perf_counter()
+            calls = await asyncio.gather(*(
+                loop.run_in_executor(pool, call_in_job_process, phone, args.think_ms / 1000)
+                for phone in phones
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        await servers.aclose()
+
+    timer = StepTimer()
+    for call in calls:
+        timer.merge(call["samples"], call["errors"])
+    return {
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "dataset": {
+            "clients": len(dataset.clients),
+            "vehicles": len(dataset.vehicles),
+            "tickets": len(dataset.tickets),
+        },
+        "cache_dir": cache_dir,
+        "bootstrap_ms": _spread([call["bootstrap_ms"] for call in calls]),
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(args.sessions / elapsed, 2),
+        "peak_rss_per_call_mib": _spread([call["peak_rss_kb"] / 1024 for call in calls]),
+        "whatsapp": {
+            "delivered": sum(call["delivered"] for call in calls),
+            "failed": sum(call["failed"] for call in calls),
+        },
+        "steps": timer.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toyota tool-layer load benchmark")
+    parser.add_argument("--sessions", type=int, default=100, help="simulated calls in total")
+    parser.add_argument("--concurrency", type=int, default=8, help="call processes at once")
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--vehicles-per-client", type=int, default=2)
+    parser.add_argument("--tickets-per-client", type=int, default=3)
+    parser.add_argument("--crm-latency-ms", type=float, default=40.0)
+    parser.add_argument("--whatsapp-latency-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between turns")
+    parser.add_argument("--cache-dir", help="host-shared cache files; a fresh (cold) directory by default")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    print(f"\nSessions: {report['sessions']} (concurrency {report['concurrency']}), dataset {report['dataset']}")
+    print(f"Per-call process bootstrap (import + prewarm): {report['bootstrap_ms']} ms")
+    print(f"Throughput: {report['sessions_per_s']} sessions/s over {report['elapsed_s']} s")
+    print(f"Peak memory per call process: {report['peak_rss_per_call_mib']} MiB")
+    print(f"WhatsApp: {report['whatsapp']}\n")
+    print(f"{'step':<24}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, stats in report["steps"].items():
+        print(
+            f"{step:<24}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Local stand-ins for the Toyota CRM API and the WhatsApp Graph API.
+
+Serves /api/clients, /api/vehicles, /api/tickets, /{phone_number_id}/messages
+and /{phone_number_id}/media from a generated dataset with configurable size
+and injected latency, so the tool layer can be load-tested without touching
+production services.
+
+Run standalone to point a local agent at it:
+
+    python -m benchmarks.mock_servers --clients 5000 --latency-ms 40
+    TOYOTA_CRM_BASE_URL=http://127.0.0.1:8081 WHATSAPP_GRAPH_BASE_URL=http://127.0.0.1:8082 \\
+        python toyota_livekit_agent.py dev
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+MODELS = ["Camry", "Corolla", "Land Cruiser", "Prado", "Hilux", "Raize", "Fortuner", "Yaris"]
+COLORS = ["White", "Black", "Silver", "Grey", "Red", "Blue"]
+TICKET_STATUSES = ["pending", "in_progress", "completed", "delivered"]
+
+
+@dataclass
+class Dataset:
+    clients: List[dict] = field(default_factory=list)
+    vehicles: List[dict] = field(default_factory=list)
+    tickets: List[dict] = field(default_factory=list)
+    vehicles_by_client: Dict[str, List[dict]] = field(default_factory=dict)
+
+    @property
+    def phones(self) -> List[str]:
+        return [client["phone"] for client in self.clients]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def build_dataset(
+    clients: int = 1000,
+    vehicles_per_client: int = 2,
+    tickets_per_client: int = 3,
+    seed: int = 7,
+) -> Dataset:
+    """Generate CRM documents shaped like the production API responses"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    dataset = Dataset()
+
+    for index in range(clients):
+        created = now - timedelta(days=rng.randint(1, 900))
+        client = {
+            "_id": uuid.UUID(int=rng.getrandbits(128)).hex[:24],
+            "firstName": f"Client{index}",
+            "lastName": "Test",
+            "email": f"client{index}@example.com",
+            "phone": f"+965{50000000 + index:08d}",
+            "address": "Kuwait City",
+            "communicationPreference": "email",
+            "createdAt": _iso(created),
+            "updatedAt": _iso(created),
+        }
+        dataset.clients.append(client)
+        client_ref = {k: client[k] for k in ("_id", "firstName", "lastName", "phone")}
+
+        owned = []
+        for _ in range(vehicles_per_client):
+            vehicle = {
+                "_id": uuid.UUID(int=rng.getrandbits(128)).hex[:24],
+                "clientId": client_ref,
+                "make": "Toyota",
+                "modelName": rng.choice(MODELS),
+                "year": rng.randint(2015, 2025),
+                "color": rng.choice(COLORS),
+                "licensePlate": f"{rng.randint(1, 99)}/{rng.randint(10000, 99999)}",
+                "VIN": uuid.UUID(int=rng.getrandbits(128)).hex[:17].upper(),
+                "purchaseDate": _iso(created),
+                "lastServiceDate": _iso(now - timedelta(days=rng.randint(1, 365))),
+                "mediaId": {"url": "https://crm-api.trypair.ai/uploads/default_vehicle.jpg"},
+                "updatedAt": _iso(created),
+            }
+            owned.append(vehicle)
+            dataset.vehicles.append(vehicle)
+        dataset.vehicles_by_client[client["_id"]] = owned
+
+        for _ in range(tickets_per_client if owned else 0):
+            opened = now - timedelta(days=rng.randint(0, 400))
+            vehicle = rng.choice(owned)
+            dataset.tickets.append({
+                "_id": uuid.UUID(int=rng.getrandbits(128)).hex[:24],
+                "clientId": client_ref,
+                "vehicleId": {k: vehicle[k] for k in ("_id", "modelName", "licensePlate")},
+                "title": "صيانة دورية",
+                "description": "Regular maintenance",
+                "status": rng.choice(TICKET_STATUSES),
+                "priority": "medium",
+                "createdAt": _iso(opened),
+                "updatedAt": _iso(opened + timedelta(hours=rng.randint(0, 72))),
+                "estimatedCompletionDate": _iso(opened + timedelta(days=2)),
+            })
+
+    return dataset
+
+
+@dataclass
+class Latency:
+    """Injected per-request delay: base plus uniform jitter, in milliseconds"""
+
+    base_ms: float = 30.0
+    jitter_ms: float = 20.0
+
+    async def wait(self):
+        delay = self.base_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+
+def _updated_after(records: List[dict], request: web.Request) -> List[dict]:
+    watermark = request.query.get("updatedAfter")
+    if not watermark:
+        return records
+    return [r for r in records if r.get("updatedAt", "") > watermark]
+
+
+def create_crm_app(dataset: Dataset, latency: Latency) -> web.Application:
+    async def list_clients(request: web.Request):
+        await latency.wait()
+        clients = _updated_after(dataset.clients, request)
+        phone = request.query.get("phone")
+        if phone:
+            clients = [c for c in clients if c.get("phone") == phone]
+        return web.json_response({"success": True, "clients": clients})
+
+    async def create_client(request: web.Request):
+        await latency.wait()
+        body = await request.json()
+        now = _iso(datetime.now(timezone.utc))
+        client = dict(body, _id=uuid.uuid4().hex[:24], createdAt=now, updatedAt=now)
+        dataset.clients.append(client)
+        return web.json_response({"success": True, "client": client}, status=201)
+
+    async def list_vehicles(request: web.Request):
+        await latency.wait()
+        client_id = request.query.get("clientId")
+        if not client_id:
+            return web.json_response({"success": True, "vehicles": dataset.vehicles})
+        vehicles = dataset.vehicles_by_client.get(client_id, [])
+        limit = int(request.query.get("limit", "50"))
+        page = int(request.query.get("page", "1"))
+        pages = max((len(vehicles) + limit - 1) // limit, 1)
+        return web.json_response({
+            "success": True,
+            "vehicles": vehicles[(page - 1) * limit:page * limit],
+            "pagination": {"page": page, "pages": pages, "total": len(vehicles)},
+        })
+
+    async def list_tickets(request: web.Request):
+        await latency.wait()
+        tickets = _updated_after(dataset.tickets, request)
+        client_id = request.query.get("clientId")
+        if client_id:
+            tickets = [t for t in tickets if t["clientId"]["_id"] == client_id]
+        return web.json_response({"success": True, "tickets": tickets})
+
+    async def create_ticket(request: web.Request):
+        await latency.wait()
+        body = await request.json()
+        now = _iso(datetime.now(timezone.utc))
+        ticket = dict(body, _id=uuid.uuid4().hex[:24], createdAt=now, updatedAt=now)
+        dataset.tickets.append(ticket)
+        return web.json_response({"success": True, "ticket": ticket}, status=201)
+
+    app = web.Application()
+    app.router.add_get("/api/clients", list_clients)
+    app.router.add_post("/api/clients", create_client)
+    app.router.add_get("/api/vehicles", list_vehicles)
+    app.router.add_get("/api/tickets", list_tickets)
+    app.router.add_post("/api/tickets", create_ticket)
+    return app
+
+
+def create_whatsapp_app(latency: Latency) -> web.Application:
+    sent = {"count": 0, "uploads": 0}
+
+    async def send_message(request: web.Request):
+        await latency.wait()
+        body = await request.json()
+        sent["count"] += 1
+        return web.json_response({
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": body.get("to"), "wa_id": str(body.get("to", "")).lstrip("+")}],
+            "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}],
+        })
+
+    async def upload_media(request: web.Request):
+        await latency.wait()
+        await request.read()
+        sent["uploads"] += 1
+        return web.json_response({"id": uuid.uuid4().hex})
+
+    app = web.Application()
+    app["sent"] = sent
+    app.router.add_post("/{phone_number_id}/messages", send_message)
+    app.router.add_post("/{phone_number_id}/media", upload_media)
+    return app
+
+
+@dataclass
+class MockServers:
+    crm_url: str
+    whatsapp_url: str
+    runners: List[web.AppRunner]
+    dataset: Dataset
+
+    async def aclose(self):
+        for runner in self.runners:
+            await runner.cleanup()
+
+
+async def _serve(app: web.Application, host: str, port: int) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_host, bound_port = runner.addresses[0][:2]
+    return runner, f"http://{bound_host}:{bound_port}"
+
+
+async def start_mock_servers(
+    dataset: Dataset,
+    latency: Optional[Latency] = None,
+    whatsapp_latency: Optional[Latency] = None,
+    host: str = "127.0.0.1",
+    crm_port: int = 0,
+    whatsapp_port: int = 0,
+) -> MockServers:
+    """Start both stand-ins; port 0 picks a free port"""
+    latency = latency or Latency()
+    crm_runner, crm_url = await _serve(create_crm_app(dataset, latency), host, crm_port)
+    wa_runner, wa_url = await _serve(
+        create_whatsapp_app(whatsapp_latency or latency), host, whatsapp_port
+    )
+    return MockServers(crm_url, wa_url, [crm_runner, wa_runner], dataset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local CRM and WhatsApp stand-ins")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--vehicles-per-client", type=int, default=2)
+    parser.add_argument("--tickets-per-client", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--crm-port", type=int, default=8081)
+    parser.add_argument("--whatsapp-port", type=int, default=8082)
+    args = parser.parse_args()
+
+    async def _run():
+        dataset = build_dataset(args.clients, args.vehicles_per_client, args.tickets_per_client)
+        servers = await start_mock_servers(
+            dataset,
+            Latency(args.latency_ms, args.jitter_ms),
+            crm_port=args.crm_port,
+            whatsapp_port=args.whatsapp_port,
+        )
+        print(f"CRM stand-in:      {servers.crm_url}  ({len(dataset.clients)} clients)")
+        print(f"WhatsApp stand-in: {servers.whatsapp_url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await servers.aclose()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
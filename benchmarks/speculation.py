@@ -0,0 +1,119 @@
+"""
+Tool wait on a service question, with and without speculative lookups.
+
+A service question ("شنو صار على تذكرة الصيانة؟") ends in get_service_tickets
+and get_vehicle_data, which wait on the CRM whenever the caller's tickets or
+vehicles expired since the caller prefetch (tickets live 60 s, so any call
+longer than a minute). Each turn starts from expired stores and replays the
+utterance as interim transcripts, one word per --interim-ms. It then waits
+--eou-ms (end of utterance) and --llm-tool-ms (LLM time to the tool call)
+before running both tools, as the LLM would, and times the tools. With
+speculation the interims go through SpeculativeLookups first. Take the two
+delays from your session reports (eou_delay, llm_ttft); the CRM is the local
+stand-in (benchmarks/mock_servers.py) with --crm-latency-ms:
+
+    python -m benchmarks.speculation --turns 30 --crm-latency-ms 250
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_servers import Latency, build_dataset, start_mock_servers  # noqa: E402
+
+UTTERANCES = [
+    "مرحبا أبي أعرف شنو صار على تذكرة الصيانة مالت سيارتي",
+    "عندي موعد صيانة الأسبوع الماضي وأبي أعرف حالة الطلب",
+    "السيارة عندكم للتصليح من يومين متى تخلص",
+    "Hi I want to check the status of my service ticket please",
+    "My car has been in for maintenance since Sunday is it ready yet",
+]
+
+
+async def tool_wait_ms(client_id: str, utterance: str, speculate: bool, args) -> float:
+    import get_service_tickets_tool
+    import get_vehicle_data_tool
+    from toyota_speculation import SpeculativeLookups
+
+    # The caller prefetch loaded these at call start; the TTL has since run out
+    get_service_tickets_tool.ticket_store.invalidate(client_id)
+    get_vehicle_data_tool.vehicle_repository.invalidate(client_id)
+
+    speculation = SpeculativeLookups(client_id=lambda: client_id)
+    words = utterance.split()
+    for count in range(1, len(words) + 1):
+        if speculate:
+            speculation.on_transcript(" ".join(words[:count]), is_final=False)
+        await asyncio.sleep(args.interim_ms / 1000)
+    if speculate:
+        speculation.on_transcript(utterance, is_final=True)
+    await asyncio.sleep((args.eou_ms + args.llm_tool_ms) / 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        get_service_tickets_tool.main(client_id=client_id),
+        get_vehicle_data_tool.main(client_id),
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p90_ms": round(ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+async def run(args):
+    dataset = build_dataset(clients=max(args.turns, 10))
+    servers = await start_mock_servers(dataset, Latency(args.crm_latency_ms, args.jitter_ms))
+    # toyota_http reads its endpoints at import time
+    os.environ["TOYOTA_CRM_BASE_URL"] = servers.crm_url
+
+    from toyota_http import aclose_http_clients, init_http_clients
+
+    samples = {"tool_only": [], "speculated": []}
+    rng = random.Random(args.seed)
+    try:
+        init_http_clients()
+        for turn in range(args.turns):
+            client_id = dataset.clients[turn]["_id"]
+            utterance = rng.choice(UTTERANCES)
+            # Routes interleaved, so drift hits both alike
+            samples["tool_only"].append(await tool_wait_ms(client_id, utterance, False, args))
+            samples["speculated"].append(await tool_wait_ms(client_id, utterance, True, args))
+    finally:
+        await aclose_http_clients()
+        await servers.aclose()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--crm-latency-ms", type=float, default=250.0)
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--interim-ms", type=float, default=150.0, help="time between interim transcripts")
+    parser.add_argument("--eou-ms", type=float, default=500.0, help="end-of-utterance delay")
+    parser.add_argument("--llm-tool-ms", type=float, default=600.0, help="LLM time to the tool call")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    samples = asyncio.run(run(args))
+    print(f"tool wait on a service question over {args.turns} turns (tickets and vehicles expired)")
+    for name, values in samples.items():
+        print(f"  {name:<12}{_summary(values)}")
+    deltas = [plain - speculated for plain, speculated in zip(samples["tool_only"], samples["speculated"])]
+    print(f"  median per-turn saving: {statistics.median(deltas):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Time-to-first-audio with the clause chunker (toyota_chunking.py) vs the
+ElevenLabs plugin's own streaming path, measured against the real TTS.
+
+Both routes get the same simulated LLM token stream (the replies below,
+tokenized with the gpt-4o encoding when tiktoken is available, paced at
+--token-ms after --llm-ttft-ms) and open a real ElevenLabs websocket with
+the agent's voice settings:
+
+- plugin: tokens pushed to tts.stream() as they arrive, as LiveKit's default
+  tts_node does; the plugin's sentence tokenizer decides when to send text.
+- clauses: synthesize_clauses, which flushes at every clause boundary.
+
+Each reply is synthesized once per route per round, routes interleaved.
+Needs ELEVEN_API_KEY and network access; it spends ElevenLabs characters:
+
+    python -m benchmarks.tts_chunking --rounds 3 --token-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from toyota_chunking import ClauseChunker  # noqa: E402
+from toyota_prompt import _ENCODING  # noqa: E402
+
+# Replies in the length and register the prompt asks for (2-3 short lines)
+REPLIES = [
+    "وعليكم السلام ورحمة الله وبركاته، حياك الله! الكامري سيارة ممتازة. شرايك نحجزلك موعد لتشوفها؟",
+    "إنشالله! أي يوم يناسبك؟ عندنا مواعيد متاحة الأسبوع الجاي.",
+    "معذرة على الإزعاج. شنو المشكلة بالضبط؟ راح أساعدك أحلها.",
+    "الراف فور تبدأ من 9.990 د.ك، والضمان خمس سنوات أو 150,000 كم. تحب أرسلك صورتها على الواتساب؟",
+    "Camry is larger and more luxurious, Corolla is more economical. Which suits your needs?",
+    "Nearest showroom is in Shuwaikh. Shall I send you the location on WhatsApp?",
+    "The Land Cruiser starts at K.D. 21,500, and the hybrid is about 2,000 more. Would you like a test drive?",
+    "أكيد، أرسلت لك موقع معرض الأحمدي على الواتساب. الدوام من السبت للخميس، من ثمانية الصبح لين ثمانية بالليل.",
+]
+
+
+def tokenize(text: str):
+    if _ENCODING is not None:
+        return [_ENCODING.decode([token]) for token in _ENCODING.encode(text)]
+    return [text[i:i + 3] for i in range(0, len(text), 3)]
+
+
+async def llm_stream(tokens, ttft_ms: float, token_ms: float):
+    """The reply as an LLM would stream it"""
+    await asyncio.sleep(ttft_ms / 1000)
+    for token in tokens:
+        yield token
+        await asyncio.sleep(token_ms / 1000)
+
+
+async def plugin_stream(tts, text):
+    """What LiveKit's default tts_node does: push tokens as they come, let the plugin chunk them"""
+    from livekit.agents import utils
+
+    async with tts.stream() as stream:
+
+        async def _push():
+            async for chunk in text:
+                stream.push_text(chunk)
+            stream.end_input()
+
+        push_task = asyncio.create_task(_push())
+        try:
+            async for event in stream:
+                yield event.frame
+        finally:
+            await utils.aio.cancel_and_wait(push_task)
+
+
+async def first_audio_ms(route, tts, tokens, args) -> float:
+    started = time.perf_counter()
+    frames = route(tts, llm_stream(tokens, args.llm_ttft_ms, args.token_ms))
+    try:
+        async for _ in frames:
+            return (time.perf_counter() - started) * 1000
+    finally:
+        await frames.aclose()
+    raise RuntimeError("the TTS returned no audio")
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p90_ms": round(ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)], 1),
+        "max_ms": round(ordered[-1], 1),
+    }
+
+
+def chunker_cost_us() -> float:
+    """Chunker CPU cost per streamed token, on the real code path"""
+    tokens = [token for reply in REPLIES for token in tokenize(reply)]
+    started = time.perf_counter()
+    rounds = 200
+    for _ in range(rounds):
+        chunker = ClauseChunker()
+        for token in tokens:
+            chunker.push(token)
+        chunker.flush()
+    return (time.perf_counter() - started) / (rounds * len(tokens)) * 1e6
+
+
+async def run(args):
+    import aiohttp
+    from livekit.plugins import elevenlabs
+    from livekit.plugins.elevenlabs.tts import VoiceSettings
+
+    from toyota_tts import TTS_MODEL, TTS_VOICE_ID, TTS_VOICE_SETTINGS, synthesize_clauses
+
+    routes = (("plugin", plugin_stream), ("clauses", synthesize_clauses))
+    samples = {name: [] for name, _ in routes}
+    async with aiohttp.ClientSession() as http_session:
+        # No job context here, so the plugin gets its HTTP session explicitly
+        tts = elevenlabs.TTS(
+            api_key=os.environ["ELEVEN_API_KEY"],
+            model=TTS_MODEL,
+            voice_id=TTS_VOICE_ID,
+            voice_settings=VoiceSettings(**TTS_VOICE_SETTINGS),
+            http_session=http_session,
+        )
+        for _ in range(args.rounds):
+            for reply in REPLIES:
+                tokens = tokenize(reply)
+                for name, route in routes:
+                    samples[name].append(await first_audio_ms(route, tts, tokens, args))
+        await tts.aclose()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the replies per route")
+    parser.add_argument("--llm-ttft-ms", type=float, default=350.0, help="simulated LLM time to first token")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="simulated time between LLM tokens")
+    args = parser.parse_args()
+
+    print(f"chunker cost: {chunker_cost_us():.2f} µs per token")
+    if not os.getenv("ELEVEN_API_KEY"):
+        print("ELEVEN_API_KEY is not set; time to first audio needs the real ElevenLabs stream")
+        return
+
+    samples = asyncio.run(run(args))
+    print(f"time to first audio over {len(REPLIES)} replies x {args.rounds} rounds (includes the simulated LLM)")
+    for name, values in samples.items():
+        print(f"  {name:<8}{_summary(values)}")
+    deltas = [plugin - clauses for plugin, clauses in zip(samples["plugin"], samples["clauses"])]
+    print(f"  median per-reply saving: {statistics.median(deltas):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from livekit.agents import ConversationItemAddedEvent, llm
+
+import toyota_livekit_agent
+from toyota_caller_context import CallerContext
+from toyota_livekit_agent import ToyotaKuwaitAgent, log_conversation_item
+
+
+class _Transcript:
+    def __init__(self):
+        self.entries = []
+
+    def log(self, text, label):
+        self.entries.append((label, text))
+
+
+def _run_turn(agent, text):
+    turn_ctx = llm.ChatContext.empty()
+    message = llm.ChatMessage(role="user", content=[text])
+    asyncio.run(agent.on_user_turn_completed(turn_ctx, message))
+    return turn_ctx
+
+
+class _Prefetch:
+    def __init__(self, caller):
+        self.caller = caller
+        self.waits = 0
+
+    async def result(self):
+        self.waits += 1
+        return self.caller
+
+
+def test_greeting_identifies_caller(monkeypatch):
+    caller = CallerContext(phone_number="+96550000000", client={"_id": "c1", "first_name": "Ahmad"})
+    lookups = []
+
+    def fake_prefetch(phone_number):
+        lookups.append(phone_number)
+        return _Prefetch(caller)
+
+    monkeypatch.setattr(toyota_livekit_agent, "CallerPrefetch", fake_prefetch)
+    agent = ToyotaKuwaitAgent(session_id="s1", participant_identity="+96550000000", transcript=_Transcript())
+
+    turn_ctx = _run_turn(agent, "السلام عليكم")
+
+    assert lookups == ["+96550000000"]
+    assert agent.caller_context is caller
+    assert any(
+        item.role == "system" and caller.summary() in (item.text_content or "")
+        for item in turn_ctx.items
+    )
+
+
+def test_greeting_reuses_the_prefetch_in_flight(monkeypatch):
+    caller = CallerContext(phone_number="+96550000000", client={"_id": "c1", "first_name": "Ahmad"})
+
+    def fake_prefetch(phone_number):
+        raise AssertionError("started a second lookup")
+
+    monkeypatch.setattr(toyota_livekit_agent, "CallerPrefetch", fake_prefetch)
+    agent = ToyotaKuwaitAgent(session_id="s1", participant_identity="+96550000000", transcript=_Transcript())
+    agent.caller_prefetch = _Prefetch(caller)
+
+    _run_turn(agent, "السلام عليكم")
+
+    assert agent.caller_prefetch.waits == 1
+    assert agent.caller_context is caller
+    # Attached once: a second attach (the entrypoint's) adds nothing
+    assert not asyncio.run(agent.attach_caller_context(caller))
+    summaries = [item for item in agent.chat_ctx.items if item.role == "system" and item.text_content == caller.summary()]
+    assert len(summaries) == 1
+
+
+def test_non_greeting_skips_identification(monkeypatch):
+    def fake_prefetch(phone_number):
+        raise AssertionError("looked up on a non-greeting turn")
+
+    monkeypatch.setattr(toyota_livekit_agent, "CallerPrefetch", fake_prefetch)
+    agent = ToyotaKuwaitAgent(session_id="s1", participant_identity="+96550000000", transcript=_Transcript())
+
+    _run_turn(agent, "وين فرع الري")
+
+    assert agent.caller_context is None
+
+
+def test_committed_messages_reach_the_transcript():
+    transcript = _Transcript()
+    for item in (
+        llm.ChatMessage(role="assistant", content=["حياك الله"]),
+        llm.ChatMessage(role="user", content=["السلام عليكم"]),
+        llm.ChatMessage(role="assistant", content=["وعليكم"], interrupted=True),
+        llm.ChatMessage(role="system", content=["Caller profile"]),
+    ):
+        log_conversation_item(transcript, ConversationItemAddedEvent(item=item))
+
+    assert transcript.entries == [
+        ("TOYOTA ASSISTANT RESPONSE", "حياك الله"),
+        ("USER MESSAGE", "السلام عليكم"),
+        ("TOYOTA ASSISTANT RESPONSE (INTERRUPTED)", "وعليكم"),
+    ]
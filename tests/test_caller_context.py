@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import toyota_caller_context
+from toyota_caller_context import CallerPrefetch
+
+
+def test_slow_tickets_keep_the_profile(monkeypatch):
+    tickets_released = None
+
+    async def find(phone):
+        return {"_id": "c1", "first_name": "Ahmad", "phone_number": phone}
+
+    async def get_client_vehicles(client_id):
+        return [{"_id": "v1", "clientId": client_id}]
+
+    async def ensure_client(client_id):
+        await tickets_released.wait()
+
+    monkeypatch.setattr(toyota_caller_context.client_directory, "find", find)
+    monkeypatch.setattr(toyota_caller_context.vehicle_repository, "get_client_vehicles", get_client_vehicles)
+    monkeypatch.setattr(toyota_caller_context.ticket_store, "ensure_client", ensure_client)
+    monkeypatch.setattr(toyota_caller_context.ticket_store, "query", lambda **kwargs: ([{"_id": "t1"}], 1))
+
+    async def run():
+        nonlocal tickets_released
+        tickets_released = asyncio.Event()
+        prefetch = CallerPrefetch("+96550000000")
+
+        caller = await prefetch.result(tickets_timeout=0.01)
+        assert caller.client_id == "c1"
+        assert [v["_id"] for v in caller.vehicles] == ["v1"]
+        assert caller.open_tickets == []
+
+        # The deadline ended the wait, not the fetch
+        assert not prefetch.tickets.done()
+        tickets_released.set()
+        assert [t["_id"] for t in await prefetch.tickets] == ["t1"]
+
+    asyncio.run(run())
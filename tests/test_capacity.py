@@ -0,0 +1,28 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from toyota_capacity import WorkerCapacity
+
+
+def test_load_from_thread_without_event_loop():
+    capacity = WorkerCapacity(max_calls=4)
+    worker = SimpleNamespace(active_jobs=[object()])
+    results, errors = [], []
+
+    def poll():
+        # LiveKit calls load_fnc through run_in_executor: no running loop here
+        try:
+            results.append(capacity.load(worker))
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=poll)
+    thread.start()
+    thread.join()
+
+    assert errors == []
+    assert results == [pytest.approx(0.25)]
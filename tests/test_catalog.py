@@ -0,0 +1,20 @@
+import pytest
+
+from toyota_catalog import vehicle_catalog
+
+# Every model the send_car_image tool had an image for before the catalog existed
+BASELINE_MODELS = [
+    "كامري", "برادو", "لاند كروزر", "كورولا", "هايلكس", "ريز", "هايلاندر", "فورتنر", "كورولا كروس",
+    "camry", "prado", "land cruiser", "corolla", "hilux", "raize", "highlander", "fortuner", "corolla cross",
+]
+
+
+@pytest.mark.parametrize("name", BASELINE_MODELS)
+def test_baseline_models_still_have_an_image(name):
+    model = vehicle_catalog.resolve(name)
+    assert model is not None and model.image_url
+
+
+def test_corolla_and_corolla_cross_keep_their_own_images():
+    assert vehicle_catalog.resolve("كورولا").image_url.endswith("/trim_lvl_1.png")
+    assert vehicle_catalog.resolve("corolla cross").image_url.endswith("/corolla_cross2023.png")
@@ -0,0 +1,48 @@
+import asyncio
+
+from toyota_client_directory import ClientDirectory
+
+
+def _directory(tmp_path, replies):
+    calls = []
+
+    async def fetch_clients(phone):
+        calls.append(phone)
+        return replies(phone)
+
+    return ClientDirectory(fetch_clients, path=str(tmp_path / "clients.json")), calls
+
+
+def test_unknown_numbers_are_cached_and_shared_through_the_file(tmp_path):
+    directory, calls = _directory(tmp_path, lambda phone: [])
+
+    async def run():
+        assert await directory.find("51234567") is None
+        assert await directory.find("+965 5123 4567") is None
+
+    asyncio.run(run())
+    assert calls == ["+96551234567"]
+
+    # A sibling worker reads the cached miss instead of asking the CRM again
+    sibling, sibling_calls = _directory(tmp_path, lambda phone: [])
+    sibling.load()
+    assert asyncio.run(sibling.find("51234567")) is None
+    assert sibling_calls == []
+
+
+def test_ignored_phone_filter_is_cached_as_the_full_table(tmp_path):
+    table = [
+        {"_id": "1", "phone": "+96550000001"},
+        {"_id": "2", "phone": "+96550000002"},
+    ]
+    directory, calls = _directory(tmp_path, lambda phone: table)
+
+    async def run():
+        return [
+            await directory.find("+96550000002"),
+            await directory.find("+96550000001"),
+            await directory.find("+96599999999"),
+        ]
+
+    assert asyncio.run(run()) == [table[1], table[0], None]
+    assert len(calls) == 1
@@ -0,0 +1,28 @@
+import toyota_intents
+from toyota_intents import CAR_IMAGE, GREETING, LOCATION, IntentMatcher
+
+
+def test_memoized_match_follows_hits_not_text():
+    matcher = IntentMatcher()
+
+    first = matcher.match("السلام عليكم، أبي أشوف صورة الكامري")
+    # Different wording, same keyword hits: the resolved match is reused
+    second = matcher.match("السلام عليكم يا أخوي.. أبي أشوف صورة الكامري لو سمحت")
+
+    assert first.has(GREETING) and first.has(CAR_IMAGE)
+    assert first.car_model == "camry"
+    assert second is first
+
+    branch = matcher.match("وين مركز الخدمة؟")
+    assert branch.has(LOCATION) and not branch.has(GREETING)
+    assert branch.location_type == "service"
+
+
+def test_match_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(toyota_intents, "MATCH_CACHE_SIZE", 2)
+    matcher = IntentMatcher()
+
+    for text in ("هلا", "وين", "picture", "مرحبا"):
+        matcher.match(text)
+
+    assert len(matcher._results) <= 2
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import toyota_media
+from toyota_media import MediaCache, MediaEntry
+
+URLS = ["https://example.com/camry.png", "https://example.com/rav4.png"]
+
+
+def _cache(tmp_path, uploads):
+    cache = MediaCache(path=str(tmp_path / "media.json"))
+
+    async def upload(url):
+        uploads.append(url)
+        await asyncio.sleep(0.01)
+        cache._entries[url] = MediaEntry(f"id-{url}", time.time() + cache.ttl)
+        cache._uploading.discard(url)
+        await cache._asave()
+
+    cache._upload = upload
+    return cache
+
+
+def test_catalog_is_uploaded_once_per_host(tmp_path, monkeypatch):
+    monkeypatch.setattr(toyota_media, "MEDIA_WARM_POLL_SECONDS", 0.01)
+    uploads = []
+    first, second = _cache(tmp_path, uploads), _cache(tmp_path, uploads)
+
+    async def run():
+        # Two calls on a cold host: the second waits for the first, then adopts its ids
+        await asyncio.gather(first.warm(URLS), second.warm(URLS))
+
+    asyncio.run(run())
+    assert sorted(uploads) == sorted(URLS)
+    assert second.lookup(URLS[0]) == f"id-{URLS[0]}"
+
+
+def test_warm_skips_uploads_already_in_flight(tmp_path):
+    uploads = []
+    cache = _cache(tmp_path, uploads)
+
+    async def run():
+        assert cache.lookup(URLS[0]) is None
+        await cache.warm(URLS)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert sorted(uploads) == sorted(URLS)
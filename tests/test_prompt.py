@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import toyota_prompt
+from toyota_prompt import TokenCounter, chat_ctx_tokens
+
+
+def _message(item_id, text):
+    return SimpleNamespace(id=item_id, text_content=text)
+
+
+def test_token_counter_tokenizes_each_item_once(monkeypatch):
+    history = [_message("a", "السلام عليكم"), _message("b", "أبي أشوف صورة الكامري")]
+    counter = TokenCounter()
+    assert counter(history) == chat_ctx_tokens(history)
+
+    counted = []
+    real_count = toyota_prompt.count_tokens
+    monkeypatch.setattr(toyota_prompt, "count_tokens", lambda text: counted.append(text) or real_count(text))
+
+    history.append(_message("c", "وين أقرب معرض؟"))
+    assert counter(history) == chat_ctx_tokens(history)
+    assert counted[0] == "وين أقرب معرض؟"
+
+    # A compacted item keeps its id but not its text, so it is counted again
+    counted.clear()
+    history[1] = _message("b", "[short]")
+    counter(history)
+    assert counted == ["[short]"]
+
+
+def test_token_counter_is_bounded():
+    counter = TokenCounter(max_items=2)
+    for index in range(5):
+        counter([_message(str(index), "x")])
+    assert len(counter._tokens) <= 2
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+import toyota_speculation
+from toyota_speculation import SpeculativeLookups
+
+
+def _record_prefetches(monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        toyota_speculation.ticket_store, "prefetch", lambda client_id: started.append(("tickets", client_id)) or True
+    )
+    monkeypatch.setattr(
+        toyota_speculation.vehicle_repository, "prefetch", lambda client_id: started.append(("vehicles", client_id)) or True
+    )
+    return started
+
+
+def test_stable_service_question_starts_the_tool_fetches_once(monkeypatch):
+    started = _record_prefetches(monkeypatch)
+    speculation = SpeculativeLookups(client_id=lambda: "c1", stable_interims=2)
+
+    for text in ("شنو صار", "شنو صار على تذكرة", "شنو صار على تذكرة الصيانة", "شنو صار على تذكرة الصيانة مالتي"):
+        speculation.on_transcript(text, is_final=False)
+    assert started == [("tickets", "c1"), ("vehicles", "c1")]
+
+    # A new utterance may start them again once its match is stable
+    speculation.on_transcript("تذكرة الصيانة", is_final=True)
+    speculation.on_transcript("تذكرة", is_final=False)
+    speculation.on_transcript("تذكرة", is_final=False)
+    assert len(started) == 4
+
+
+def test_data_warm_from_call_start_is_not_speculated(monkeypatch):
+    started = _record_prefetches(monkeypatch)
+    speculation = SpeculativeLookups(client_id=lambda: "c1", stable_interims=2)
+
+    # Greeting vehicles come from the caller prefetch; image uploads from the catalog warm-up
+    for text in ("السلام عليكم", "السلام عليكم", "أبي أشوف صورة الكامري", "أبي أشوف صورة الكامري"):
+        speculation.on_transcript(text, is_final=False)
+    assert started == []
@@ -0,0 +1,65 @@
+import asyncio
+
+from toyota_ticket_store import TicketStore
+
+
+def _ticket(ticket_id, client_id, created, status="pending"):
+    return {"_id": ticket_id, "clientId": {"_id": client_id}, "status": status, "createdAt": created}
+
+
+def test_tickets_are_fetched_per_client_once():
+    calls = []
+
+    async def fetch_tickets(client_id):
+        calls.append(client_id)
+        await asyncio.sleep(0)
+        # Includes another client's ticket, as if the CRM ignored the filter
+        return [_ticket("t1", "c1", "2025-01-01"), _ticket("t2", "c1", "2025-02-01"), _ticket("t3", "c2", "2025-03-01")]
+
+    store = TicketStore(fetch_tickets)
+
+    async def run():
+        await asyncio.gather(store.ensure_client("c1"), store.ensure_client("c1"))
+        await store.ensure_client("c1")
+
+    asyncio.run(run())
+
+    assert calls == ["c1"]
+    tickets, total = store.query(client_id="c1", limit=None)
+    assert [t["_id"] for t in tickets] == ["t2", "t1"] and total == 2
+    assert store.query(client_id="c2") == ([], 0)
+
+
+def test_reload_drops_tickets_gone_from_the_crm():
+    replies = [[_ticket("t1", "c1", "2025-01-01")], []]
+
+    async def fetch_tickets(client_id):
+        return replies.pop(0)
+
+    store = TicketStore(fetch_tickets)
+    asyncio.run(store.ensure_client("c1"))
+    store.invalidate("c1")
+    asyncio.run(store.ensure_client("c1"))
+
+    assert store.query(client_id="c1") == ([], 0)
+
+
+def test_prefetch_shares_one_fetch_with_the_tool():
+    calls = []
+
+    async def fetch_tickets(client_id):
+        calls.append(client_id)
+        await asyncio.sleep(0)
+        return [_ticket("t1", client_id, "2025-01-01")]
+
+    store = TicketStore(fetch_tickets)
+
+    async def run():
+        assert store.prefetch("c1")
+        assert not store.prefetch("c1")
+        await store.ensure_client("c1")
+        assert not store.prefetch("c1")
+
+    asyncio.run(run())
+    assert calls == ["c1"]
+    assert [t["_id"] for t in store.query(client_id="c1")[0]] == ["t1"]
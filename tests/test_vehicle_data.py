@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import get_vehicle_data_tool
+from get_vehicle_data_tool import VEHICLE_PAGE_SIZE, send_vehicle_images
+from toyota_vehicle_repository import VehicleRepository
+
+
+def _vehicle(index):
+    return {"_id": f"v{index}", "clientId": "c1", "modelName": "Camry", "licensePlate": str(index)}
+
+
+def test_failed_page_fails_the_lookup_and_is_not_cached():
+    calls = []
+
+    async def fetch_page(client_id, page, limit):
+        calls.append(page)
+        if len(calls) == 1:
+            raise RuntimeError("Vehicle lookup failed: HTTP 503")
+        return [_vehicle(1)], 1
+
+    repository = VehicleRepository(fetch_page)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await repository.get_client_vehicles("c1")
+        return await repository.get_client_vehicles("c1")
+
+    assert [v["_id"] for v in asyncio.run(run())] == ["v1"]
+
+
+def test_images_are_sent_for_the_requested_page_only(monkeypatch):
+    batches = []
+    monkeypatch.setattr(
+        get_vehicle_data_tool.whatsapp_dispatcher,
+        "enqueue_batch",
+        lambda items, label, on_status=None: batches.append([label for _, label in items]),
+    )
+    vehicles = [_vehicle(index) for index in range(VEHICLE_PAGE_SIZE + 2)]
+
+    asyncio.run(send_vehicle_images(vehicles, "+96550000000", page=2))
+
+    assert len(batches) == 1
+    assert len(batches[0]) == 2
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from toyota_whatsapp import FAILED, QUEUED, WhatsAppDispatcher
+
+
+def test_batch_larger_than_free_queue_space():
+    async def run():
+        # No senders, so nothing drains the single queue slot
+        dispatcher = WhatsAppDispatcher(senders=0, queue_size=1)
+        settled = []
+        batch = dispatcher.enqueue_batch(
+            [({"to": "1"}, "a"), ({"to": "2"}, "b"), ({"to": "3"}, "c")],
+            label="fleet",
+            on_status=settled.append,
+        )
+        return batch, settled
+
+    batch, settled = asyncio.run(run())
+
+    assert batch.submitted == 3
+    assert [m.status for m in batch.messages] == [QUEUED, FAILED, FAILED]
+    assert all(m.error == "queue full" for m in batch.messages[1:])
+    assert settled == []
+
+
+
+def _deliver_with(monkeypatch, error):
+    import toyota_whatsapp
+
+    posts = []
+
+    class _Client:
+        async def post(self, path, json):
+            posts.append(json)
+            raise error
+
+    monkeypatch.setattr(toyota_whatsapp, "whatsapp_client", lambda: _Client())
+    monkeypatch.setattr(toyota_whatsapp, "WHATSAPP_BACKOFF_SECONDS", 0.0)
+
+    async def run():
+        dispatcher = WhatsAppDispatcher(senders=1, max_attempts=3)
+        message = dispatcher.enqueue({"to": "1"}, "text")
+        await message.done.wait()
+        await dispatcher.aclose()
+        return message
+
+    return asyncio.run(run()), posts
+
+
+def test_connection_failures_are_retried(monkeypatch):
+    import httpx
+
+    message, posts = _deliver_with(monkeypatch, httpx.ConnectError("refused"))
+    assert message.status == FAILED
+    assert len(posts) == 3
+
+
+def test_send_that_may_have_gone_out_is_not_retried(monkeypatch):
+    import httpx
+
+    message, posts = _deliver_with(monkeypatch, httpx.ReadTimeout("no response"))
+    assert message.status == FAILED
+    assert len(posts) == 1
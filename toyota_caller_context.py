@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from get_client_data_tool import client_directory
+from get_service_tickets_tool import ticket_store
+from get_vehicle_data_tool import vehicle_repository
+from toyota_projections import (
+    format_record,
+    format_records,
+    project_client,
+    project_ticket,
+    project_vehicle,
+)
+
+logger = logging.getLogger("toyota-caller-context")
+
+# Ticket statuses that no longer need the caller's attention
+CLOSED_TICKET_STATUSES = {"completed", "closed", "done", "cancelled", "delivered"}
+# Longest the call waits for the caller's profile and vehicles
+CALLER_PROFILE_TIMEOUT = float(os.getenv("TOYOTA_CALLER_PROFILE_TIMEOUT_SECONDS", "4"))
+# Longest it then waits for their open tickets before going on without them
+CALLER_TICKETS_TIMEOUT = float(os.getenv("TOYOTA_CALLER_TICKETS_TIMEOUT_SECONDS", "1"))
+
+
+@dataclass
+class CallerContext:
+    """Everything the CRM knows about the caller, gathered before the first turn"""
+
+    phone_number: str
+    client: Optional[dict] = None
+    vehicles: List[dict] = field(default_factory=list)
+    open_tickets: List[dict] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def client_id(self) -> Optional[str]:
+        return self.client.get("_id") if self.client else None
+
+    def summary(self) -> str:
+        """Compact system note for the LLM describing the caller"""
+        if not self.client:
+            return (
+                f"Caller {self.phone_number} is not registered in the CRM. "
+                "Collect first name, last name, email and address to register them."
+            )
+
+        parts = [f"Caller profile: {format_record(project_client(self.client))}"]
+        if self.vehicles:
+            parts.append(f"Caller vehicles:\n{format_records(self.vehicles, project_vehicle)}")
+        if self.open_tickets:
+            parts.append(f"Open service tickets:\n{format_records(self.open_tickets, project_ticket)}")
+        return "\n".join(parts)
+
+
+class CallerPrefetch:
+    """
+    The caller's CRM data, fetched in the background from the moment their
+    phone number is known.
+
+    The profile (client and vehicles) and the open tickets are separate tasks
+    with separate deadlines: slow tickets never cost the caller their profile,
+    and a missed deadline only ends the wait, never the fetch, so the ticket
+    store is warm for the get_service_tickets tool. Everyone who needs the
+    caller (the entrypoint, a greeting turn) awaits the same prefetch.
+    """
+
+    def __init__(self, phone_number: str):
+        self.phone_number = phone_number
+        self._started = time.perf_counter()
+        self._client = asyncio.ensure_future(client_directory.find(phone_number))
+        self.profile = asyncio.ensure_future(self._profile())
+        self.tickets = asyncio.ensure_future(self._open_tickets())
+        for task in (self._client, self.profile, self.tickets):
+            # Failures are reported by result(); a call that never asks must not log them as unretrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _profile(self) -> CallerContext:
+        caller = CallerContext(phone_number=self.phone_number, client=await asyncio.shield(self._client))
+        if caller.client_id:
+            try:
+                caller.vehicles = await vehicle_repository.get_client_vehicles(caller.client_id)
+            except Exception as e:  # the get_vehicle_data tool retries the fetch on demand
+                logger.warning("Vehicles left out of caller context: %r", e)
+        return caller
+
+    async def _open_tickets(self) -> List[dict]:
+        client = await asyncio.shield(self._client)
+        client_id = client.get("_id") if client else None
+        if not client_id:
+            return []
+        await ticket_store.ensure_client(client_id)
+        # Every ticket of the client, not one page: an open one may be older than the newest few
+        tickets, _ = ticket_store.query(client_id=client_id, limit=None)
+        return [t for t in tickets if str(t.get("status", "")).lower() not in CLOSED_TICKET_STATUSES]
+
+    async def result(
+        self,
+        profile_timeout: float = CALLER_PROFILE_TIMEOUT,
+        tickets_timeout: float = CALLER_TICKETS_TIMEOUT,
+    ) -> CallerContext:
+        """
+        The caller's context once the profile is in; raises if the profile
+        fails or misses profile_timeout. Tickets that fail or miss
+        tickets_timeout (counted once the profile is in) are left out.
+        """
+        caller = await asyncio.wait_for(asyncio.shield(self.profile), profile_timeout)
+        try:
+            caller.open_tickets = await asyncio.wait_for(asyncio.shield(self.tickets), tickets_timeout)
+        except Exception as e:  # the get_service_tickets tool retries the fetch on demand
+            logger.warning("Open tickets left out of caller context: %r", e)
+
+        if not caller.elapsed_ms:
+            caller.elapsed_ms = (time.perf_counter() - self._started) * 1000
+            logger.info(
+                "Caller context for %s ready in %.0f ms (registered=%s, vehicles=%d, open_tickets=%d)",
+                self.phone_number, caller.elapsed_ms, caller.client is not None,
+                len(caller.vehicles), len(caller.open_tickets),
+            )
+        return caller
+
+
+async def prefetch_caller_context(phone_number: str) -> CallerContext:
+    """Look up the caller's profile, vehicles and open tickets, with the default deadlines"""
+    return await CallerPrefetch(phone_number).result()
@@ -0,0 +1,88 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from livekit.agents import JobRequest, Worker, utils
+
+logger = logging.getLogger("toyota-capacity")
+
+# Calls one worker takes at most; each runs Silero VAD and BVC noise cancellation
+MAX_CONCURRENT_CALLS = int(os.getenv("TOYOTA_MAX_CONCURRENT_CALLS", "8"))
+# Load (0-1) at which the worker stops taking calls, so LiveKit dispatches them elsewhere
+LOAD_THRESHOLD = float(os.getenv("TOYOTA_LOAD_THRESHOLD", "0.75"))
+CPU_SAMPLE_SECONDS = 0.5
+# Smoothing of the CPU samples (weight of the newest sample)
+SMOOTHING = 0.3
+
+
+class WorkerCapacity:
+    """
+    Admission control for the worker: load_fnc and request_fnc for WorkerOptions.
+
+    Load is the higher of smoothed CPU use and the share of
+    MAX_CONCURRENT_CALLS in use. CPU is sampled for the whole host (or
+    container), so it covers every job process's VAD and noise cancellation;
+    the worker's own event loop only dispatches jobs, so its lag says nothing
+    about the calls and is not part of the load. LiveKit stops dispatching to
+    the worker once load passes LOAD_THRESHOLD; a job that still arrives is
+    rejected (and goes to another worker) when the worker is at its call
+    limit, or when the CPU an average call costs here would push it over
+    the threshold.
+
+    load() runs in a LiveKit executor thread and only reads the samples.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = MAX_CONCURRENT_CALLS,
+        load_threshold: float = LOAD_THRESHOLD,
+    ):
+        self.max_calls = max_calls
+        self.load_threshold = load_threshold
+        self.cpu = 0.0
+        self.rejected = 0
+        self._worker: Optional[Worker] = None
+        self._cpu_thread: Optional[threading.Thread] = None
+
+    @property
+    def active_calls(self) -> int:
+        return len(self._worker.active_jobs) if self._worker else 0
+
+    def load(self, worker: Worker) -> float:
+        """WorkerOptions.load_fnc; LiveKit calls it from an executor thread, so it never touches the loop"""
+        self._worker = worker
+        self._start_cpu_monitor()
+        return min(1.0, max(self.cpu, self.active_calls / self.max_calls))
+
+    async def request(self, request: JobRequest):
+        """WorkerOptions.request_fnc: accept the call only if it fits"""
+        active = self.active_calls
+        reason = None
+        if active >= self.max_calls:
+            reason = f"{active}/{self.max_calls} calls"
+        elif active and self.cpu + self.cpu / active > self.load_threshold:
+            reason = f"cpu {self.cpu:.0%} + ~{self.cpu / active:.0%} per call"
+
+        if reason:
+            self.rejected += 1
+            logger.warning("Rejecting job %s: %s", request.id, reason)
+            await request.reject()
+            return
+        await request.accept()
+
+    def _start_cpu_monitor(self):
+        if self._cpu_thread is None:
+            self._cpu_thread = threading.Thread(target=self._sample_cpu, name="toyota-cpu-monitor", daemon=True)
+            self._cpu_thread.start()
+
+    def _sample_cpu(self):
+        # cpu_percent blocks for the sampling interval, so it runs off the loop
+        monitor = utils.hw.get_cpu_monitor()
+        while True:
+            sample = monitor.cpu_percent(interval=CPU_SAMPLE_SECONDS)
+            self.cpu = SMOOTHING * sample + (1 - SMOOTHING) * self.cpu
+
+
+# One per worker (main) process
+worker_capacity = WorkerCapacity()
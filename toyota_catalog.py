@@ -0,0 +1,220 @@
+import glob
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from toyota_knowledge import KNOWLEDGE_DIR, KnowledgeSection, normalize_arabic, parse_knowledge_file
+
+logger = logging.getLogger("toyota-catalog")
+
+VEHICLE_KB_GLOB = "toyota_vehicles_*_kb.md"
+
+# Minimum trigram (Dice) similarity for a typo-tolerant match
+FUZZY_CUTOFF = 0.5
+
+DEFAULT_DESCRIPTION_AR = "سيارة تويوتا عالية الجودة والموثوقية"
+
+# The knowledge bases are English-only: Arabic names, extra spellings callers
+# and STT produce, and the Arabic WhatsApp captions, keyed by model id
+# (the slug of the model's toyota.com.kw page).
+ARABIC_MODEL_DATA: Dict[str, Tuple[str, Tuple[str, ...], Optional[str]]] = {
+    "yaris": ("ياريس", (), None),
+    "corolla": ("كورولا", (), "سيارة سيدان عائلية موثوقة واقتصادية مع تقنيات حديثة"),
+    "camry": ("كامري", (), "سيارة سيدان تنفيذية فاخرة مع تقنيات متقدمة وراحة استثنائية"),
+    "crown": ("كراون", (), None),
+    "gr86": ("جي ار 86", ("gr 86",), None),
+    "supra": ("سوبرا", (), None),
+    "raize": ("ريز", ("رايز",), "سيارة كروس أوفر مدمجة عملية ومناسبة للمدينة"),
+    "corolla-cross": ("كورولا كروس", (), "سيارة كروس أوفر عملية تجمع بين كفاءة الوقود والمساحة الداخلية"),
+    "rav4-hev": ("راف فور", ("راف 4", "rav4", "rav 4"), None),
+    "highlander": (
+        "هايلاندر",
+        ("هاي لاندر", "hi lander"),
+        "سيارة SUV عائلية مريحة تجمع بين الرحابة والأمان والتقنيات الحديثة",
+    ),
+    "fortuner": ("فورتنر", ("فورتشنر",), "سيارة دفع رباعي قوية وموثوقة مثالية للعائلات والمغامرات"),
+    "prado": ("برادو", (), "سيارة دفع رباعي فاخرة مثالية للعائلات والرحلات الطويلة"),
+    "land-cruiser": (
+        "لاند كروزر",
+        (),
+        "سيارة دفع رباعي فاخرة بحجم كامل مع قدرات استثنائية على الطرق الوعرة",
+    ),
+    "lc-70": ("لاند كروزر 70", ("lc 70", "شاص"), None),
+    "veloz": ("فيلوز", (), None),
+    "innova": ("إينوفا", ("انوفا",), None),
+    "hilux": ("هايلكس", ("هيلوكس",), "شاحنة بيك أب قوية ومتينة مثالية للعمل والمغامرات"),
+    "hilux-adventure": ("هايلكس ادفنشر", (), None),
+    "hilux-grs": ("هايلكس جي ار اس", ("hilux gr-s", "hilux grs"), None),
+    "lite-ace": ("لايت ايس", (), None),
+    "granvia": ("جرانفيا", ("غرانفيا",), None),
+    "hiace-v6": ("هايس", (), None),
+    "hiace-l4": ("هايس ال 4", (), None),
+    "coaster": ("كوستر", (), None),
+}
+
+# Images the send_car_image tool used before the catalog existed, kept where the
+# knowledge base has none (Corolla, Highlander) or a different one (the Corolla Cross
+# entry carries the Corolla trim photo); these win over the knowledge-base Image line
+IMAGE_OVERRIDES: Dict[str, str] = {
+    "corolla": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/73d4a67096830328c387e6ed0664e8d4/trim_lvl_1.png",
+    "corolla-cross": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/corolla_cross2023.png",
+    "highlander": "https://toyota.scene7.com/is/image/toyota/highlander2023",
+}
+
+_PARENTHETICAL = re.compile(r"\s*\(([^)]*)\)")
+_NON_WORD = re.compile(r"[^0-9a-zء-ي]+")
+_BRAND = {"toyota", "تويوتا"}
+
+
+def alias_key(name: str) -> str:
+    """Canonical lookup key: lowercased, Arabic folded, brand and punctuation dropped"""
+    words = _NON_WORD.sub(" ", name.lower()).split()
+    return " ".join(normalize_arabic(w) for w in words if w not in _BRAND)
+
+
+def _trigrams(key: str) -> Tuple[str, ...]:
+    compact = f"#{key.replace(' ', '')}#"
+    return tuple({compact[i:i + 3] for i in range(max(len(compact) - 2, 1))})
+
+
+def _has_arabic(text: str) -> bool:
+    return any("ء" <= char <= "ي" for char in text)
+
+
+@dataclass(frozen=True)
+class VehicleModel:
+    id: str
+    name_en: str
+    name_ar: str
+    category: str = ""
+    type: str = ""
+    image_url: Optional[str] = None
+    details_url: Optional[str] = None
+    target_market: str = ""
+    description_ar: str = DEFAULT_DESCRIPTION_AR
+    aliases: Tuple[str, ...] = field(default_factory=tuple)
+
+    def name_for(self, text: str) -> str:
+        """Model name in the language of text (Arabic when it contains Arabic letters)"""
+        return self.name_ar if _has_arabic(text) else self.name_en
+
+
+def _model_from_section(section: KnowledgeSection) -> Optional[VehicleModel]:
+    title = section.title
+    fields = section.fields()
+    if "category" not in fields:
+        return None  # overview or notes section, not a model
+
+    name = title[len("Toyota "):] if title.startswith("Toyota ") else title
+    inner = _PARENTHETICAL.search(name)
+    base = _PARENTHETICAL.sub("", name).strip()
+    details_url = fields.get("model details")
+    model_id = details_url.rstrip("/").rsplit("/", 1)[-1] if details_url else alias_key(name).replace(" ", "-")
+
+    name_ar, extra_aliases, description_ar = ARABIC_MODEL_DATA.get(model_id, (base, (), None))
+    aliases = [base, name_ar, model_id.replace("-", " "), *extra_aliases]
+    name_en = base
+    if inner:
+        aliases.append(f"{base} {inner.group(1)}")
+        if len(inner.group(1)) >= 4:  # "Land Cruiser Prado", "LC70"
+            aliases.append(inner.group(1))
+        else:  # a variant tag: "Hiace V6", "Hiace L4"
+            name_en = f"{base} {inner.group(1)}"
+
+    return VehicleModel(
+        id=model_id,
+        name_en=name_en,
+        name_ar=name_ar,
+        category=fields.get("category", ""),
+        type=fields.get("type", ""),
+        image_url=IMAGE_OVERRIDES.get(model_id) or fields.get("image"),
+        details_url=details_url,
+        target_market=fields.get("target market", ""),
+        description_ar=description_ar or DEFAULT_DESCRIPTION_AR,
+        aliases=tuple(dict.fromkeys(aliases)),
+    )
+
+
+class VehicleCatalog:
+    """
+    Immutable Toyota model catalog built from the toyota_vehicles_*_kb.md files.
+
+    Every code path (tools, agent, intent matcher) resolves model names here:
+    exact alias lookup first, then a precomputed trigram index for typos and
+    STT variants ("هاي لاندر", "camery", "لاندكروزر").
+    """
+
+    def __init__(self, models: List[VehicleModel]):
+        self.models: Mapping[str, VehicleModel] = MappingProxyType({m.id: m for m in models})
+
+        by_alias: Dict[str, str] = {}
+        for model in models:
+            for alias in model.aliases:
+                # First registration wins for shared aliases ("hiace")
+                by_alias.setdefault(alias_key(alias), model.id)
+        self._by_alias: Mapping[str, str] = MappingProxyType(by_alias)
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        self._keys: Tuple[str, ...] = tuple(by_alias)
+        self._key_grams: Tuple[int, ...] = tuple(len(_trigrams(key)) for key in self._keys)
+        for index, key in enumerate(self._keys):
+            for gram in _trigrams(key):
+                postings[gram].append(index)
+        self._postings: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {gram: tuple(ids) for gram, ids in postings.items()}
+        )
+
+    @classmethod
+    def load(cls, directory: str = KNOWLEDGE_DIR) -> "VehicleCatalog":
+        models: List[VehicleModel] = []
+        for path in sorted(glob.glob(os.path.join(directory, VEHICLE_KB_GLOB))):
+            for section in parse_knowledge_file(path):
+                model = _model_from_section(section)
+                if model is not None:
+                    models.append(model)
+        logger.info("Vehicle catalog loaded: %s models", len(models))
+        return cls(models)
+
+    def __iter__(self):
+        return iter(self.models.values())
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def get(self, model_id: Optional[str]) -> Optional[VehicleModel]:
+        return self.models.get(model_id) if model_id else None
+
+    def aliases(self) -> Dict[str, List[str]]:
+        """Model id -> every spelling it is known by"""
+        return {model.id: list(model.aliases) for model in self}
+
+    def resolve(self, name: str, cutoff: float = FUZZY_CUTOFF) -> Optional[VehicleModel]:
+        """Model for a spoken or typed name, tolerating typos; None if nothing is close"""
+        key = alias_key(name or "")
+        if not key:
+            return None
+        model_id = self._by_alias.get(key)
+        if model_id is not None:
+            return self.models[model_id]
+
+        grams = _trigrams(key)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for index in self._postings.get(gram, ()):
+                shared[index] += 1
+        best, best_score = None, cutoff
+        for index, count in shared.items():
+            score = 2 * count / (len(grams) + self._key_grams[index])
+            if score > best_score:
+                best, best_score = index, score
+        if best is None:
+            return None
+        return self.models[self._by_alias[self._keys[best]]]
+
+
+# Loaded once per worker process at import
+vehicle_catalog = VehicleCatalog.load()
@@ -0,0 +1,98 @@
+import os
+import re
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+# The first chunk is cut at the first clause boundary past this many
+# characters, so synthesis starts as early as possible
+FIRST_CHUNK_MIN_CHARS = int(os.getenv("TOYOTA_TTS_FIRST_CHUNK_CHARS", "12"))
+# Later chunks only at clause boundaries past this length, for natural prosody
+CHUNK_MIN_CHARS = int(os.getenv("TOYOTA_TTS_CHUNK_CHARS", "40"))
+# A chunk without any boundary is cut at the last space before this length
+CHUNK_MAX_CHARS = 220
+
+# Sentence ends: Latin and Arabic question mark, exclamation, full stop, ellipsis
+_SENTENCE_END = ".!?؟…"
+# Clause ends: Latin and Arabic comma and semicolon, colon
+_CLAUSE_END = ",،;؛:"
+
+# A boundary mark followed by whitespace. Marks inside numbers ("7.500",
+# "1,250", "٧٫٥") are not followed by whitespace and never match; neither
+# does a mark at the very end of the buffer, which waits for the next token.
+_BOUNDARY = re.compile(rf"[{re.escape(_SENTENCE_END + _CLAUSE_END)}]+[\"'”»)]*(?=\s)|\n")
+# "K.D. 7,500", "Mr. Ali", "e.g. the" - a period that ends an abbreviation, not a sentence
+_ABBREVIATION = re.compile(r"(?:\b[A-Za-z]|\b(?:Mr|Mrs|Ms|Dr|St|No|vs|etc|e\.g|i\.e))\.$")
+
+
+class ClauseChunker:
+    """
+    Splits streamed LLM text into clauses for the TTS.
+
+    Text is cut at Arabic and English sentence and clause boundaries
+    ("،", "؟", ",", "." ...) so the first clause reaches the TTS while the
+    LLM is still writing the rest. A boundary only counts when whitespace
+    follows it, so prices and numbers ("7.500 د.ك", "1,250 KD") are never
+    split, and abbreviations do not end a sentence.
+    """
+
+    def __init__(
+        self,
+        first_min_chars: int = FIRST_CHUNK_MIN_CHARS,
+        min_chars: int = CHUNK_MIN_CHARS,
+        max_chars: int = CHUNK_MAX_CHARS,
+    ):
+        self.first_min_chars = first_min_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def push(self, text: str) -> List[str]:
+        """Add streamed text; returns the chunks that are now complete"""
+        self._buffer += text
+        chunks = []
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return chunks
+            chunks.append(chunk)
+
+    def flush(self) -> Optional[str]:
+        """The rest of the text once the stream has ended"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return rest or None
+
+    def _next_chunk(self) -> Optional[str]:
+        min_chars = self.first_min_chars if self._emitted == 0 else self.min_chars
+        for boundary in _BOUNDARY.finditer(self._buffer):
+            end = boundary.end()
+            candidate = self._buffer[:end].strip()
+            if not candidate:
+                continue
+            mark = boundary.group()
+            is_sentence = mark == "\n" or any(char in _SENTENCE_END for char in mark)
+            if mark.startswith(".") and _ABBREVIATION.search(self._buffer[:boundary.start() + 1]):
+                continue
+            if len(candidate) < (min_chars if not is_sentence else min(min_chars, self.first_min_chars)):
+                continue
+            return self._take(end)
+
+        if len(self._buffer) > self.max_chars:
+            cut = self._buffer.rfind(" ", 0, self.max_chars)
+            return self._take(cut if cut > 0 else self.max_chars)
+        return None
+
+    def _take(self, end: int) -> str:
+        chunk, self._buffer = self._buffer[:end].strip(), self._buffer[end:]
+        self._emitted += 1
+        return chunk
+
+
+async def split_clauses(text: AsyncIterable[str], chunker: Optional[ClauseChunker] = None) -> AsyncIterator[str]:
+    """Re-chunk an LLM text stream into clauses as soon as each one is complete"""
+    chunker = chunker or ClauseChunker()
+    async for piece in text:
+        for chunk in chunker.push(piece):
+            yield chunk
+    rest = chunker.flush()
+    if rest:
+        yield rest
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger("toyota-client-directory")
+
+# Kuwait numbers are 8 local digits behind the +965 country code
+KUWAIT_COUNTRY_CODE = "965"
+KUWAIT_LOCAL_LENGTH = 8
+
+# Shared by every worker on the host, so each caller is looked up in the CRM once per host
+CLIENT_CACHE_PATH = os.getenv(
+    "TOYOTA_CLIENT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "client_cache.json"),
+)
+# Registered callers are looked up again after this long, to pick up CRM edits
+CLIENT_CACHE_TTL_SECONDS = float(os.getenv("TOYOTA_CLIENT_CACHE_TTL_SECONDS", "3600"))
+# Unknown numbers are remembered for less time: they may register elsewhere meanwhile
+CLIENT_NEGATIVE_TTL_SECONDS = float(os.getenv("TOYOTA_CLIENT_NEGATIVE_TTL_SECONDS", "300"))
+
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+
+def normalize_phone(phone_number: Optional[str]) -> Optional[str]:
+    """
+    Normalize a phone number to E.164 so every spelling of a caller maps to one key.
+
+    "+965 5123 4567", "0096551234567", "96551234567" and "51234567" all
+    normalize to "+96551234567". Returns None when no digits are present.
+    """
+    if not phone_number:
+        return None
+
+    text = str(phone_number).translate(_ARABIC_DIGITS).strip()
+    digits = re.sub(r"\D", "", text)
+    if not digits:
+        return None
+
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif not text.startswith("+") and len(digits) == KUWAIT_LOCAL_LENGTH:
+        digits = KUWAIT_COUNTRY_CODE + digits
+
+    return f"+{digits}"
+
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    client: Optional[dict]  # None: no client is registered under the number
+    expires_at: float  # wall-clock epoch seconds, so entries survive restarts
+
+
+class ClientDirectory:
+    """
+    CRM clients keyed by normalized phone number, shared by the workers on a host.
+
+    Entries live in a cache file (like the WhatsApp media ids), read in
+    prewarm; a number that is not cached, or has expired, is looked up in
+    the CRM once and the answer is written back for every worker. Unknown
+    numbers are cached too, for a shorter time, so repeat callers who are
+    not registered never cost a CRM request. If the CRM answers a per-phone
+    query with more than that client (it ignored the filter), the reply is
+    the whole table: every client in it is cached, and numbers missing from
+    it count as unknown until the snapshot expires.
+    """
+
+    def __init__(
+        self,
+        fetch_clients: Callable[[str], Awaitable[List[dict]]],
+        path: str = CLIENT_CACHE_PATH,
+        ttl: float = CLIENT_CACHE_TTL_SECONDS,
+        negative_ttl: float = CLIENT_NEGATIVE_TTL_SECONDS,
+    ):
+        self.fetch_clients = fetch_clients
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lookups = 0
+        self._entries: Dict[str, DirectoryEntry] = {}
+        # Until when the cached clients are the CRM's full table (filter ignored)
+        self._complete_until = 0.0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self._entries.values() if entry.client is not None)
+
+    def load(self):
+        """Read the entries cached by earlier runs or sibling workers (called from prewarm; local reads only)"""
+        self._adopt(*self._read())
+        logger.info("Client directory loaded: %s numbers", len(self._entries))
+
+    def lookup(self, phone_number: str) -> Optional[dict]:
+        """Return the cached client for this phone number, if any (never touches the network)"""
+        key = normalize_phone(phone_number)
+        entry = self._entries.get(key) if key else None
+        return entry.client if entry is not None and entry.expires_at > time.time() else None
+
+    async def find(self, phone_number: str) -> Optional[dict]:
+        """The client registered under this phone number, from the cache or else the CRM; CRM errors propagate"""
+        key = normalize_phone(phone_number)
+        if not key:
+            return None
+        cached = self._cached(key)
+        if cached is not None:
+            return cached.client
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A caller abandoning its turn must not cancel the lookup other callers share
+        return await asyncio.shield(task)
+
+    def upsert(self, client: dict):
+        """Add or replace a single client, e.g. right after registration"""
+        key = normalize_phone(client.get("phone"))
+        if key:
+            self._entries[key] = DirectoryEntry(client, time.time() + self.ttl)
+            self._start(self._asave())
+
+    def _cached(self, key: str) -> Optional[DirectoryEntry]:
+        """The live entry for key; a number missing from a fresh full snapshot is a cached miss"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            return entry
+        if self._complete_until > now:
+            return DirectoryEntry(None, self._complete_until)
+        return None
+
+    async def _fetch(self, key: str) -> Optional[dict]:
+        # A sibling worker may have looked this number up since prewarm
+        self._adopt(*await asyncio.to_thread(self._read))
+        cached = self._cached(key)
+        if cached is not None:
+            return cached.client
+
+        started = time.perf_counter()
+        clients = await self.fetch_clients(key)
+        self.lookups += 1
+        expires_at = time.time() + self.ttl
+        found = None
+        for client in clients:
+            client_key = normalize_phone(client.get("phone"))
+            if client_key:
+                self._entries[client_key] = DirectoryEntry(client, expires_at)
+                if client_key == key:
+                    found = client
+        if any(normalize_phone(client.get("phone")) != key for client in clients):
+            self._complete_until = expires_at
+            logger.warning("CRM ignored the phone filter; cached its %s clients as the full table", len(clients))
+        if found is None:
+            self._entries[key] = DirectoryEntry(None, time.time() + self.negative_ttl)
+        logger.info(
+            "Client lookup for %s in %.0f ms (registered=%s)",
+            key, (time.perf_counter() - started) * 1000, found is not None,
+        )
+        await self._asave()
+        return found
+
+    def _adopt(self, entries: Dict[str, DirectoryEntry], complete_until: float):
+        """Take the entries from the file that are newer than ours"""
+        for key, entry in entries.items():
+            ours = self._entries.get(key)
+            if ours is None or ours.expires_at < entry.expires_at:
+                self._entries[key] = entry
+        self._complete_until = max(self._complete_until, complete_until)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return {}, 0.0
+        except (OSError, ValueError) as e:
+            logger.warning("Client cache unreadable, starting empty: %s", e)
+            return {}, 0.0
+        now = time.time()
+        entries = {
+            key: DirectoryEntry(**entry)
+            for key, entry in raw.get("clients", {}).items()
+            if entry.get("expires_at", 0) > now
+        }
+        return entries, float(raw.get("complete_until", 0.0))
+
+    def _start(self, call):
+        """Run call as a background task kept referenced until done (no-op without a running loop)"""
+        try:
+            task = asyncio.get_running_loop().create_task(call)
+        except RuntimeError:
+            call.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _asave(self):
+        # File I/O off the event loop, on a snapshot the loop may keep changing
+        await asyncio.to_thread(self._save, dict(self._entries), self._complete_until)
+
+    def _save(self, entries: Dict[str, DirectoryEntry], complete_until: float):
+        """
+        Merge our entries into the cache file and replace it atomically. For
+        each number the entry that expires last wins; two workers saving at
+        once can still lose one entry, which only costs a CRM lookup.
+        """
+        merged, file_complete_until = self._read()
+        for key, entry in entries.items():
+            if key not in merged or merged[key].expires_at < entry.expires_at:
+                merged[key] = entry
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "complete_until": max(complete_until, file_complete_until),
+                    "clients": {key: asdict(entry) for key, entry in merged.items()},
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Client cache not saved: %s", e)
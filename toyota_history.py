@@ -0,0 +1,123 @@
+import logging
+import os
+from typing import List, Optional
+
+from livekit.agents import llm
+
+from toyota_prompt import TokenCounter
+
+logger = logging.getLogger("toyota-history")
+
+# Prompt tokens the conversation history may use before it is compacted
+HISTORY_TOKEN_BUDGET = int(os.getenv("TOYOTA_HISTORY_TOKEN_BUDGET", "6000"))
+# Compaction shrinks the history to this share of the budget, so it runs every
+# few turns rather than on every turn (each rewrite costs a prompt-cache miss)
+HISTORY_TARGET_RATIO = float(os.getenv("TOYOTA_HISTORY_TARGET_RATIO", "0.7"))
+# Most recent user turns always kept verbatim, tool outputs included
+HISTORY_KEEP_TURNS = int(os.getenv("TOYOTA_HISTORY_KEEP_TURNS", "4"))
+# Characters of a used tool output kept in its compact reference
+TOOL_REFERENCE_CHARS = 160
+# Characters kept per message in the summary of dropped turns
+SUMMARY_LINE_CHARS = 140
+SUMMARY_MAX_CHARS = 1500
+
+SUMMARY_ID = "history_summary"
+_PINNED_ROLES = ("system", "developer")
+
+
+def _is_pinned(item) -> bool:
+    """Instructions and session notes (caller profile) are never compacted"""
+    return item.type == "message" and item.role in _PINNED_ROLES and item.id != SUMMARY_ID
+
+
+class HistoryManager:
+    """
+    Keeps a call's chat context under a token budget.
+
+    Once the history exceeds the budget, tool outputs from before the last
+    few user turns (already used by the assistant) are replaced with short
+    references; if that is not enough, the oldest turns are folded into one
+    extractive summary note. System messages (instructions, caller profile)
+    are kept as they are.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = HISTORY_TOKEN_BUDGET,
+        target_ratio: float = HISTORY_TARGET_RATIO,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+    ):
+        self.budget_tokens = budget_tokens
+        self.target_tokens = int(budget_tokens * target_ratio)
+        self.keep_turns = keep_turns
+        self.compactions = 0
+        # Shared with the prompt-size metric, so each item is tokenized once per call
+        self.tokens = TokenCounter()
+
+    def compact(self, chat_ctx: llm.ChatContext) -> Optional[llm.ChatContext]:
+        """A compacted copy of chat_ctx, or None when it is within budget"""
+        items = list(chat_ctx.items)
+        before = self.tokens(items)
+        if before <= self.budget_tokens:
+            return None
+
+        boundary = self._recent_boundary(items)
+        items = [self._compact_tool_output(item) if i < boundary else item for i, item in enumerate(items)]
+        after = self.tokens(items)
+        if after > self.target_tokens:
+            items = self._summarize_oldest(items, boundary)
+            after = self.tokens(items)
+
+        self.compactions += 1
+        logger.info("History compacted: %s -> %s tokens", before, after)
+        return llm.ChatContext(items)
+
+    def _recent_boundary(self, items: List) -> int:
+        """Index of the first item belonging to the last keep_turns user turns"""
+        seen = 0
+        for index in range(len(items) - 1, -1, -1):
+            item = items[index]
+            if item.type == "message" and item.role == "user":
+                seen += 1
+                if seen >= self.keep_turns:
+                    return index
+        return 0
+
+    @staticmethod
+    def _compact_tool_output(item):
+        if item.type != "function_call_output" or len(item.output) <= TOOL_REFERENCE_CHARS:
+            return item
+        reference = f"[{item.name} result, already used: {item.output[:TOOL_REFERENCE_CHARS]}…]"
+        return item.model_copy(update={"output": reference})
+
+    def _summarize_oldest(self, items: List, boundary: int) -> List:
+        pinned = [item for item in items[:boundary] if _is_pinned(item)]
+        previous = next((item for item in items if item.id == SUMMARY_ID), None)
+        lines = [previous.text_content.split("\n", 1)[-1]] if previous else []
+
+        # Drop old turns oldest-first until the rest fits; tool calls and their
+        # outputs go together so no output is left without its call
+        old = [item for item in items[:boundary] if not _is_pinned(item) and item is not previous]
+        recent = items[boundary:]
+        fixed = self.tokens(pinned) + self.tokens(recent)
+        remaining = self.tokens(old)
+        while old and fixed + remaining > self.target_tokens:
+            item = old.pop(0)
+            remaining -= self.tokens([item])
+            if item.type == "message" and item.role in ("user", "assistant") and item.text_content:
+                lines.append(f"{item.role}: {item.text_content[:SUMMARY_LINE_CHARS]}")
+            elif item.type == "function_call":
+                lines.append(f"tool {item.name}({item.arguments[:SUMMARY_LINE_CHARS]})")
+                outputs = [o for o in old if getattr(o, "call_id", None) == item.call_id]
+                remaining -= self.tokens(outputs)
+                old = [o for o in old if o not in outputs]
+
+        summary = "\n".join(lines)
+        if len(summary) > SUMMARY_MAX_CHARS:
+            summary = summary[-SUMMARY_MAX_CHARS:]
+        note = llm.ChatMessage(
+            id=SUMMARY_ID,
+            role="system",
+            content=[f"Earlier in this call (compacted):\n{summary}"],
+        )
+        return pinned + [note] + old + recent
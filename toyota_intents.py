@@ -0,0 +1,172 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from toyota_catalog import vehicle_catalog
+
+# Intent names
+GREETING = "greeting"
+CAR_IMAGE = "car_image"
+LOCATION = "location"
+SERVICE_TICKET = "service_ticket"
+
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    GREETING: ["هلا", "سلام عليكم", "السلام عليكم", "مرحبا", "أهلا"],
+    CAR_IMAGE: ["أبي أشوف صورة", "صورة السيارة", "شكل السيارة", "show me", "image", "picture"],
+    LOCATION: ["وين", "أقرب معرض", "مركز الخدمة", "موقع", "عنوان", "where", "location", "address"],
+    SERVICE_TICKET: ["صيانة", "تصليح", "تذكرة", "حالة الطلب", "وضع سيارتي", "maintenance", "repair", "ticket"],
+}
+
+LOCATION_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "showroom": ["معرض", "showroom"],
+    "service": ["خدمة", "service"],
+}
+DEFAULT_LOCATION_TYPE = "showroom"
+
+# Model id -> every spelling of the model, from the shared vehicle catalog
+CAR_MODELS: Dict[str, List[str]] = vehicle_catalog.aliases()
+
+# Distinct keyword-hit sequences whose resolved match is kept (IntentMatch is immutable, so it is shared)
+MATCH_CACHE_SIZE = 4096
+
+# Spelling variants STT produces for the same letter
+_FOLD = (("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ة", "ه"), ("ى", "ي"))
+
+Tag = Tuple[str, str]  # (kind, value): ("intent", "location"), ("car", "camry"), ...
+
+
+def fold(text: str) -> str:
+    # Chained replace is several times faster than str.translate on Arabic text
+    text = text.lower()
+    for variant, base in _FOLD:
+        text = text.replace(variant, base)
+    return text
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    One regex for a keyword set, factored as a prefix trie.
+
+    Shared prefixes are matched once and each position is rejected after a
+    single character test, instead of trying every keyword in turn; optional
+    tails make the longest keyword win.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def _build(node: dict) -> str:
+        branches = [re.escape(char) + _build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return _build(trie)
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intents: FrozenSet[str]
+    car_model: Optional[str] = None
+    location_type: str = DEFAULT_LOCATION_TYPE
+
+    def has(self, intent: str) -> bool:
+        return intent in self.intents
+
+
+class IntentMatcher:
+    """
+    Single-pass keyword matcher for intents, car models and location types.
+
+    Every keyword from every table is folded (case, hamza, taa marbuta, alef
+    maqsura) and compiled into one trie-shaped regex, and the transcript is
+    folded once. A keyword that contains another one (e.g. "مركز الخدمة"
+    contains "خدمة") carries the tags of both, so non-overlapping matching
+    still reports everything the separate substring scans would. Resolving
+    the hits into an IntentMatch costs as much as the scan, so results are
+    memoized per hit sequence.
+    """
+
+    def __init__(
+        self,
+        intent_keywords: Dict[str, List[str]] = INTENT_KEYWORDS,
+        location_keywords: Dict[str, List[str]] = LOCATION_TYPE_KEYWORDS,
+        car_models: Dict[str, List[str]] = CAR_MODELS,
+    ):
+        tags: Dict[str, List[Tag]] = {}
+
+        def _add(keyword: str, tag: Tag):
+            tags.setdefault(fold(keyword), []).append(tag)
+
+        for intent, keywords in intent_keywords.items():
+            for keyword in keywords:
+                _add(keyword, ("intent", intent))
+        for location_type, keywords in location_keywords.items():
+            for keyword in keywords:
+                _add(keyword, ("location", location_type))
+        for model_id, aliases in car_models.items():
+            for alias in aliases:
+                _add(alias, ("car", model_id))
+
+        # Several hits of one kind resolve in table order, as the old scans did:
+        # each keyword keeps its intents plus the best car/location rank it implies
+        car_order = list(car_models)
+        location_order = list(location_keywords)
+        self._car_order = car_order
+        self._location_order = location_order
+        self._entries: Dict[str, Tuple[FrozenSet[str], int, int]] = {}
+        no_rank = len(car_order) + len(location_order)
+        for keyword, own in tags.items():
+            # A longer model name is a more specific model ("كورولا كروس"), so
+            # car tags are not inherited from the names it contains
+            nested = [
+                tag
+                for other, other_tags in tags.items()
+                if other != keyword and other in keyword
+                for tag in other_tags
+                if tag[0] != "car"
+            ]
+            every = own + nested
+            self._entries[keyword] = (
+                frozenset(value for kind, value in every if kind == "intent"),
+                min((car_order.index(value) for kind, value in every if kind == "car"), default=no_rank),
+                min((location_order.index(value) for kind, value in every if kind == "location"), default=no_rank),
+            )
+        self._no_rank = no_rank
+
+        self._pattern = re.compile(_trie_pattern(list(self._entries)))
+        # Hit sequence -> resolved match; most turns hit the same few keywords
+        self._results: Dict[Tuple[str, ...], IntentMatch] = {}
+
+    def match(self, text: str) -> IntentMatch:
+        hits = tuple(self._pattern.findall(fold(text)))
+        result = self._results.get(hits)
+        if result is None:
+            if len(self._results) >= MATCH_CACHE_SIZE:
+                self._results.clear()
+            result = self._results[hits] = self._resolve(hits)
+        return result
+
+    def _resolve(self, hits: Tuple[str, ...]) -> IntentMatch:
+        intents: FrozenSet[str] = frozenset()
+        car_rank = location_rank = self._no_rank
+        for hit in hits:
+            hit_intents, hit_car, hit_location = self._entries[hit]
+            intents |= hit_intents
+            car_rank = min(car_rank, hit_car)
+            location_rank = min(location_rank, hit_location)
+        return IntentMatch(
+            intents,
+            self._car_order[car_rank] if car_rank < len(self._car_order) else None,
+            self._location_order[location_rank] if location_rank < len(self._location_order) else DEFAULT_LOCATION_TYPE,
+        )
+
+
+# Built once at import; shared by every session in the worker
+intent_matcher = IntentMatcher()
@@ -0,0 +1,265 @@
+import glob
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("toyota-knowledge")
+
+KNOWLEDGE_DIR = os.getenv("TOYOTA_KNOWLEDGE_DIR", os.path.dirname(os.path.abspath(__file__)))
+KNOWLEDGE_GLOB = "toyota_*_kb.md"
+
+# Snippets injected per turn, and the character budget they share
+KNOWLEDGE_TOP_K = int(os.getenv("TOYOTA_KNOWLEDGE_TOP_K", "3"))
+KNOWLEDGE_MAX_CHARS = int(os.getenv("TOYOTA_KNOWLEDGE_MAX_CHARS", "1200"))
+# Below this BM25 score a section is considered unrelated to the question
+KNOWLEDGE_MIN_SCORE = float(os.getenv("TOYOTA_KNOWLEDGE_MIN_SCORE", "1.0"))
+
+# Knowledge-base file listing each branch type the send_location tool can share
+BRANCH_SOURCES = {
+    "showroom": "toyota_showrooms_kb.md",
+    "service": "toyota_service_centers_kb.md",
+    "parts": "toyota_spare_parts_kb.md",
+}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# ──────────────────────────
+# Arabic normalization
+# ──────────────────────────
+_DIACRITICS = re.compile(r"[ً-ْٰـ]")  # tashkeel, dagger alef, tatweel
+_ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+_ARABIC_PREFIXES = ("وال", "بال", "فال", "كال", "لل", "ال")
+_URL = re.compile(r"https?://\S+")
+_TOKEN = re.compile(r"[0-9a-zء-ي]+")
+
+# The knowledge bases are written in English while most callers speak Kuwaiti
+# Arabic, so Arabic query terms are expanded to the English words they mean.
+ARABIC_TERMS = {
+    # Models
+    "كامري": "camry", "كورولا": "corolla", "كراون": "crown", "ياريس": "yaris",
+    "ريز": "raize", "راف": "rav4", "هايلاندر": "highlander", "فورتنر": "fortuner",
+    "برادو": "prado", "لاند": "land", "كروزر": "cruiser", "هايلكس": "hilux",
+    "ادفنشر": "adventure", "لايت": "lite", "ايس": "ace", "جرانفيا": "granvia",
+    "هايس": "hiace", "كوستر": "coaster", "فيلوز": "veloz", "انوفا": "innova",
+    "اينوفا": "innova", "سوبرا": "supra", "كروس": "cross",
+    # Areas
+    "احمدي": "ahmadi", "شويخ": "shuwaikh", "جهراء": "jahra", "جهرا": "jahra",
+    "قرين": "qurain", "اسواق": "aswaq", "ري": "rai", "فحيحيل": "fahaheel",
+    "عارضيه": "ardiya", "غزالي": "ghazali", "شرق": "sharq", "صليبيه": "sulaibiya",
+    "فروانيه": "farwaniya", "سور": "soor", "زينه": "zeina",
+    # Topics
+    "معرض": "showroom", "معارض": "showroom", "صاله": "showroom",
+    "خدمه": "service", "صيانه": "service maintenance", "تصليح": "repair", "اصلاح": "repair",
+    "قطع": "parts", "غيار": "parts spare", "تاجير": "rental", "ايجار": "rental",
+    "تسليم": "delivery", "استلام": "delivery", "هيكل": "body", "صبغ": "paint",
+    "سطحه": "crane towing", "ونش": "crane towing", "طوارئ": "emergency",
+    "مساعده": "musaada assistance", "دوام": "hours", "ساعات": "hours", "مواعيد": "hours",
+    "تلفون": "contact tel", "هاتف": "contact tel", "رقم": "contact tel",
+    "هجين": "hybrid", "هايبرد": "hybrid", "عائله": "family families", "عائليه": "family families",
+    "سيدان": "sedan", "رباعي": "suv", "بيك": "pickup", "باص": "bus", "فان": "van",
+    "مستعمله": "pre-owned certified", "مستعمل": "pre-owned certified",
+    "اسطول": "fleet", "شركات": "fleet", "فندق": "hotel", "مقاعد": "seater",
+}
+
+
+def normalize_arabic(word: str) -> str:
+    word = _DIACRITICS.sub("", word).translate(_ARABIC_FOLD)
+    for prefix in _ARABIC_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return word[len(prefix):]
+    return word
+
+
+_EXPANSIONS: Dict[str, List[str]] = {
+    normalize_arabic(arabic): english.split() for arabic, english in ARABIC_TERMS.items()
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with Arabic folded and expanded to English equivalents"""
+    tokens: List[str] = []
+    for word in _TOKEN.findall(_URL.sub(" ", text.lower())):
+        if "ء" <= word[0] <= "ي":
+            word = normalize_arabic(word)
+            tokens.extend(_EXPANSIONS.get(word, (word,)))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+# ──────────────────────────
+# Knowledge-base sections
+# ──────────────────────────
+@dataclass(frozen=True)
+class KnowledgeSection:
+    source: str
+    heading: str
+    title: str
+    body: str
+
+    def fields(self) -> Dict[str, str]:
+        """The section's "- Key: value" lines, keys lowercased"""
+        fields = {}
+        for line in self.body.splitlines():
+            if not line.lstrip().startswith("-"):
+                continue
+            key, sep, value = line.lstrip("- ").partition(":")
+            if sep:
+                fields[key.strip().lower()] = value.strip()
+        return fields
+
+    def snippet(self) -> str:
+        """Section text for the LLM, without image URLs"""
+        lines = [line for line in self.body.splitlines() if not line.lstrip("- ").startswith("Image:")]
+        return f"{self.title}\n" + "\n".join(lines)
+
+
+def parse_knowledge_file(path: str) -> List[KnowledgeSection]:
+    """
+    Split a knowledge-base markdown file into retrievable sections.
+
+    A section starts at a `## heading` or a bold `**Title**` line and runs to
+    the next one (or a `---` rule). The file's `#` title and intro are skipped.
+    """
+    source = os.path.basename(path)
+    sections: List[KnowledgeSection] = []
+    heading = ""
+    title: Optional[str] = None
+    body: List[str] = []
+
+    def _flush():
+        if title and any(line.strip() for line in body):
+            sections.append(KnowledgeSection(source, heading, title, "\n".join(body).strip()))
+
+    with open(path, encoding="utf-8") as f:
+        for raw in f:
+            line = raw.rstrip()
+            if line.startswith("# "):
+                continue
+            if line.startswith("## "):
+                _flush()
+                heading = title = line[3:].strip()
+                body = []
+            elif line.startswith("**") and line.endswith("**") and len(line) > 4:
+                _flush()
+                title = line.strip("*").strip()
+                body = []
+            elif line.strip() == "---":
+                _flush()
+                title, body = None, []
+            elif title is not None:
+                body.append(line)
+    _flush()
+    return sections
+
+
+class KnowledgeBase:
+    """
+    BM25 index over every toyota_*_kb.md section, built once per worker.
+
+    Queries may be Arabic, English or mixed; the top-k sections above a score
+    threshold are returned for injection into the turn's context.
+    """
+
+    def __init__(self, directory: str = KNOWLEDGE_DIR):
+        self.directory = directory
+        self.sections: List[KnowledgeSection] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 0.0
+
+    @property
+    def built(self) -> bool:
+        return bool(self.sections)
+
+    def build(self) -> int:
+        started = time.perf_counter()
+        sections: List[KnowledgeSection] = []
+        for path in sorted(glob.glob(os.path.join(self.directory, KNOWLEDGE_GLOB))):
+            sections.extend(parse_knowledge_file(path))
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths: List[int] = []
+        for index, section in enumerate(sections):
+            # Titles and headings count twice: they name what the section is about
+            tokens = tokenize(f"{section.title} {section.title} {section.heading} {section.body}")
+            lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                postings[term].append((index, count))
+
+        total = len(sections)
+        self.sections = sections
+        self._postings = dict(postings)
+        self._lengths = lengths
+        self._avg_length = sum(lengths) / total if total else 0.0
+        self._idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self._postings.items()
+        }
+        logger.info(
+            "Knowledge base indexed %d sections in %.1f ms",
+            total, (time.perf_counter() - started) * 1000,
+        )
+        return total
+
+    def search(
+        self,
+        query: str,
+        k: int = KNOWLEDGE_TOP_K,
+        min_score: float = KNOWLEDGE_MIN_SCORE,
+        source: Optional[str] = None,
+    ) -> List[Tuple[KnowledgeSection, float]]:
+        """Top-k sections for query, optionally limited to one knowledge-base file"""
+        if not self.built:
+            self.build()
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index, count in self._postings[term]:
+                if source and self.sections[index].source != source:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[index] / self._avg_length)
+                scores[index] += idf * count * (BM25_K1 + 1) / (count + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.sections[i], score) for i, score in ranked[:k] if score >= min_score]
+
+    def find_branch(self, location_type: str, query: str = "") -> Optional[KnowledgeSection]:
+        """Best branch of a type ("showroom", "service", "parts") for what the caller said, else the first listed"""
+        source = BRANCH_SOURCES.get(location_type, BRANCH_SOURCES["showroom"])
+        if not self.built:
+            self.build()
+        branches = [s for s in self.sections if s.source == source and "contact" in s.fields()]
+        if query:
+            for section, _ in self.search(query, k=len(self.sections), min_score=0.0, source=source):
+                if section in branches:
+                    return section
+        return branches[0] if branches else None
+
+    def context_for(self, query: str, max_chars: int = KNOWLEDGE_MAX_CHARS) -> Optional[str]:
+        """Top-k snippets for a user utterance as one system note, or None if nothing matches"""
+        snippets: List[str] = []
+        used = 0
+        for section, _ in self.search(query):
+            snippet = section.snippet()
+            if snippets and used + len(snippet) > max_chars:
+                break
+            snippets.append(snippet)
+            used += len(snippet)
+        if not snippets:
+            return None
+        return "Toyota Kuwait knowledge base (use only if relevant):\n\n" + "\n\n".join(snippets)
+
+
+# One index per worker process, built in prewarm
+knowledge_base = KnowledgeBase()
@@ -2,12 +2,9 @@ import asyncio
 import logging
 import os
 import uuid
-from datetime import datetime
-from livekit.plugins import azure
-from livekit.plugins.elevenlabs.tts import VoiceSettings
+from typing import Optional
 
 from dotenv import load_dotenv
-from livekit import rtc
 from livekit.agents import (
     AutoSubscribe,
     JobContext,
@@ -15,15 +12,30 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     llm,
-    metrics,
     ConversationItemAddedEvent,
 )
 from livekit.agents import Agent, AgentSession, RoomInputOptions, RoomOutputOptions
-from livekit.plugins import silero, elevenlabs, openai
+from livekit.plugins import silero
 from livekit.plugins import noise_cancellation
 
 # Import Toyota tools
 from toyota_tools import ToyotaTools
+from toyota_caller_context import CallerContext, CallerPrefetch
+from toyota_transcripts import TranscriptWriter
+from toyota_metrics import SessionMetrics
+from get_client_data_tool import client_directory
+from toyota_http import init_http_clients
+from toyota_knowledge import knowledge_base
+from toyota_history import HistoryManager
+from toyota_catalog import vehicle_catalog
+from toyota_media import media_cache
+from toyota_intents import CAR_IMAGE, GREETING, LOCATION, IntentMatch, intent_matcher
+from toyota_prompt import CANNED_PHRASES, GREETING as GREETING_TEXT, PROMPT_VERSION, SYSTEM_PROMPT, describe_prompt
+from toyota_tts import on_first_frame, synthesize_clauses, tts_cache
+from toyota_providers import build_providers
+from toyota_speculation import SpeculativeLookups
+from toyota_capacity import worker_capacity
+from toyota_logging import bind_participant, bind_session, configure_logging
 
 # ──────────────────────────
 # Environment / logging
@@ -34,32 +46,36 @@ load_dotenv(
 )
 
 logger = logging.getLogger("toyota-voice-assistant")
-logging.basicConfig(level=logging.INFO)
-
-# Simple function to log responses to a file
-def log_to_file(text, prefix="LOG"):
-    try:
-        log_file = os.path.join(os.path.dirname(__file__), "toyota_llm_responses.txt")
-        print(f"[log_to_file] writing to: {log_file}")
-        
-        try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(f"\n\n--- {prefix} [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ---\n")
-                f.write(text)
-            
-            print(f"\n\n=== {prefix} ===\n{text}\n=== END {prefix} ===\n\n")
-        except Exception as e:
-            print(f"[log_to_file] ERROR writing: {e}")
-    except Exception as e:
-        print(f"Error logging to file: {e}")
 
 def prewarm(proc: JobProcess):
-    """Pre-load the Silero VAD model once per worker."""
+    """Pre-load the Silero VAD model, the LLM/STT/TTS clients, the knowledge-base index, the WhatsApp media ids, the cached CRM clients, the canned-phrase audio and the HTTP pools once per worker."""
+    configure_logging()
     proc.userdata["vad"] = silero.VAD.load(
         activation_threshold=0.45,
         min_speech_duration=0.15,
         min_silence_duration=0.35
     )
+    proc.userdata["providers"] = build_providers()
+    knowledge_base.build()
+    logger.info(describe_prompt())
+
+    # Local reads only: anything needing the network would count against LiveKit's
+    # process init timeout, so uploads and synthesis are left to the call (entrypoint)
+    media_cache.load()
+    client_directory.load()
+    tts_cache.load(CANNED_PHRASES)
+    init_http_clients()
+
+# Transcript label of each committed chat message, by role
+TRANSCRIPT_LABELS = {"user": "USER MESSAGE", "assistant": "TOYOTA ASSISTANT RESPONSE"}
+
+
+def log_conversation_item(transcript: TranscriptWriter, ev: ConversationItemAddedEvent):
+    """AgentSession "conversation_item_added" handler: every user and assistant message, greeting included"""
+    label = TRANSCRIPT_LABELS.get(getattr(ev.item, "role", None))
+    text = getattr(ev.item, "text_content", None)
+    if label and text:
+        transcript.log(text, f"{label} (INTERRUPTED)" if ev.item.interrupted else label)
 
 # ──────────────────────────
 # Custom Toyota Agent
@@ -69,69 +85,138 @@ class ToyotaKuwaitAgent(Agent):
         self,
         session_id: str,
         participant_identity: str,
+        transcript: TranscriptWriter,
+        session_metrics: Optional[SessionMetrics] = None,
     ):
-        super().__init__(instructions=_TOYOTA_SYSTEM_PROMPT)
+        super().__init__(instructions=SYSTEM_PROMPT)
         self.session_id = session_id
         self.participant_identity = participant_identity
+        self.transcript = transcript
+        self.session_metrics = session_metrics
+        self.history = HistoryManager()
+        if session_metrics:
+            session_metrics.prompt_version = PROMPT_VERSION
         self.client_phone = None
         self.client_data = None
+        self.caller_context = None
+        # The caller's CRM lookup, started once their phone number is known
+        self.caller_prefetch: Optional[CallerPrefetch] = None
+        # Set by the entrypoint; source of background WhatsApp delivery notes
+        self.toyota_tools: Optional[ToyotaTools] = None
 
     # ------------------------------------------------------------------
     # Incoming user message
     # ------------------------------------------------------------------
     async def on_message(self, message, context):
-        # Log the user message
-        log_to_file(message.text, "USER MESSAGE")
+        # One pass over the transcript for every intent and entity
+        match = intent_matcher.match(message.text)
 
         # Check if this is a greeting and we need to get client data
-        if self._is_greeting(message.text) and not self.client_data:
+        if match.has(GREETING) and not self.client_data:
             await self._handle_client_identification(message.text, context)
 
         # Check if user is asking about car images
-        if self._is_car_image_request(message.text):
-            await self._handle_car_image_request(message.text, context)
+        if match.has(CAR_IMAGE):
+            await self._handle_car_image_request(match, context)
 
         # Check if user is asking for location
-        if self._is_location_request(message.text):
-            await self._handle_location_request(message.text, context)
+        if match.has(LOCATION):
+            await self._handle_location_request(match, context, message.text)
+
+        logger.debug("Calling LLM for Toyota response")
 
-        print("\n\n=== CALLING LLM FOR TOYOTA RESPONSE ===\n\n")
-        
         # Call the parent method
         response = await super().on_message(message, context)
-        
+
         if response is not None:
-            response_text = getattr(response, "text", str(response))
-            print(f">>> Toyota LLM response: {response_text!r}", flush=True)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Toyota LLM response: %r", getattr(response, "text", response))
         else:
-            print(">>> super().on_message returned None", flush=True)
-            
+            logger.debug("super().on_message returned None")
+
         return response
 
     # ------------------------------------------------------------------
     # Outgoing assistant response
     # ------------------------------------------------------------------
     async def on_response(self, response, context):
-        log_to_file(response.text, "TOYOTA ASSISTANT RESPONSE")
         return await super().on_response(response, context)
 
+    async def on_user_turn_completed(self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage):
+        """Compact the history if it is over budget, then add the caller's CRM data (on a greeting), WhatsApp delivery notes and the relevant knowledge-base sections"""
+        text = new_message.text_content or ""
+        compacted = self.history.compact(self.chat_ctx)
+        if compacted is not None:
+            await self.update_chat_ctx(compacted)
+            turn_ctx.items[:] = compacted.copy().items
+
+        # Greeting before the caller is identified (prefetch still running or failed)
+        if self.caller_context is None and intent_matcher.match(text).has(GREETING):
+            await self._identify_on_greeting(turn_ctx)
+
+        if self.toyota_tools:
+            updates = self.toyota_tools.drain_delivery_updates()
+            if updates:
+                turn_ctx.add_message(role="system", content="\n".join(updates))
+
+        knowledge = knowledge_base.context_for(text)
+        if knowledge:
+            turn_ctx.add_message(role="system", content=knowledge)
+        await super().on_user_turn_completed(turn_ctx, new_message)
+
+    def tts_node(self, text, model_settings):
+        """Play cached audio for canned replies (fallback line), otherwise synthesize clause by clause"""
+        tts = self.session.tts
+        if tts is not None and tts.capabilities.streaming:
+            return tts_cache.speak(text, lambda chunks: synthesize_clauses(tts, chunks))
+        return tts_cache.speak(text, lambda chunks: Agent.default.tts_node(self, chunks, model_settings))
+
+    def llm_node(self, chat_ctx: llm.ChatContext, tools, model_settings):
+        """Record the assembled prompt size, then run the default LLM node"""
+        if self.session_metrics:
+            self.session_metrics.record_prompt_size(self.history.tokens(chat_ctx.items))
+        return Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+
+    def start_caller_prefetch(self, phone_number: str) -> CallerPrefetch:
+        """Start looking the caller up in the CRM, unless already under way"""
+        if self.caller_prefetch is None:
+            self.caller_prefetch = CallerPrefetch(phone_number)
+        return self.caller_prefetch
+
+    async def attach_caller_context(self, caller: CallerContext) -> bool:
+        """Adopt the prefetched CRM data and hand it to the LLM; False if already adopted"""
+        if self.caller_context is not None:
+            return False
+        self.caller_context = caller
+        self.client_phone = caller.phone_number
+        if caller.client:
+            self.client_data = caller.summary()
+        if self.toyota_tools:
+            self.toyota_tools.update_client_info(self.client_data, caller.phone_number)
+
+        chat_ctx = self.chat_ctx.copy()
+        chat_ctx.add_message(role="system", content=caller.summary())
+        await self.update_chat_ctx(chat_ctx)
+        return True
+
     # ------------------------------------------------------------------
     # Helper methods for Toyota-specific functionality
     # ------------------------------------------------------------------
-    def _is_greeting(self, text):
-        """Check if the message is an Arabic greeting"""
-        greetings = ["هلا", "سلام عليكم", "السلام عليكم", "مرحبا", "أهلا"]
-        return any(greeting in text for greeting in greetings)
-
-    def _is_car_image_request(self, text):
-        """Check if user is requesting car images"""
-        image_keywords = ["أبي أشوف صورة", "صورة السيارة", "شكل السيارة", "show me", "image", "picture"]
-        return any(keyword in text.lower() for keyword in image_keywords)
-
-    def _is_location_request(self, text):
-        """Check if user is requesting location information"""
-        location_keywords = ["وين", "أقرب معرض", "مركز الخدمة", "موقع", "عنوان", "where", "location", "address"]
-        return any(keyword in text.lower() for keyword in location_keywords)
+    async def _identify_on_greeting(self, turn_ctx: llm.ChatContext):
+        """Give this turn the caller's profile, from the prefetch in flight or a new one"""
+        phone_number = self.client_phone or self._extract_phone_from_call_system()
+        if not phone_number:
+            return
+        try:
+            caller = await self.start_caller_prefetch(phone_number).result()
+        except Exception as e:
+            logger.warning("Caller identification on greeting failed: %r", e)
+            return
+        await self.attach_caller_context(caller)
+        # turn_ctx was copied before the profile reached chat_ctx, whichever path attached it
+        summary = caller.summary()
+        if not any(item.role == "system" and item.text_content == summary for item in turn_ctx.items):
+            turn_ctx.add_message(role="system", content=summary)
 
     async def _handle_client_identification(self, message_text, context):
         """Handle client identification using phone number"""
@@ -159,16 +244,16 @@ class ToyotaKuwaitAgent(Agent):
                 context.add_system_message("Failed to fetch client data")
 
         except Exception as e:
-            print(f"Error handling client identification: {e}")
+            logger.warning("Error handling client identification: %s", e)
 
     def _extract_phone_from_call_system(self):
         """Extract phone number from caller identity (participant identity)"""
         try:
             if not self.participant_identity:
-                print("No participant identity available")
+                logger.debug("No participant identity available")
                 return None
 
-            print(f"Extracting phone from participant identity: {self.participant_identity}")
+            logger.debug("Extracting phone from participant identity: %s", self.participant_identity)
 
             import re
 
@@ -178,113 +263,68 @@ class ToyotaKuwaitAgent(Agent):
             match = re.search(phone_pattern, self.participant_identity)
             if match:
                 phone_number = match.group(0)
-                print(f"Extracted phone number: {phone_number}")
+                logger.debug("Extracted phone number: %s", phone_number)
                 return phone_number
 
             # Fallback for Kuwait-specific numbers without country code
             # Check if identity is 8 digits (Kuwait mobile number without country code)
             if re.match(r'^\d{8}$', self.participant_identity):
                 phone_number = f"+965{self.participant_identity}"
-                print(f"Added Kuwait country code to number: {phone_number}")
+                logger.debug("Added Kuwait country code to number: %s", phone_number)
                 return phone_number
 
             # Handle cases with different formatting (Kuwait specific)
             digits_only = re.sub(r'\D', '', self.participant_identity)
             if digits_only.startswith('965') and len(digits_only) == 11:
                 phone_number = f"+{digits_only}"
-                print(f"Formatted Kuwait phone number: {phone_number}")
+                logger.debug("Formatted Kuwait phone number: %s", phone_number)
                 return phone_number
             elif len(digits_only) == 8:
                 phone_number = f"+965{digits_only}"
-                print(f"Added Kuwait country code to digits: {phone_number}")
+                logger.debug("Added Kuwait country code to digits: %s", phone_number)
                 return phone_number
 
-            print(f"Could not extract a valid phone number from: {self.participant_identity}")
+            logger.info("Could not extract a valid phone number from: %s", self.participant_identity)
             return None
 
         except Exception as e:
-            print(f"Error extracting phone from caller identity: {e}")
+            logger.warning("Error extracting phone from caller identity: %s", e)
             return None
 
-    async def _handle_car_image_request(self, message_text, context):
+    async def _handle_car_image_request(self, match: IntentMatch, context):
         """Handle car image requests"""
         try:
             if not self.client_phone:
                 context.add_system_message("Cannot send car image, client phone number is not available.")
                 return
-            car_name = self._extract_car_name(message_text)
-            description = self._get_car_description(car_name)
+            model = vehicle_catalog.get(match.car_model) or vehicle_catalog.get("camry")  # Default
+            car_name = model.name_ar
+            description = model.description_ar
             # ✅ invoke tool via context (following BurgerKing pattern)
             result = await context.run_tool(
                 "send_car_image",
                 car_name=car_name,
                 description=description or ""  # ✅ ensure str, never None
             )
-            context.add_system_message(f"Car image sent: {result}")
+            context.add_system_message(f"Car image queued: {result}")
         except Exception as e:
-            print(f"Error handling car image request: {e}")
+            logger.warning("Error handling car image request: %s", e)
 
-    async def _handle_location_request(self, message_text, context):
+    async def _handle_location_request(self, match: IntentMatch, context, text: str = ""):
         """Handle location requests"""
         try:
             if not self.client_phone:
                 return
-            location_type = self._determine_location_type(message_text)
+            location_type = match.location_type
             # ✅ invoke tool via context (following BurgerKing pattern)
             result = await context.run_tool(
                 "send_location",
-                location_type=location_type
+                location_type=location_type,
+                branch=text
             )
-            context.add_system_message(f"Location sent: {result}")
+            context.add_system_message(f"Location queued: {result}")
         except Exception as e:
-            print(f"Error handling location request: {e}")
-
-    def _extract_car_name(self, text):
-        """Extract car name from user message"""
-        car_models = {
-            "كورولا": "Corolla",
-            "كامري": "Camry", 
-            "برادو": "Prado",
-            "لاند كروزر": "Land Cruiser",
-            "هايلكس": "Hilux",
-            "ريز": "Raize",
-            "فورتنر": "Fortuner"
-        }
-        
-        for arabic_name, english_name in car_models.items():
-            if arabic_name in text or english_name.lower() in text.lower():
-                return arabic_name
-        
-        return "كامري"  # Default
-
-    def _get_car_image_url(self, car_name):
-        """Get image URL for specific car model"""
-        car_images = {
-            "كامري": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/fc96a3af30e07dd8da9ae20762089ce5/960x600_camry_me_2406_213.png",
-            "برادو": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/563a9350dad1053e12e4344f708f1ced/ext_2.png",
-            "لاند كروزر": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/44c7695bf5cf4abdb7ce4beec883486d/land_cruiser.png"
-        }
-        
-        return car_images.get(car_name, car_images["كامري"])
-
-    def _get_car_description(self, car_name):
-        """Get description for specific car model"""
-        descriptions = {
-            "كامري": "سيارة سيدان تنفيذية فاخرة مع تقنيات متقدمة وراحة استثنائية",
-            "برادو": "سيارة دفع رباعي فاخرة مثالية للعائلات والرحلات الطويلة",
-            "لاند كروزر": "سيارة دفع رباعي فاخرة بحجم كامل مع قدرات استثنائية على الطرق الوعرة"
-        }
-        
-        return descriptions.get(car_name, "سيارة تويوتا عالية الجودة والموثوقية")
-
-    def _determine_location_type(self, text):
-        """Determine what type of location user is asking for"""
-        if "معرض" in text or "showroom" in text.lower():
-            return "showroom"
-        elif "خدمة" in text or "service" in text.lower():
-            return "service"
-        else:
-            return "showroom"  # Default
+            logger.warning("Error handling location request: %s", e)
 
 # ──────────────────────────
 # Entrypoint
@@ -293,24 +333,46 @@ async def entrypoint(ctx: JobContext):
     session = None
     try:
         session_id = str(uuid.uuid4())
-        print(f"\n\n=== TOYOTA SESSION STARTING: {session_id} ===\n\n")
+        bind_session(session_id)
+        logger.info("Toyota session starting")
+        # Per-turn latency breakdown and call-setup trace, exported when the call ends
+        session_metrics = SessionMetrics(session_id)
+
+
+        # Per-session transcript, written off the event loop and flushed on shutdown
+        transcript = TranscriptWriter(session_id)
+        transcript.start()
+        ctx.add_shutdown_callback(transcript.aclose)
 
-        # LLM client
-        llm_client = openai.LLM(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model="gpt-4o",
-            temperature=0.2,
-        )
+
+        async def _write_metrics_report():
+            path = await asyncio.to_thread(session_metrics.write_report)
+            logger.info("Latency report written to %s", path)
+
+        ctx.add_shutdown_callback(_write_metrics_report)
+
+        # Provider clients built in prewarm; open their connections while the room connects
+        trace = session_metrics.setup
+        with trace.phase("providers"):
+            providers = ctx.proc.userdata.get("providers") or build_providers()
+            providers.prewarm()
+
+        # Best-effort cache fills in the background: catalog images not yet uploaded to
+        # WhatsApp and canned phrases not yet synthesized (the next calls reuse both files)
+        fill_tasks = [
+            asyncio.create_task(media_cache.warm(model.image_url for model in vehicle_catalog if model.image_url)),
+            asyncio.create_task(tts_cache.prepare(CANNED_PHRASES, providers.tts)),
+        ]
+        for task in fill_tasks:
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # failures only cost the cache
 
         # Connect to the room
-        await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
-        participant = await ctx.wait_for_participant()
-        print(f"\n\n=== PARTICIPANT CONNECTED: {participant.identity} ===\n\n")
+        await trace.timed("connect", ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY))
 
         # Handle disconnects
         @ctx.room.on("participant_disconnected")
         def on_participant_disconnected(p):
-            print(f"\n\n=== PARTICIPANT DISCONNECTED: {p.identity} ===\n\n")
+            logger.info("Participant disconnected: %s", p.identity)
             async def _cleanup_and_shutdown():
                 if session:
                     await session.aclose()
@@ -318,42 +380,62 @@ async def entrypoint(ctx: JobContext):
 
             asyncio.create_task(_cleanup_and_shutdown())
 
-        
-        
-
-        # Build session
-        session = AgentSession(
-            vad=ctx.proc.userdata["vad"],
-            stt=azure.STT(
-                speech_key=os.getenv("AZURE_SPEECH_KEY"),
-                speech_region=os.getenv("AZURE_SPEECH_REGION"),
-                language="ar-KW",
-                # sample_rate=16000,
-                # segmentation_silence_timeout_ms=300,
-            ),
-            llm=llm_client,
-            tts=elevenlabs.TTS(
-                api_key=os.getenv("ELEVEN_API_KEY"),
-                model="eleven_multilingual_v2",
-                voice_id="nU39tgunJTx5rQiBJfzc",  # Arabic voice
-                voice_settings=VoiceSettings(
-                    stability=0.5,
-                    similarity_boost=0.6,
-                    speed=1,
-                ),
-            ),
-        )
-
-        # Tools + agent
-        agent = ToyotaKuwaitAgent(
-            session_id=session_id,
-            participant_identity=participant.identity,
-        )
-        phone_number = agent._extract_phone_from_call_system()
-        toyota_tools = ToyotaTools(session=session, client_phone=phone_number)
-        if phone_number:
-            agent.client_phone = phone_number
-        await agent.update_tools([
+        # Build session, agent and tools; none of it needs the caller, so it
+        # runs while the caller joins
+        with trace.phase("session_build"):
+            session = AgentSession(
+                vad=ctx.proc.userdata["vad"],
+                stt=providers.stt,
+                llm=providers.llm,
+                tts=providers.tts,
+            )
+            session_metrics.attach(session)
+            session.on("conversation_item_added", lambda ev: log_conversation_item(transcript, ev))
+
+            agent = ToyotaKuwaitAgent(
+                session_id=session_id,
+                participant_identity="",
+                transcript=transcript,
+                session_metrics=session_metrics,
+            )
+            # CRM and WhatsApp fetches started from interim transcripts, before the turn ends
+            speculation = SpeculativeLookups(
+                client_id=lambda: agent.caller_context.client_id if agent.caller_context else None,
+                session_metrics=session_metrics,
+            )
+            session.on("user_input_transcribed", lambda ev: speculation.on_transcript(ev.transcript, ev.is_final))
+            toyota_tools = ToyotaTools(
+                session=session,
+                session_metrics=session_metrics,
+            )
+            agent.toyota_tools = toyota_tools
+            # Give this call's queued WhatsApp messages a bounded chance to go out
+            ctx.add_shutdown_callback(toyota_tools.aflush_outbound)
+
+        async def _identify_caller():
+            """Wait for the caller, then start warming their CRM data right away"""
+            participant = await trace.timed("wait_for_participant", ctx.wait_for_participant())
+            bind_participant(participant.identity)
+            logger.info("Participant connected: %s", participant.identity)
+            agent.participant_identity = participant.identity
+            phone_number = agent._extract_phone_from_call_system()
+            if phone_number:
+                agent.client_phone = phone_number
+                toyota_tools.update_client_info(toyota_tools.client_data, phone_number)
+            # Warm up the caller's CRM data while the session starts and the greeting plays
+            prefetch = agent.start_caller_prefetch(phone_number) if phone_number else None
+            if prefetch:
+                # Times the profile fetch itself; its errors surface where the call awaits it
+                asyncio.ensure_future(trace.timed("caller_prefetch", asyncio.wait({prefetch.profile})))
+            return prefetch
+
+        identify_task = asyncio.create_task(_identify_caller())
+
+        # Greeting audio: loaded in prewarm, or synthesized from now on (one synthesis,
+        # shared with the background prepare) so it is ready by the time the session is
+        greeting_audio = tts_cache.stream(GREETING_TEXT, providers.tts)
+
+        await trace.timed("update_tools", agent.update_tools([
             toyota_tools.get_client_data,
             toyota_tools.create_client,
             toyota_tools.get_vehicle_data,
@@ -361,10 +443,10 @@ async def entrypoint(ctx: JobContext):
             toyota_tools.send_location,
             toyota_tools.create_service_ticket,
             toyota_tools.get_service_tickets,
-        ])
+        ]))
 
         # Start session
-        await session.start(
+        await trace.timed("session_start", session.start(
             room=ctx.room,
             agent=agent,
             room_input_options=RoomInputOptions(
@@ -374,364 +456,51 @@ async def entrypoint(ctx: JobContext):
             room_output_options=RoomOutputOptions(
                 # transcription_enabled=True,
             ),
-        )
-        print("Toyota session started successfully")
+        ))
+        logger.info("Toyota session started")
+
+        prefetch = await identify_task
 
         # Greeting
-        greeting = "السلام عليكم ورحمة الله وبركاته، حياك الله في تويوتا الساير، معك فاطمة، كيف أقدر أخدمك اليوم؟"
-        log_to_file(greeting, "INITIAL GREETING")
-        await session.say(greeting, allow_interruptions=False)
+        greeting_handle = session.say(
+            GREETING_TEXT,
+            audio=on_first_frame(greeting_audio, session_metrics.record_greeting_audio),
+            allow_interruptions=False,
+        )
+
+        if prefetch:
+            try:
+                await agent.attach_caller_context(await prefetch.result())
+            except Exception as e:
+                # A greeting turn waits on the same prefetch again
+                logger.warning("Caller prefetch not ready: %r", e)
+
+        await greeting_handle
 
         # ⬇️ Keep session alive until shutdown
         await asyncio.Event().wait()
 
     except Exception as e:
-        print(f"Unexpected error in Toyota entrypoint: {e}")
-        logger.error(f"Unexpected error in Toyota entrypoint: {e}", exc_info=True)
+        logger.error("Unexpected error in Toyota entrypoint: %s", e, exc_info=True)
         await ctx.shutdown("unexpected_error")
 
     # ✅ Cleanup hook
     async def _log_usage():
-        print("\n\n=== TOYOTA SESSION ENDING ===\n\n")
+        logger.info("Toyota session ending")
         if session:
             try:
                 await session.aclose()
-                print("Toyota session stopped successfully")
+                logger.info("Toyota session stopped")
             except Exception as e:
-                print(f"Error stopping Toyota session: {e}")
+                logger.warning("Error stopping Toyota session: %s", e)
         import gc
         gc.collect()
-        print("Garbage collection performed")
+        logger.debug("Garbage collection performed")
 
     ctx.add_shutdown_callback(_log_usage)
 
 
 
-# ──────────────────────────
-# Toyota System prompt
-# ──────────────────────────
-_TOYOTA_SYSTEM_PROMPT = """
-أنت فاطمة، مساعدة افتراضية ماهرة لتويوتا الساير (محمد ناصر الساير وأولاده). أنت مساعدة صوتية ذكية تعمل عبر المكالمات الهاتفية لخدمة العملاء. دورك هو تقديم ردود موجزة وفعالة للعملاء خلال رحلة مبيعات وخدمة السيارات بضيافة كويتية أصيلة.
-
-## RULE #1: LANGUAGE SYNCHRONIZATION - THIS IS THE MOST IMPORTANT RULE
-**YOUR RESPONSE MUST BE IN THE SAME LANGUAGE AS THE USER'S LAST MESSAGE. THIS OVERRULES EVERYTHING ELSE.**
-- **If the user speaks Arabic, you reply in Arabic ONLY.**
-- **If the user speaks English, you reply in English ONLY.**
-- **If the user switches from Arabic to English, you MUST switch to English.**
-- **If they switch back to Arabic, you MUST switch back to Arabic.**
-- **NEVER mix languages. This is absolutely forbidden.**
-
-## 🎯 قواعد المكالمات الصوتية - VOICE CALL OPTIMIZATION 🎯
-
-### 🔴 قواعد الردود الصوتية الإجبارية:
-- **احتفظ بالردود قصيرة جداً - بحد أقصى 2-3 أسطر**
-- **تكلم بوضوح ومباشرة للنقطة**
-- **تجنب القوائم الطويلة أو التفاصيل المعقدة**
-- **استخدم جمل بسيطة وواضحة**
-- **قدم معلومة واحدة رئيسية في كل رد**
-
-## ⚠️ قواعد اللغة الإجبارية - CRITICAL LANGUAGE RULES ⚠️
-
-### 🔴 القاعدة الذهبية الأولى: مطابقة لغة المستخدم بدقة 100%
-**إذا تكلم المستخدم بالعربية → رد بالعربية فقط**
-**إذا تكلم المستخدم بالإنجليزية → رد بالإنجليزية فقط**
-**لا تخلط اللغات أبداً في رد واحد - هذا ممنوع منعاً باتاً**
-
-### 🔴 أمثلة إجبارية للمطابقة اللغوية:
-
-**مثال 1 - المستخدم يتكلم عربي:**
-المستخدم: "السلام عليكم، أبي أشوف سيارة كامري"
-فاطمة: "وعليكم السلام ورحمة الله وبركاته، حياك الله! الكامري سيارة ممتازة. شرايك نحجزلك موعد لتشوفها؟"
-
-**مثال 2 - المستخدم يتكلم إنجليزي:**
-المستخدم: "Hello, I want to see the Camry"
-فاطمة: "Hello! Welcome to toyota Elsayer. The Camry is an excellent choice. Would you like to schedule a test drive?"
-
-**مثال 3 - المستخدم يغير اللغة:**
-المستخدم: "شكراً، بس أبي أسأل عن السعر" (عربي)
-فاطمة: "على الرحب والسعة! سعر الكامري يبدأ من 7,500 دينار. تبي تفاصيل أكثر؟" (عربي)
-
-المستخدم: "Can you send me the brochure?" (إنجليزي)
-فاطمة: "Of course! I'll send you the Camry brochure right away. What's your WhatsApp number?" (إنجليزي)
-
-### 🔴 قواعد كشف اللغة الصارمة:
-
-**العربية - مؤشرات:**
-- أحرف عربية: ا، ب، ت، ث، ج، ح، خ، د، ذ، ر، ز، س، ش، ص، ض، ط، ظ، ع، غ، ف، ق، ك، ل، م، ن، ه، و، ي
-- كلمات عربية: السلام، مرحبا، أبي، شلون، شرايك، إنشالله، يعطيك العافية
-- أرقام عربية: ١، ٢، ٣، ٤، ٥، ٦، ٧، ٨، ٩، ٠
-
-**الإنجليزية - مؤشرات:**
-- أحرف لاتينية: A-Z, a-z
-- كلمات إنجليزية: Hello, Hi, Thank you, Please, Can you, I want, How much
-- أرقام إنجليزية: 1, 2, 3, 4, 5, 6, 7, 8, 9, 0
-
-### 🔴 أمثلة ممنوعة (لا تفعل هذا أبداً):
-❌ المستخدم: "أبي أشوف الكامري"
-❌ فاطمة: "حياك الله! The Camry is available for viewing" (خلط اللغات)
-
-❌ المستخدم: "Hello, I want the Camry"
-❌ فاطمة: "Welcome! الكامري متوفرة للمشاهدة" (خلط اللغات)
-
-### 🔴 حالات خاصة:
-- **أسماء السيارات**: استخدم الاسم المناسب للغة
-  - عربي: "كامري، كورولا، برادو، لاند كروزر"
-  - إنجليزي: "Camry, Corolla, Prado, Land Cruiser"
-
-- **الأرقام والأسعار**: 
-  - عربي: "سبعة آلاف وخمسمائة دينار"
-  - إنجليزي: "Seven thousand five hundred dinars"
-
-### 🔴 اختبار سريع للمطابقة:
-قبل كل رد، اسأل نفسك:
-1. ما هي لغة رسالة المستخدم؟
-2. هل ردي بنفس اللغة 100%؟
-3. هل يوجد أي خلط في اللغات؟
-
-## الهوية الأساسية والسلوك
-- مهنية ودافئة، تعكس الضيافة الكويتية الحقيقية
-- خبيرة مبيعات سيارات مع معرفة عميقة بمنتجات تويوتا
-- خبيرة خدمة عملاء مع قدرات تكامل CRM
-- حلالة مشاكل تتحمل مسؤولية قضايا العملاء
-- موجهة نحو الحلول مع نهج خيارات متعددة
-- مركزة على الاحتفاظ بالعملاء مع بناء علاقات طويلة المدى
-
-## قواعد اللغة والتواصل الصوتي
-- **احتفظ بجميع الردود قصيرة جداً - بحد أقصى 2-3 أسطر للمكالمات**
-- **تكلم بوضوح ومباشرة، تجنب التفاصيل المعقدة**
-- **استخدم جملة واحدة رئيسية لكل رد**
-- **تجنب القوائم الطويلة في المكالمات الصوتية**
-- **قدم الخيارات بشكل مبسط ومختصر**
-- **طابق لغة المستخدم بدقة 100% - هذا إجباري**
-
-## تعبيرات كويتية ثقافية
-**التحيات والمجاملات العربية:**
-- "حياك الله" (أهلاً وسهلاً)
-- "وعليكم السلام ورحمة الله وبركاته"
-- "يعطيك العافية" (شكراً/أحسنت)
-- "الله يعافيك" (رد على يعطيك العافية)
-- "جزاكم الله خير" (جزاك الله خيراً)
-- "على الرحب والسعة" (أهلاً وسهلاً)
-- "تسلم" (شكراً/بارك الله فيك)
-- "معنا ما راح تعاني" (معنا لن تعاني)
-
-**تعبيرات الأعمال الكويتية:**
-- "شرايك؟" (ما رأيك؟)
-- "شلونك؟" (كيف حالك؟)
-- "شنو رايك؟" (ما رأيك؟)
-- "إنشالله" (إن شاء الله)
-- "توكل على الله" (توكل على الله)
-- "الله يوفقك" (وفقك الله)
-
-**التحيات والمجاملات:**
-- "حياك الله" (Welcome)
-- "وعليكم السلام ورحمة الله وبركاته"
-- "يعطيك العافية" (Thank you/Well done)
-- "الله يعافيك" (Response to يعطيك العافية)
-- "جزاكم الله خير" (May God reward you)
-- "على الرحب والسعة" (You're welcome)
-- "تسلم" (Thanks/Bless you)
-
-**تعبيرات الأعمال الكويتية:**
-- "شرايك؟" (What do you think?)
-- "شلونك؟" (How are you?)
-- "إنشالله" (God willing)
-- "توكل على الله" (Trust in God)
-- "الله يوفقك" (May God grant you success)
-
-**مصطلحات كويتية عامة:**
-- "زين" (Good/Fine)
-- "طيب" (Okay/Good)
-- "تمام" (Perfect/Okay)
-- "صج؟" (Really?)
-- "وايد" (Very/A lot)
-- "شوي" (A little)
-- "باجر" (Tomorrow)
-- "اليوم" (Today)
-- "الحين" (Now)
-
-**حل المشاكل:**
-- "خلاص" (It's done/settled)
-- "ما عليك زود" (No problem at all)
-- "ترا" (You know/By the way)
-- "صدق" (Honestly/Really)
-
-## مجموعة سيارات تويوتا مع الصور
-### سيدان
-- **كورولا (Corolla)**: سيدان عائلية، موثوقة
-- **كامري (Camry)**: سيدان تنفيذية
-- **كراون (Crown)**: سيدان هجين فاخر
-
-### سيارات رياضية
-- **GR86**: كوبيه رياضية
-- **سوبرا (Supra)**: سيارة رياضية فاخرة
-
-### SUVs وكروس أوفر
-- **ريز (Raize)**: كروس أوفر مدمج
-- **كورولا كروس (Corolla Cross)**: كروس أوفر هجين
-- **برادو (Prado)**: دفع رباعي فاخر
-- **لاند كروزر (Land Cruiser)**: دفع رباعي فاخر بحجم كامل
-- **فورتنر (Fortuner)**: SUV قوي
-
-### MPVs
-- **فيلوز (Veloz)**: MPV مدمج 7 مقاعد
-- **إينوفا (Innova)**: MPV واسع 8 مقاعد
-
-### المركبات التجارية
-- **هايلكس (Hilux)**: بيك أب قياسي
-- **هايلكس ادفنشر (Hilux Adventure)**: بيك أب مغامرات
-
-## توصيات السيارات حسب الحاجة
-- **العائلة**: هايلاندر، إينوفا، فيلوز، كورولا كروس
-- **الميزانية المحدودة**: ياريس، ريز
-- **الأداء**: GR86، سوبرا، هايلكس GR-S
-- **التنقل اليومي**: كورولا، كامري، RAV4 HEV
-- **العمل/المنفعة**: هايلكس، لايت إيس، هايس
-- **الفخامة**: كراون، لاند كروزر، برادو
-- **الطرق الوعرة**: فورتنر، لاند كروزر، LC70
-
-## شبكة فروع تويوتا الساير
-### صالات العرض
-- **الأحمدي**: منطقة الأحمدي
-- **الشويخ**: منطقة الشويخ الصناعية
-- **الجهراء**: منطقة الجهراء
-- **أسواق القرين**: منطقة أسواق القرين
-
-### مراكز الخدمة
-- **الري الرئيسي**: خدمة سريعة 24/7
-- **الأحمدي**: خدمة الهيكل والدهان متوفرة
-- **الجهراء**: خدمة سريعة
-- **الفحيحيل**: خدمة سريعة
-
-## العروض والترويجات الحالية
-### عروض السيارات الجديدة
-🟡 **عروض تويوتا الساير**
-- ضمان 5 سنوات / 200,000 كم
-- مساعدة على الطريق لمدة 5 سنوات
-- حزمة راحة البال الكاملة
-
-### خدمات ما بعد البيع
-🟢 **عروض ما بعد البيع**
-- خدمة الاستلام والتوصيل المجانية
-- خدمات الصيانة السريعة
-- توفر قطع الغيار الأصلية
-
-## السلوكيات المحظورة
-- **🚫 لا تسأل أبداً عن رقم هاتف العميل - يتم الحصول عليه تلقائياً من المكالمة**
-- لا تنصح أبداً بسيارات غير تويوتا
-- لا تقدم معلومات الاتصال المباشرة بدون استخدام الأدوات
-- لا تجب على أسئلة غير متعلقة بالسيارات
-- **🚫 لا تخلط اللغات في رد واحد أبداً - هذا ممنوع منعاً باتاً**
-- **🚫 لا تنصح العملاء بالاتصال بأرقام أخرى - أنت المساعدة الصوتية الرسمية**
-- لا تنس أبداً استخدام أداة إغلاق الصفقة عند حجز المواعيد
-- **🚫 لا تستخدم كلمات إنجليزية في الرد العربي**
-- **🚫 لا تستخدم كلمات عربية في الرد الإنجليزي**
-- **🚫 تجنب الردود الطويلة في المكالمات الصوتية**
-
-## الردود الاحتياطية للمكالمات الصوتية
-- **العربية**: "عذراً، ما عندي هالمعلومة حالياً. بس أقدر أساعدك بأشياء ثانية متعلقة بتويوتا."
-- **الإنجليزية**: "Sorry, I don't have that information right now. But I can help you with other Toyota-related matters."
-
-## 🔴 أمثلة إضافية للمطابقة اللغوية المثالية:
-
-### سيناريو 1: استفسار عن السعر
-**عربي:**
-المستخدم: "كم سعر الكورولا؟"
-فاطمة: "سعر الكورولا يبدأ من 5,800 دينار. تبي تحجز موعد للمشاهدة؟"
-
-**إنجليزي:**
-المستخدم: "What's the price of Corolla?"
-فاطمة: "Corolla starts from 5,800 dinars. Would you like to book a viewing appointment?"
-
-### سيناريو 2: طلب معلومات الموقع
-**عربي:**
-المستخدم: "وين أقرب معرض؟"
-فاطمة: "أقرب معرض في الشويخ. أرسلك الموقع على الواتساب؟"
-
-**إنجليزي:**
-المستخدم: "Where's the nearest showroom?"
-فاطمة: "Nearest showroom is in Shuwaikh. Shall I send you the location on WhatsApp?"
-
-### سيناريو 3: حجز موعد صيانة
-**عربي:**
-المستخدم: "أبي أحجز موعد صيانة"
-فاطمة: "إنشالله! أي يوم يناسبك؟ عندنا مواعيد متاحة الأسبوع الجاي."
-
-**إنجليزي:**
-المستخدم: "I want to book a service appointment"
-فاطمة: "Sure! Which day works for you? We have slots available next week."
-
-### سيناريو 4: شكوى أو مشكلة
-**عربي:**
-المستخدم: "عندي مشكلة بالسيارة"
-فاطمة: "معذرة على الإزعاج. شنو المشكلة بالضبط؟ راح أساعدك أحلها."
-
-**إنجليزي:**
-المستخدم: "I have a problem with my car"
-فاطمة: "Sorry for the inconvenience. What exactly is the problem? I'll help you resolve it."
-
-## 🎯 أمثلة إضافية للمكالمات الصوتية - VOICE CALL EXAMPLES 🎯
-
-### مثال 1: رد مختصر للاستفسار العام
-**عربي:**
-المستخدم: "أبي أعرف عن سيارات تويوتا"
-فاطمة: "حياك الله! عندنا مجموعة واسعة. شنو نوع السيارة اللي تدورها؟"
-
-**إنجليزي:**
-المستخدم: "Tell me about Toyota cars"
-فاطمة: "Welcome! We have a wide range. What type of car are you looking for?"
-
-### مثال 2: تبسيط المعلومات المعقدة
-**عربي:**
-المستخدم: "شنو الفرق بين الكامري والكورولا؟"
-فاطمة: "الكامري أكبر وأفخم، والكورولا اقتصادية أكثر. أي وحدة تناسب احتياجاتك؟"
-
-**إنجليزي:**
-المستخدم: "What's the difference between Camry and Corolla?"
-فاطمة: "Camry is larger and more luxurious, Corolla is more economical. Which suits your needs?"
-
-### مثال 3: توجيه سريع للعمل
-**عربي:**
-المستخدم: "أبي أحجز تست درايف"
-فاطمة: "ممتاز! أي سيارة تبي تجربها؟ وأي يوم يناسبك؟"
-
-**إنجليزي:**
-المستخدم: "I want to book a test drive"
-فاطمة: "Excellent! Which car would you like to try? And which day works for you?"
-
-## التذكيرات النهائية للمكالمات الصوتية
-- **احتفظ بالردود قصيرة جداً - بحد أقصى 2-3 أسطر للمكالمات**
-- **تكلم بوضوح ومباشرة، تجنب التعقيد**
-- **استخدم التعبيرات الكويتية بطبيعية (في الردود العربية فقط)**
-- **قدم حلول مبسطة ومباشرة**
-- **🔴 طابق لغة المستخدم بدقة 100% - هذا الأهم**
-- **اجمع تفاصيل العميل بشكل مختصر وفعال**
-- **استخدم أداة إغلاق الصفقة عند الحجز**
-- **ابن العلاقات من خلال الاتصال الثقافي الأصيل**
-- **🎯 تذكر: أنت مساعدة صوتية - اجعل كل رد واضح ومفيد للمكالمة**
-
-## 🚗 تقنيات البيع والمقارنة مع المنافسين 🚗
-عندما يقارن العميل سيارة تويوتا مع منافس (مثل كيا سبورتاج)، اتبع هذه الاستراتيجية:
-1.  **اعترف بالمنافس بإيجابية**: "نعم، سيارة [اسم المنافس] خيار جيد في السوق."
-2.  **أعد التركيز على نقاط قوة تويوتا**: "لكن ما يميز [سيارة تويوتا] هو اعتماديتها الأسطورية وقيمتها عند إعادة البيع، وهذه نقاط مهمة جداً على المدى الطويل."
-3.  **سلط الضوء على ميزة فريدة**: "بالإضافة إلى ذلك، تتميز [سيارة تويوتا] بنظام [ميزة محددة] الذي يوفر لك [فائدة للعميل]."
-4.  **ادعُ للتجربة الشخصية**: "الأرقام والورق شيء، لكن التجربة الفعلية شيء آخر. شرايك تحجز موعد لتجربة قيادة [سيارة تويوتا] وتحس بالفرق بنفسك؟"
-
-**مثال على المقارنة:**
-العميل: "أنا أفكر بين تويوتا راف فور وكيا سبورتاج."
-فاطمة: "كيا سبورتاج سيارة ممتازة بالتأكيد. لكن اللي يميز الراف فور هو سمعتها القوية في الاعتمادية وقيمتها اللي تحافظ عليها عند البيع. شرايك تجربها بنفسك وتحس بالفرق في الجودة اليابانية؟"
-
-### 🔴 تذكير أخير - قواعد اللغة الحديدية:
-1. **اقرأ رسالة المستخدم بعناية**
-2. **حدد اللغة (عربي أم إنجليزي)**
-3. **رد بنفس اللغة 100%**
-4. **لا تخلط اللغات أبداً**
-5. **تأكد من ردك قبل الإرسال**
-
-عندما يطلب العميل رؤية صور السيارات، استخدم أداة إرسال صور السيارات لإرسال الصور عبر الواتساب.
-عندما يطلب العميل معلومات الموقع، استخدم أداة إرسال الموقع لإرسال تفاصيل الفروع.
-"""
-
 # ──────────────────────────
 # Main
 # ──────────────────────────
@@ -742,5 +511,9 @@ if __name__ == "__main__":
         WorkerOptions(
             entrypoint_fnc=entrypoint,
             prewarm_fnc=prewarm,
+            # Admission control: saturated workers stop taking calls instead of degrading every active one
+            request_fnc=worker_capacity.request,
+            load_fnc=worker_capacity.load,
+            load_threshold=worker_capacity.load_threshold,
         )
     )
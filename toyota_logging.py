@@ -0,0 +1,106 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Dict, Optional
+
+# Level for the agent's own loggers (toyota-*); DEBUG traces are skipped before formatting otherwise
+LOG_LEVEL = os.getenv("TOYOTA_LOG_LEVEL", "INFO").upper()
+# "text" for the console, "json" for one object per line (log shippers)
+LOG_FORMAT = os.getenv("TOYOTA_LOG_FORMAT", "text")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(session_id)s %(participant)s] %(message)s"
+# Context fields stamped on every record
+CONTEXT_FIELDS = ("session_id", "participant")
+
+# Current call's context; asyncio tasks inherit it from the task that created them.
+# The dict is shared, so identity learned later in the call reaches tasks started earlier.
+_session_context: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("toyota_session_context")
+# Last call bound in this process, for records from callbacks LiveKit runs outside the
+# entrypoint's tasks (room events, shutdown callbacks); a job process runs one call
+_process_context: Dict[str, str] = {"session_id": "-", "participant": "-"}
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_session(session_id: str, participant: str = "-"):
+    """Tag every log record from this task (and tasks it starts) with the call's session id"""
+    global _process_context
+    _process_context = {"session_id": session_id, "participant": participant}
+    _session_context.set(_process_context)
+
+
+def bind_participant(participant: str):
+    """Add the caller's identity to the current call's context once they join"""
+    _session_context.get(_process_context)["participant"] = participant
+
+
+def _record_factory(base):
+    def factory(*args, **kwargs):
+        record = base(*args, **kwargs)
+        context = _session_context.get(_process_context)
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, context[field])
+        return record
+
+    return factory
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the session context as fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            entry[field] = getattr(record, field, "-")
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging():
+    """
+    Set up the agent's logging once per process.
+
+    Every record gets session_id and participant from the current call's
+    context. The root logger's handlers (LiveKit's, or a stderr handler
+    when nothing configured logging yet) are moved behind a QueueHandler:
+    the event loop only enqueues records, and a listener thread runs the
+    handlers' I/O.
+    """
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+    logging.setLogRecordFactory(_record_factory(logging.getLogRecordFactory()))
+
+    level = getattr(logging, LOG_LEVEL, logging.INFO)
+    # Call after importing the agent's modules, which create their loggers at import
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("toyota-"):
+            logging.getLogger(name).setLevel(level)
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if not handlers:
+        stream = logging.StreamHandler()
+        stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers = [stream]
+        root.setLevel(min(level, logging.INFO))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
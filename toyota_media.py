@@ -0,0 +1,229 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional, Set
+
+import httpx
+
+from toyota_http import REQUEST_TIMEOUT, WHATSAPP_MEDIA_PATH, whatsapp_client
+
+logger = logging.getLogger("toyota-media")
+
+# Shared by every worker on the host, so each image is uploaded once per host
+MEDIA_CACHE_PATH = os.getenv(
+    "WHATSAPP_MEDIA_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "whatsapp_media_cache.json"),
+)
+# Uploaded media ids stay valid for 30 days; stop using them a day early
+MEDIA_TTL_SECONDS = float(os.getenv("WHATSAPP_MEDIA_TTL_SECONDS", str(29 * 24 * 3600)))
+# Ids this close to expiry are still used, but re-uploaded in the background
+MEDIA_REFRESH_SECONDS = float(os.getenv("WHATSAPP_MEDIA_REFRESH_SECONDS", str(24 * 3600)))
+# After a failed upload, keep sending that image by link for this long
+MEDIA_RETRY_SECONDS = 300.0
+MEDIA_MAX_BYTES = 5 * 1024 * 1024  # WhatsApp image limit
+# How often a call waiting for another process's catalog warm-up checks its lock
+MEDIA_WARM_POLL_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class MediaEntry:
+    media_id: str
+    expires_at: float  # wall-clock epoch seconds, so entries survive restarts
+
+
+class MediaCache:
+    """
+    WhatsApp media ids for image URLs we send repeatedly (catalog car images).
+
+    lookup() never waits: it returns a cached id when one is valid, and
+    otherwise schedules a single background upload and returns None, so that
+    send goes out by link and the following ones by id. Ids are re-uploaded
+    shortly before they expire, and dropped when WhatsApp rejects one.
+    """
+
+    def __init__(self, path: str = MEDIA_CACHE_PATH, ttl: float = MEDIA_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.uploads = 0
+        self._entries: Dict[str, MediaEntry] = {}
+        self._uploading: Set[str] = set()
+        self._failed_at: Dict[str, float] = {}
+        self._rejected: Dict[str, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self):
+        """Read ids uploaded by earlier runs or sibling workers (called from prewarm)"""
+        self._entries = self._read()
+        logger.info("Media cache loaded: %s ids", len(self._entries))
+
+    def _read(self) -> Dict[str, MediaEntry]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning("Media cache unreadable, starting empty: %s", e)
+            return {}
+        now = time.time()
+        return {url: MediaEntry(**entry) for url, entry in raw.items() if entry.get("expires_at", 0) > now}
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Valid media id for url, or None (an upload is then started in the background)"""
+        entry = self._entries.get(url)
+        now = time.time()
+        if entry is None or entry.expires_at <= now:
+            self._schedule_upload(url)
+            return None
+        if entry.expires_at - now < MEDIA_REFRESH_SECONDS:
+            self._schedule_upload(url)
+        return entry.media_id
+
+    async def warm(self, urls: Iterable[str]):
+        """
+        Upload every url without a fresh id, concurrently (best-effort, in the
+        background of a call). One process on the host warms at a time, under
+        an exclusive lock next to the cache file; the next one first adopts the
+        ids saved meanwhile, so a cold host uploads the catalog once.
+        """
+        lock = await asyncio.to_thread(open, f"{self.path}.lock", "w")
+        try:
+            while not _try_lock(lock):
+                await asyncio.sleep(MEDIA_WARM_POLL_SECONDS)
+            self._adopt(await asyncio.to_thread(self._read))
+            now = time.time()
+            stale = [
+                url
+                for url in dict.fromkeys(urls)
+                if (url not in self._entries or self._entries[url].expires_at - now < MEDIA_REFRESH_SECONDS)
+                and self._claim(url)
+            ]
+            if stale:
+                await asyncio.gather(*(self._upload(url) for url in stale))
+                logger.info("Media cache warmed: %s uploads attempted, %s ids", len(stale), len(self._entries))
+        finally:
+            lock.close()
+
+    def _adopt(self, entries: Dict[str, MediaEntry]):
+        """Take ids from the file that are newer than ours, except ones WhatsApp rejected"""
+        for url, entry in entries.items():
+            if entry.media_id == self._rejected.get(url):
+                continue
+            if url not in self._entries or self._entries[url].expires_at < entry.expires_at:
+                self._entries[url] = entry
+
+    def invalidate(self, url: str):
+        """Forget an id WhatsApp no longer accepts; the next lookup re-uploads"""
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._rejected[url] = entry.media_id
+            logger.info("Media id for %s rejected, dropped", url)
+            self._start(self._asave())
+
+    def prefetch(self, url: str) -> bool:
+        """Start uploading url if it has no fresh id yet, without waiting; True if an upload was started"""
+        entry = self._entries.get(url)
+        if entry is not None and entry.expires_at - time.time() >= MEDIA_REFRESH_SECONDS:
+            return False
+        return self._schedule_upload(url)
+
+    def _schedule_upload(self, url: str) -> bool:
+        if not self._claim(url):
+            return False
+        if not self._start(self._upload(url)):
+            self._uploading.discard(url)
+            return False
+        return True
+
+    def _claim(self, url: str) -> bool:
+        """Mark url as uploading; False if it already is, or failed too recently"""
+        if url in self._uploading:
+            return False
+        if time.monotonic() - self._failed_at.get(url, float("-inf")) < MEDIA_RETRY_SECONDS:
+            return False
+        self._uploading.add(url)
+        return True
+
+    def _start(self, call) -> bool:
+        """Run call as a background task kept referenced until done; False without a running loop"""
+        try:
+            task = asyncio.get_running_loop().create_task(call)
+        except RuntimeError:  # no loop (e.g. called from sync code)
+            call.close()
+            return False
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _upload(self, url: str):
+        try:
+            # The image host gets a plain client: the Graph API token must not leak to it
+            async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT, follow_redirects=True) as client:
+                image = await client.get(url)
+                image.raise_for_status()
+            if len(image.content) > MEDIA_MAX_BYTES:
+                raise ValueError(f"{len(image.content)} bytes is over the WhatsApp image limit")
+            content_type = image.headers.get("Content-Type", "image/jpeg").split(";")[0]
+            filename = url.rstrip("/").rsplit("/", 1)[-1] or "image"
+
+            response = await whatsapp_client().post(
+                WHATSAPP_MEDIA_PATH,
+                data={"messaging_product": "whatsapp", "type": content_type},
+                files={"file": (filename, image.content, content_type)},
+            )
+            response.raise_for_status()
+            media_id = response.json()["id"]
+        except Exception as e:
+            self._failed_at[url] = time.monotonic()
+            logger.warning("Media upload failed for %s: %s", url, e)
+            return
+        finally:
+            self._uploading.discard(url)
+
+        self._entries[url] = MediaEntry(media_id, time.time() + self.ttl)
+        self._failed_at.pop(url, None)
+        self.uploads += 1
+        logger.info("Uploaded %s as media %s", url, media_id)
+        await self._asave()
+
+    async def _asave(self):
+        # File I/O off the event loop, on a snapshot the loop may keep changing
+        await asyncio.to_thread(self._save, dict(self._entries), dict(self._rejected))
+
+    def _save(self, entries: Dict[str, MediaEntry], rejected: Dict[str, str]):
+        """
+        Merge our ids into the cache file and replace it atomically. Ids from
+        sibling workers are kept unless ours is newer; two workers saving at
+        once can still lose one id, which only costs a re-upload.
+        """
+        merged = self._read()
+        for url, entry in entries.items():
+            if url not in merged or merged[url].expires_at < entry.expires_at:
+                merged[url] = entry
+        for url, media_id in rejected.items():
+            if url in merged and merged[url].media_id == media_id:
+                del merged[url]
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({url: asdict(entry) for url, entry in merged.items()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Media cache not saved: %s", e)
+
+
+def _try_lock(lock) -> bool:
+    """Take an exclusive lock on an open file without blocking; released when the file is closed"""
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+# One cache per process, read from disk in prewarm
+media_cache = MediaCache()
@@ -0,0 +1,333 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from livekit.agents import MetricsCollectedEvent, metrics
+
+logger = logging.getLogger("toyota-metrics")
+
+T = TypeVar("T")
+
+METRICS_DIR = os.getenv(
+    "TOYOTA_METRICS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics"),
+)
+# Histograms summed over every call on the host. Each job process is its own call,
+# so cross-call percentiles only exist here; merged under a file lock after every call
+METRICS_AGGREGATE_FILE = os.getenv(
+    "TOYOTA_METRICS_AGGREGATE_FILE", os.path.join(METRICS_DIR, "latency_histograms.json")
+)
+# Optional Prometheus textfile-collector target, rewritten from the aggregate after every call
+METRICS_PROM_FILE = os.getenv("TOYOTA_METRICS_PROM_FILE")
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+# Recent samples kept per histogram for percentile estimates
+RESERVOIR_SIZE = 2048
+# Turns kept per session for the per-turn breakdown
+MAX_TURNS_PER_SESSION = 200
+
+# Stage names, in pipeline order
+EOU_DELAY = "eou_delay"
+STT_FINAL_LATENCY = "stt_final_latency"
+LLM_TTFT = "llm_ttft"
+TOOL_DURATION = "tool_duration"
+TTS_TTFA = "tts_ttfa"
+# Job start to the greeting's first audio frame
+RING_TO_GREETING = "ring_to_greeting"
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts for export plus a bounded reservoir for percentiles"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._recent: deque = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self._recent.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.count += other.count
+        self._recent.extend(other._recent)
+
+    def to_dict(self) -> dict:
+        return {"counts": self.counts, "total": self.total, "count": self.count, "recent": list(self._recent)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        if len(data["counts"]) == len(histogram.counts):  # buckets unchanged since it was written
+            histogram.counts = list(data["counts"])
+            histogram.total = data["total"]
+            histogram.count = data["count"]
+            histogram._recent.extend(data["recent"])
+        return histogram
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class LatencyRegistry:
+    """Latency histograms keyed by (stage, label): one call's samples, or the host-wide totals"""
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+    def observe(self, stage: str, seconds: float, label: str = ""):
+        key = (stage, label)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def merge(self, other: "LatencyRegistry"):
+        for key, histogram in other.histograms.items():
+            self.histograms.setdefault(key, LatencyHistogram()).merge(histogram)
+
+    def to_dict(self) -> dict:
+        return {f"{stage}|{label}": histogram.to_dict() for (stage, label), histogram in self.histograms.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyRegistry":
+        registry = cls()
+        for key, histogram in data.items():
+            stage, _, label = key.partition("|")
+            registry.histograms[(stage, label)] = LatencyHistogram.from_dict(histogram)
+        return registry
+
+    def snapshot(self) -> dict:
+        return {
+            f"{stage}{'[' + label + ']' if label else ''}": histogram.snapshot()
+            for (stage, label), histogram in sorted(self.histograms.items())
+        }
+
+    def export_prometheus(self) -> str:
+        """Render every histogram in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for stage in sorted({stage for stage, _ in self.histograms}):
+            name = f"toyota_{stage}_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for (s, label), histogram in sorted(self.histograms.items()):
+                if s != stage:
+                    continue
+                tags = f'tool="{label}",' if label else ""
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{tags}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{tags}le="+Inf"}} {histogram.count}')
+                suffix = f"{{{tags.rstrip(',')}}}" if tags else ""
+                lines.append(f"{name}_sum{suffix} {histogram.total}")
+                lines.append(f"{name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, text: str):
+    """Replace path with text; a reader sees the old file or the new one, never a partial write"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as f:
+        f.write(text)
+    os.chmod(f.name, 0o644)  # readable by the metrics collector, like a plain open() would leave it
+    os.replace(f.name, path)
+
+
+def merge_into_aggregate(registry: LatencyRegistry, path: str = METRICS_AGGREGATE_FILE) -> LatencyRegistry:
+    """
+    Add one call's histograms to the host-wide aggregate file and return the new totals.
+
+    Concurrent job processes serialize on an exclusive lock next to the file.
+    The Prometheus file, if configured, is rewritten from the totals under the
+    same lock, so its counters only ever grow.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path, encoding="utf-8") as f:
+                totals = LatencyRegistry.from_dict(json.load(f))
+        except FileNotFoundError:
+            totals = LatencyRegistry()
+        except ValueError as e:
+            logger.warning("Latency aggregate %s unreadable, starting over: %s", path, e)
+            totals = LatencyRegistry()
+        totals.merge(registry)
+        _write_atomic(path, json.dumps(totals.to_dict()))
+        if METRICS_PROM_FILE:
+            _write_atomic(METRICS_PROM_FILE, totals.export_prometheus())
+    return totals
+
+
+class SetupTrace:
+    """
+    Wall-clock phases of one call's setup, from job start to the greeting.
+
+    Phases may overlap (some run concurrently), so each one is kept as its
+    start offset and duration rather than summed.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.marks: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, started)
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self._record(name, started)
+
+    def mark(self, name: str) -> float:
+        """Seconds since job start at an instant (first greeting audio); the first mark wins"""
+        return self.marks.setdefault(name, round(time.perf_counter() - self.started, 4))
+
+    def _record(self, name: str, started: float):
+        self.phases[name] = {
+            "start_s": round(started - self.started, 4),
+            "duration_s": round(time.perf_counter() - started, 4),
+        }
+
+    def summary(self) -> dict:
+        return {"phases": dict(sorted(self.phases.items(), key=lambda item: item[1]["start_s"])), "marks": self.marks}
+
+    def describe(self) -> str:
+        phases = ", ".join(
+            f"{name} {phase['duration_s'] * 1000:.0f}ms@{phase['start_s'] * 1000:.0f}"
+            for name, phase in self.summary()["phases"].items()
+        )
+        marks = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.marks.items())
+        return f"Call setup: {phases}; {marks}"
+
+
+class SessionMetrics:
+    """
+    Per-session latency recorder fed by AgentSession metrics events and tool timings.
+
+    Each turn (LiveKit speech id) collects end-of-utterance delay, STT final
+    latency, LLM time-to-first-token, tool durations and TTS time-to-first-audio;
+    the samples are merged into the host-wide histograms when the call ends.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # This call's samples only, merged into the host-wide aggregate at the end
+        self.samples = LatencyRegistry()
+        self.turns: "OrderedDict[str, dict]" = OrderedDict()
+        self.usage = metrics.UsageCollector()
+        self.prompt_version: Optional[str] = None
+        self.prompt_sizes: deque = deque(maxlen=MAX_TURNS_PER_SESSION)
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.speculative_lookups: Dict[str, int] = {}
+        self.setup = SetupTrace()
+
+    def attach(self, session):
+        session.on("metrics_collected", self._on_metrics_collected)
+
+    def record(self, stage: str, seconds: float, turn_id: Optional[str] = None, label: str = ""):
+        if seconds is None or seconds < 0:
+            return
+        self.samples.observe(stage, seconds, label)
+        if turn_id:
+            turn = self.turns.get(turn_id)
+            if turn is None:
+                turn = self.turns[turn_id] = {"started_at": time.time()}
+                while len(self.turns) > MAX_TURNS_PER_SESSION:
+                    self.turns.popitem(last=False)
+            key = f"{stage}[{label}]" if label else stage
+            turn[key] = round(turn.get(key, 0.0) + seconds, 4)
+
+    def record_tool(self, tool_name: str, seconds: float, turn_id: Optional[str] = None):
+        self.record(TOOL_DURATION, seconds, turn_id, label=tool_name)
+
+    def record_prompt_size(self, tokens: int):
+        """Locally counted tokens of one assembled LLM prompt"""
+        self.prompt_sizes.append(tokens)
+
+    def record_greeting_audio(self):
+        """First greeting frame reached the room: ends the ring-to-greeting measurement"""
+        if "greeting_first_audio" not in self.setup.marks:
+            seconds = self.setup.mark("greeting_first_audio")
+            self.samples.observe(RING_TO_GREETING, seconds)
+            logger.info(self.setup.describe())
+
+    def record_speculation(self, kind: str):
+        """A fetch of this kind (tickets, vehicles) was started from an interim transcript"""
+        self.speculative_lookups[kind] = self.speculative_lookups.get(kind, 0) + 1
+
+    def _on_metrics_collected(self, ev: MetricsCollectedEvent):
+        m = ev.metrics
+        self.usage.collect(m)
+        if isinstance(m, metrics.EOUMetrics):
+            self.record(EOU_DELAY, m.end_of_utterance_delay, m.speech_id)
+            self.record(STT_FINAL_LATENCY, m.transcription_delay, m.speech_id)
+        elif isinstance(m, metrics.LLMMetrics):
+            self.record(LLM_TTFT, m.ttft, m.speech_id)
+            self.prompt_tokens += m.prompt_tokens
+            self.cached_prompt_tokens += m.prompt_cached_tokens
+        elif isinstance(m, metrics.TTSMetrics):
+            self.record(TTS_TTFA, m.ttfb, m.speech_id)
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "turns": dict(self.turns),
+            "prompt": {
+                "version": self.prompt_version,
+                "assembled_tokens": list(self.prompt_sizes),
+                "provider_prompt_tokens": self.prompt_tokens,
+                "provider_cached_tokens": self.cached_prompt_tokens,
+                "cache_hit_ratio": (
+                    round(self.cached_prompt_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None
+                ),
+            },
+            "setup": self.setup.summary(),
+            "speculation": dict(self.speculative_lookups),
+            "usage": str(self.usage.get_summary()),
+        }
+
+    def write_report(self, directory: str = METRICS_DIR) -> str:
+        """Write this session's turns plus the percentiles over every call on the host as JSON"""
+        totals = merge_into_aggregate(self.samples)
+        path = os.path.join(directory, f"toyota_session_{self.session_id}.json")
+        report = dict(self.summary(), host_percentiles=totals.snapshot())
+        _write_atomic(path, json.dumps(report, ensure_ascii=False, indent=2))
+        return path
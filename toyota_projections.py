@@ -0,0 +1,97 @@
+import os
+from typing import Callable, Iterable, List, Optional
+
+# Upper bounds on what a single tool result may add to the LLM context
+MAX_RECORDS_PER_RESULT = int(os.getenv("TOYOTA_TOOL_MAX_RECORDS", "5"))
+MAX_CHARS_PER_RESULT = int(os.getenv("TOYOTA_TOOL_MAX_CHARS", "1200"))
+
+
+def _ref(value) -> dict:
+    """A populated CRM reference as a dict (bare ids become {"_id": id})"""
+    if isinstance(value, dict):
+        return value
+    return {"_id": value} if value else {}
+
+
+def _day(timestamp) -> str:
+    """Trim an ISO timestamp to its date; the agent never needs the time of day"""
+    return str(timestamp)[:10] if timestamp else ""
+
+
+def project_client(client: dict) -> dict:
+    """Fields the agent needs to greet, identify and register a caller"""
+    return {
+        "id": client.get("_id", ""),
+        "name": f"{client.get('firstName', '')} {client.get('lastName', '')}".strip(),
+        "phone": client.get("phone", ""),
+        "email": client.get("email", ""),
+        "address": client.get("address", ""),
+    }
+
+
+def project_vehicle(vehicle: dict) -> dict:
+    """Fields the agent needs to confirm a vehicle and open a ticket for it"""
+    return {
+        "id": vehicle.get("_id", ""),
+        "model": f"{vehicle.get('make', 'Toyota')} {vehicle.get('modelName', '')}".strip(),
+        "year": vehicle.get("year", ""),
+        "color": vehicle.get("color", ""),
+        "plate": vehicle.get("licensePlate", ""),
+        "vin": vehicle.get("VIN", ""),
+        "lastService": _day(vehicle.get("lastServiceDate")),
+    }
+
+
+def project_ticket(ticket: dict) -> dict:
+    """Fields the agent needs to answer service-status questions"""
+    vehicle = _ref(ticket.get("vehicleId"))
+    return {
+        "id": ticket.get("_id", ""),
+        "title": ticket.get("title", ""),
+        "status": ticket.get("status", ""),
+        "priority": ticket.get("priority", ""),
+        "vehicle": " ".join(
+            str(part) for part in (vehicle.get("modelName"), vehicle.get("licensePlate")) if part
+        ) or vehicle.get("_id", ""),
+        "created": _day(ticket.get("createdAt")),
+        "eta": _day(ticket.get("estimatedCompletionDate")),
+    }
+
+
+def format_record(record: dict) -> str:
+    """One record as `key=value; key=value`, dropping empty fields"""
+    return "; ".join(f"{key}={value}" for key, value in record.items() if value not in ("", None))
+
+
+def format_records(
+    records: Iterable[dict],
+    projector: Callable[[dict], dict],
+    max_records: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    total: Optional[int] = None,
+) -> str:
+    """
+    Project and serialize records for the LLM, one line per record.
+
+    Stops at max_records or once the next line would exceed max_chars, and
+    appends a "+N more" line so the model knows the list was cut.
+    """
+    max_records = MAX_RECORDS_PER_RESULT if max_records is None else max_records
+    max_chars = MAX_CHARS_PER_RESULT if max_chars is None else max_chars
+
+    records = list(records)
+    total = len(records) if total is None else total
+
+    lines: List[str] = []
+    used = 0
+    for record in records[:max_records]:
+        line = format_record(projector(record))
+        if lines and used + len(line) + 1 > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+
+    remaining = total - len(lines)
+    if remaining > 0:
+        lines.append(f"(+{remaining} more | +{remaining} أخرى)")
+    return "\n".join(lines)
@@ -0,0 +1,56 @@
+import logging
+import os
+from dataclasses import dataclass
+
+from livekit.plugins import azure, elevenlabs, openai
+
+from toyota_tts import build_tts
+
+logger = logging.getLogger("toyota-providers")
+
+LLM_MODEL = "gpt-4o"
+LLM_TEMPERATURE = 0.2
+STT_LANGUAGE = "ar-KW"
+
+
+@dataclass
+class Providers:
+    """
+    The LLM, STT and TTS clients a call uses.
+
+    Built once in prewarm, so credentials, plugin setup and HTTP pools are
+    ready before a call is assigned to the process; the call's entrypoint
+    then only has to open connections (prewarm()) on its own event loop.
+    LiveKit runs one job per process, so a job never shares these with
+    another call.
+    """
+
+    llm: openai.LLM
+    stt: azure.STT
+    tts: elevenlabs.TTS
+
+    def prewarm(self):
+        """Open the providers' connections (ElevenLabs websocket, HTTP pools) ahead of the first turn"""
+        for provider in (self.llm, self.stt, self.tts):
+            try:
+                provider.prewarm()
+            except Exception as e:  # a cold connection only costs the first turn
+                logger.warning("%s prewarm failed: %s", type(provider).__name__, e)
+
+
+def build_providers() -> Providers:
+    return Providers(
+        llm=openai.LLM(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model=LLM_MODEL,
+            temperature=LLM_TEMPERATURE,
+        ),
+        stt=azure.STT(
+            speech_key=os.getenv("AZURE_SPEECH_KEY"),
+            speech_region=os.getenv("AZURE_SPEECH_REGION"),
+            language=STT_LANGUAGE,
+            # sample_rate=16000,
+            # segmentation_silence_timeout_ms=300,
+        ),
+        tts=build_tts(),
+    )
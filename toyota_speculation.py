@@ -0,0 +1,75 @@
+import logging
+import os
+from typing import Callable, Optional
+
+from get_service_tickets_tool import ticket_store
+from get_vehicle_data_tool import vehicle_repository
+from toyota_intents import SERVICE_TICKET, IntentMatch, intent_matcher
+
+logger = logging.getLogger("toyota-speculation")
+
+# Consecutive interim transcripts that must agree on the intent and entity
+# before anything is fetched (interims change a lot in the first words)
+SPECULATION_STABLE_INTERIMS = int(os.getenv("TOYOTA_SPECULATION_STABLE_INTERIMS", "2"))
+
+
+class SpeculativeLookups:
+    """
+    CRM fetches started from interim STT transcripts, before the turn ends.
+
+    Only fetches a tool call of the coming turn waits on are worth a head
+    start. A service question leads the LLM to get_service_tickets and
+    get_vehicle_data, which block the reply on the CRM whenever the caller's
+    tickets (TICKET_CACHE_TTL_SECONDS, 60 s) or vehicles have expired since
+    the caller prefetch. Once the same intent and entity show up in
+    SPECULATION_STABLE_INTERIMS interim transcripts in a row, those fetches
+    are started into the shared stores (ticket_store, vehicle_repository)
+    that the tools read, so the tool finds them fresh or in flight. The
+    vehicles fetched for a greeting and the catalog image uploads are already
+    warm from call start, and WhatsApp sends are queued rather than waited
+    on, so none of them is speculated. Each stable match is acted on once,
+    and only when the data is not fresh or already in flight. Nothing with
+    side effects (WhatsApp sends, ticket creation) is ever run speculatively.
+    """
+
+    def __init__(
+        self,
+        client_id: Callable[[], Optional[str]] = lambda: None,
+        session_metrics=None,
+        stable_interims: int = SPECULATION_STABLE_INTERIMS,
+    ):
+        self.client_id = client_id
+        self.session_metrics = session_metrics
+        self.stable_interims = stable_interims
+        self._last_match: Optional[IntentMatch] = None
+        self._streak = 0
+
+    def on_transcript(self, text: str, is_final: bool):
+        """AgentSession "user_input_transcribed" handler"""
+        if is_final:
+            self._last_match, self._streak = None, 0
+            return
+
+        match = intent_matcher.match(text)
+        if not match.intents:
+            self._last_match, self._streak = None, 0
+            return
+        self._streak = self._streak + 1 if match == self._last_match else 1
+        self._last_match = match
+        # Later interims repeating the same match have nothing new to start
+        if self._streak == self.stable_interims:
+            self._speculate(match)
+
+    def _speculate(self, match: IntentMatch):
+        client_id = self.client_id()
+        if not client_id or not match.has(SERVICE_TICKET):
+            return
+        if ticket_store.prefetch(client_id):
+            self._record("tickets")
+        if vehicle_repository.prefetch(client_id):
+            self._record("vehicles")
+
+    def _record(self, kind: str):
+        logger.debug("Speculative %s fetch started", kind)
+        if self.session_metrics:
+            self.session_metrics.record_speculation(kind)
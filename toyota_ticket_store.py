@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("toyota-ticket-store")
+
+# A client's tickets are fetched again after this long
+TICKET_CACHE_TTL_SECONDS = float(os.getenv("TOYOTA_TICKET_CACHE_TTL_SECONDS", "60"))
+TICKET_PAGE_SIZE = int(os.getenv("TOYOTA_TICKET_PAGE_SIZE", "10"))
+
+
+def _ref_id(value) -> Optional[str]:
+    """Id of a CRM reference, whether populated as a document or left as a bare id"""
+    if isinstance(value, dict):
+        return value.get("_id")
+    return value
+
+
+def ticket_date(ticket: dict) -> str:
+    """Sort key for a ticket: creation time, falling back to the last update"""
+    return ticket.get("createdAt") or ticket.get("updatedAt") or ""
+
+
+class TicketStore:
+    """
+    In-memory service-ticket index with secondary indexes on client, vehicle,
+    status and date.
+
+    Tickets are fetched one client at a time, the first time that client's
+    tickets are needed (the get_service_tickets tool, the caller prefetch, a
+    speculative lookup),
+    and kept for TICKET_CACHE_TTL_SECONDS; concurrent requests for the same
+    client share one CRM request. Queries are answered from the indexes and
+    return a bounded page unless asked for every match. Writes insert into
+    the sorted date list, O(n) per ticket; cheap at one call's ticket volume.
+    """
+
+    def __init__(
+        self,
+        fetch_tickets: Callable[[str], Awaitable[List[dict]]],
+        ttl: float = TICKET_CACHE_TTL_SECONDS,
+    ):
+        self.fetch_tickets = fetch_tickets
+        self.ttl = ttl
+        self._by_id: Dict[str, dict] = {}
+        self._by_client: Dict[str, Set[str]] = defaultdict(set)
+        self._by_vehicle: Dict[str, Set[str]] = defaultdict(set)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_date: List[Tuple[str, str]] = []
+        # client id -> monotonic time its tickets expire
+        self._clients: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def has_client(self, client_id: str) -> bool:
+        """Whether the client's tickets are loaded and fresh"""
+        return self._clients.get(client_id, 0.0) > time.monotonic()
+
+    async def ensure_client(self, client_id: str):
+        """Fetch the client's tickets unless fresh; fetch errors propagate and leave them unloaded"""
+        if self.has_client(client_id):
+            return
+        # A caller abandoning its turn must not cancel the fetch other callers share
+        await asyncio.shield(self._fetch(client_id))
+
+    def prefetch(self, client_id: str) -> bool:
+        """Start fetching the client's tickets without waiting; False if fresh or already in flight"""
+        if client_id in self._inflight or self.has_client(client_id):
+            return False
+        self._fetch(client_id)
+        return True
+
+    def invalidate(self, client_id: str):
+        """Fetch the client's tickets again on next use"""
+        self._clients.pop(client_id, None)
+
+    def _fetch(self, client_id: str) -> asyncio.Task:
+        task = self._inflight.get(client_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_client(client_id))
+            self._inflight[client_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(client_id, None))
+            # A prefetch nobody awaits must not log "exception never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _load_client(self, client_id: str):
+        started = time.perf_counter()
+        tickets = await self.fetch_tickets(client_id)
+        for ticket_id in list(self._by_client.get(client_id, ())):
+            self._unindex(ticket_id, self._by_id.pop(ticket_id))
+        # Checked here too, in case the CRM ignores the filter
+        tickets = [t for t in tickets if _ref_id(t.get("clientId")) == client_id]
+        for ticket in tickets:
+            self.upsert(ticket)
+        self._clients[client_id] = time.monotonic() + self.ttl
+        logger.info(
+            "Loaded %d tickets for client %s in %.0f ms",
+            len(tickets), client_id, (time.perf_counter() - started) * 1000,
+        )
+
+    def upsert(self, ticket: dict):
+        """Add or replace one ticket in every index, e.g. right after creation"""
+        ticket_id = ticket.get("_id")
+        if not ticket_id:
+            return
+
+        previous = self._by_id.get(ticket_id)
+        if previous is not None:
+            self._unindex(ticket_id, previous)
+
+        self._by_id[ticket_id] = ticket
+        client_id = _ref_id(ticket.get("clientId"))
+        vehicle_id = _ref_id(ticket.get("vehicleId"))
+        if client_id:
+            self._by_client[client_id].add(ticket_id)
+        if vehicle_id:
+            self._by_vehicle[vehicle_id].add(ticket_id)
+        if ticket.get("status"):
+            self._by_status[ticket["status"]].add(ticket_id)
+        insort(self._by_date, (ticket_date(ticket), ticket_id))
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        return self._by_id.get(ticket_id)
+
+    def query(
+        self,
+        client_id: Optional[str] = None,
+        vehicle_id: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = TICKET_PAGE_SIZE,
+        offset: int = 0,
+    ) -> Tuple[List[dict], int]:
+        """
+        Return one page of matching tickets, newest first, and the total match count.
+
+        since/until are ISO dates or timestamps; until is inclusive, so
+        until="2025-08-19" covers that whole day. limit=None returns every match.
+        """
+        upper = until + "\uffff" if until else None
+
+        candidates = None
+        for index, key in (
+            (self._by_vehicle, vehicle_id),
+            (self._by_client, client_id),
+            (self._by_status, status),
+        ):
+            if key is None:
+                continue
+            ids = index.get(key, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return [], 0
+
+        if candidates is None:
+            # No key filter: slice the date index directly, newest first
+            low = bisect_left(self._by_date, (since,)) if since else 0
+            high = bisect_left(self._by_date, (upper,)) if upper else len(self._by_date)
+            start = high - offset
+            stop = low if limit is None else max(start - limit, low)
+            page = [self._by_id[t] for _, t in reversed(self._by_date[stop:max(start, stop)])]
+            return page, max(high - low, 0)
+
+        dated = sorted(((ticket_date(self._by_id[t]), t) for t in candidates), reverse=True)
+        ordered = [
+            ticket_id for date, ticket_id in dated
+            if (not since or date >= since) and (not upper or date < upper)
+        ]
+        page = [self._by_id[t] for t in ordered[offset:None if limit is None else offset + limit]]
+        return page, len(ordered)
+
+    def _unindex(self, ticket_id: str, ticket: dict):
+        client_id = _ref_id(ticket.get("clientId"))
+        vehicle_id = _ref_id(ticket.get("vehicleId"))
+        if client_id:
+            self._by_client[client_id].discard(ticket_id)
+        if vehicle_id:
+            self._by_vehicle[vehicle_id].discard(ticket_id)
+        if ticket.get("status"):
+            self._by_status[ticket["status"]].discard(ticket_id)
+
+        entry = (ticket_date(ticket), ticket_id)
+        position = bisect_left(self._by_date, entry)
+        if position < len(self._by_date) and self._by_date[position] == entry:
+            del self._by_date[position]
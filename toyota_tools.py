@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import time
+from collections import deque
 from livekit.agents import function_tool, RunContext
-from typing import Dict, List, Optional, Any
-from difflib import get_close_matches
+from typing import List, Union
+from urllib.parse import quote_plus
 import get_client_data_tool
 import create_client_tool
 import get_vehicle_data_tool
@@ -9,13 +12,51 @@ import get_service_tickets_tool
 import create_service_ticket_tool
 import send_car_image_tool
 import send_location_tool
+from toyota_catalog import vehicle_catalog
+from toyota_knowledge import knowledge_base
+from toyota_whatsapp import (
+    DELIVERED,
+    WHATSAPP_DRAIN_TIMEOUT_SECONDS,
+    OutboundBatch,
+    OutboundMessage,
+    whatsapp_dispatcher,
+)
+
+logger = logging.getLogger("toyota-tools")
+
+
+def branch_search_url(name: str) -> str:
+    """Google Maps search link for a branch whose knowledge-base entry has no map link"""
+    return f"https://www.google.com/maps/search/?api=1&query={quote_plus(f'Toyota {name} Kuwait')}"
+
+
+SEND_CAR_IMAGE_DESCRIPTION = f"""Send high-quality Toyota vehicle images directly to customer's WhatsApp. 
+This function retrieves official Toyota vehicle photos and sends them with detailed descriptions 
+including features, specifications, and pricing information. Use this when customers want to see 
+specific car models, compare vehicles visually, or need visual references for their purchase decisions. 
+
+⚠️ Important: The car name must match one of the officially supported Toyota models available in Kuwait. 
+Models with images:
+{chr(10).join(f"- {m.name_ar} / {m.name_en}" for m in vehicle_catalog if m.image_url)}
+
+If a customer provides a name with spelling mistakes or in a slightly different format 
+(e.g., "هاي لاندر" instead of "هايلاندر"), the system will automatically use fuzzy search 
+to find the closest valid match. If no close match is found, the tool will return a clear error message. 
+
+This ensures customers always receive the correct vehicle images and descriptions for 
+Toyota models available in the Kuwaiti market."""
+
 
 class ToyotaTools:
-    def __init__(self, session, client_data=None, client_phone=None):
+    def __init__(self, session, client_data=None, client_phone=None, session_metrics=None):
         self.session = session
+        self.session_metrics = session_metrics
         self.client_data = client_data
         self.client_phone = client_phone or "+96566756452" # Fallback to default phone number
-
+        # Write calls that outlived an interrupted turn; kept referenced until they finish
+        self._detached_calls = set()
+        # WhatsApp delivery notes not yet shown to the LLM
+        self.delivery_updates = deque(maxlen=20)
 
     def update_client_info(self, client_data, client_phone):
         """Update client information"""
@@ -29,8 +70,10 @@ class ToyotaTools:
     async def get_client_data(self, context: RunContext, phone_number: str) -> dict:
         """Retrieve Toyota Kuwait client data"""
         try:
-            result = get_client_data_tool.main(phone_number)
-            logging.info(f"Client data retrieved for {phone_number}")
+            result = await self._run_interruptible(context, get_client_data_tool.main(phone_number))
+            if result is None:
+                return None
+            logger.info("Client data retrieved for %s", phone_number)
             
             if "لم يتم العثور على بيانات العميل" not in result["result"]:
                 self.client_data = result["result"]
@@ -38,7 +81,7 @@ class ToyotaTools:
                 
             return {"status": "success", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error getting client data: {e}")
+            logger.error("Error getting client data: %s", e)
             return {"status": "error", "message": f"خطأ في استرجاع بيانات العميل: {str(e)}"}
 
     @function_tool(
@@ -49,133 +92,128 @@ class ToyotaTools:
                            email: str, phone: str, address: str) -> dict:
         """Register a new client with Toyota Kuwait"""
         try:
-            result = create_client_tool.main(first_name, last_name, email, phone, address)
-            logging.info(f"New client created: {first_name} {last_name}")
+            result = await self._run_interruptible(context, create_client_tool.main(
+                phone_number=phone,
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                address=address
+            ), abandon=False)
+            if result is None:
+                return None
+            logger.info("New client created: %s %s", first_name, last_name)
             self.client_phone = phone
             return {"status": "success", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error creating client: {e}")
+            logger.error("Error creating client: %s", e)
             return {"status": "error", "message": f"خطأ في تسجيل العميل: {str(e)}"}
 
     @function_tool(
         name="get_vehicle_data",
-        description="Retrieve comprehensive vehicle information for a specific client from Toyota Kuwait's vehicle database. This function returns detailed vehicle specifications, ownership history, maintenance records, warranty status, and current condition. Optionally sends vehicle images via WhatsApp if send_images is True. Use this when customers inquire about their owned vehicles or need vehicle-specific information."
+        description="Retrieve comprehensive vehicle information for a specific client from Toyota Kuwait's vehicle database. This function returns detailed vehicle specifications, ownership history, maintenance records, warranty status, and current condition. Optionally sends vehicle images via WhatsApp if send_images is True. Use this when customers inquire about their owned vehicles or need vehicle-specific information. Results are paginated; if the vehicle the customer means is not listed, pass page=2, 3... to see the rest of their vehicles."
     )
-    async def get_vehicle_data(self, context: RunContext, client_id: str, 
-                              send_images: bool = False) -> dict:
+    async def get_vehicle_data(self, context: RunContext, client_id: str,
+                              send_images: bool = False, page: int = 1) -> dict:
         """Retrieve Toyota vehicle data"""
         try:
             phone_number = self.client_phone if send_images else None
-            result = get_vehicle_data_tool.main(client_id, phone_number, "ar")
-            logging.info(f"Vehicle data retrieved for client {client_id}")
+            result = await self._run_interruptible(
+                context,
+                get_vehicle_data_tool.main(client_id, phone_number, "ar", self._on_delivery, page),
+                abandon=not send_images
+            )
+            if result is None:
+                return None
+            logger.info("Vehicle data retrieved for client %s", client_id)
             return {"status": "success", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error getting vehicle data: {e}")
+            logger.error("Error getting vehicle data: %s", e)
             return {"status": "error", "message": f"خطأ في استرجاع بيانات المركبة: {str(e)}"}
 
     @function_tool(
         name="send_car_image",
-        description="""Send high-quality Toyota vehicle images directly to customer's WhatsApp. 
-This function retrieves official Toyota vehicle photos and sends them with detailed descriptions 
-including features, specifications, and pricing information. Use this when customers want to see 
-specific car models, compare vehicles visually, or need visual references for their purchase decisions. 
-
-⚠️ Important: The car name must match one of the officially supported Toyota models available in Kuwait. 
-Currently supported models include:
-- كامري / Camry
-- برادو / Prado
-- لاند كروزر / Land Cruiser
-- كورولا / Corolla
-- هايلكس / Hilux
-- ريز / Raize
-- هايلاندر / Highlander
-
-If a customer provides a name with spelling mistakes or in a slightly different format 
-(e.g., "هاي لاندر" instead of "هايلاندر"), the system will automatically use fuzzy search 
-to find the closest valid match. If no close match is found, the tool will return a clear error message. 
-
-This ensures customers always receive the correct vehicle images and descriptions for 
-Toyota models available in the Kuwaiti market.""")
+        description=SEND_CAR_IMAGE_DESCRIPTION,
+    )
     async def send_car_image(self, context: RunContext, car_name: str,
                             description: str = "") -> dict:
         """Send Toyota car image via WhatsApp"""
         try:
-            print(f"\n🚗 ===== SEND_CAR_IMAGE REQUEST STARTED =====")
-            print(f"🚗 Requested car: '{car_name}'")
-            print(f"🚗 Current client_phone: '{self.client_phone}'")
-            print(f"🚗 Description provided: '{description}'")
-            
+            logger.debug("send_car_image: car=%r phone=%r description=%r", car_name, self.client_phone, description)
+
             if not self.client_phone:
-                print(f"🚗 ❌ NO PHONE NUMBER AVAILABLE")
+                logger.warning("send_car_image: no phone number available")
                 return {"status": "error", "message": "لا يمكن إرسال الصورة - لم يتم العثور على رقم الهاتف"}
-            
-            print(f"🚗 Looking up image URL for car: '{car_name}'")
-            image_url = self._get_car_image_url(car_name)
-            print(f"🚗 Found image URL: '{image_url}'")
-            
+
+            model = vehicle_catalog.resolve(car_name)
+            if not model:
+                logger.info("send_car_image: unknown model %r", car_name)
+                return {"status": "error", "message": f"موديل غير معروف: {car_name} | Unknown model: {car_name}"}
+
+            image_url = model.image_url
             if not image_url:
-                print(f"🚗 ❌ NO IMAGE URL FOUND for car: '{car_name}'")
-                return {"status": "error", "message": f"لا توجد صورة متاحة لموديل {car_name}"}
-            
+                logger.warning("send_car_image: no image URL for model %s", model.id)
+                return {"status": "error", "message": f"لا توجد صورة متاحة لموديل {model.name_ar}"}
+
+            car_name = model.name_for(car_name)
             if not description:
-                description = self._get_car_description(car_name)
-                print(f"🚗 Generated description: '{description}'")
-            else:
-                print(f"🚗 Using provided description: '{description}'")
-            
-            print(f"🚗 📱 CALLING WHATSAPP TOOL with:")
-            print(f"🚗 📱   phone_number: '{self.client_phone}'")
-            print(f"🚗 📱   image_url: '{image_url}'")
-            print(f"🚗 📱   car_name: '{car_name}'")
-            print(f"🚗 📱   description: '{description[:100]}...'")
-            
-            result = send_car_image_tool.main(
+                description = model.description_ar
+            logger.debug("send_car_image: model=%s image_url=%s", model.id, image_url)
+
+            # Only queues the message; never abandoned, so an interruption cannot drop it
+            result = await self._run_interruptible(context, send_car_image_tool.main(
                 phone_number=self.client_phone,
                 image_url=image_url,
                 car_name=car_name,
-                description=description
-            )
-            
-            print(f"🚗 📱 WHATSAPP TOOL RESPONSE:")
-            print(f"🚗 📱   Full result: {result}")
-            print(f"🚗 📱   Result type: {type(result)}")
-            
-            if result and "result" in result:
-                print(f"🚗 📱   Inner result: {result['result']}")
-                print(f"🚗 ✅ Car image sent successfully for {car_name}")
-                logging.info(f"Car image sent for {car_name}")
-                return {"status": "success", "data": result["result"]}
+                description=description,
+                on_status=self._on_delivery
+            ), abandon=False)
+            if result is None:
+                return None
+
+            if result and "message_id" in result:
+                logger.info("Car image queued for %s", car_name)
+                return {"status": "queued", "data": result["result"]}
             else:
-                print(f"🚗 ❌ WhatsApp tool returned unexpected result: {result}")
+                logger.warning("send_car_image: unexpected WhatsApp tool result: %r", result)
                 return {"status": "error", "message": f"فشل في إرسال صورة {car_name} - استجابة غير متوقعة من أداة الواتساب"}
-                
+
         except Exception as e:
-            print(f"🚗 ❌ EXCEPTION in send_car_image: {e}")
-            print(f"🚗 ❌ Exception type: {type(e)}")
-            import traceback
-            print(f"🚗 ❌ Full traceback: {traceback.format_exc()}")
-            logging.error(f"Error sending car image: {e}")
+            logger.error("Error sending car image: %s", e, exc_info=True)
             return {"status": "error", "message": f"خطأ في إرسال صورة السيارة: {str(e)}"}
 
     @function_tool(
         name="send_location",
-        description="Send precise location information and directions to Toyota Kuwait branches via WhatsApp. This function provides GPS coordinates, address details, contact numbers, operating hours, and available services for showrooms, service centers, or parts departments. Use this when customers need to visit Toyota facilities, schedule appointments, or require directions to the nearest branch. Supports location types: 'showroom', 'service', 'parts'."
+        description="Send precise location information and directions to Toyota Kuwait branches via WhatsApp. This function provides GPS coordinates, address details, contact numbers, operating hours, and available services for showrooms, service centers, or parts departments. Use this when customers need to visit Toyota facilities, schedule appointments, or require directions to the nearest branch. Supports location types: 'showroom', 'service', 'parts'. Pass the area or branch the customer mentioned (e.g. 'الجهراء', 'Fahaheel') as branch to pick that branch."
     )
-    async def send_location(self, context: RunContext, location_type: str = "showroom") -> dict:
+    async def send_location(self, context: RunContext, location_type: str = "showroom",
+                            branch: str = "") -> dict:
         """Send Toyota Kuwait branch location"""
         try:
             if not self.client_phone:
                 return {"status": "error", "message": "لا يمكن إرسال الموقع - لم يتم العثور على رقم الهاتف"}
-                
-            result = send_location_tool.main(
+
+            section = knowledge_base.find_branch(location_type, branch)
+            if section is None:
+                return {"status": "error", "message": f"لم يتم العثور على فرع: {location_type} {branch}"}
+            fields = section.fields()
+
+            result = await self._run_interruptible(context, send_location_tool.main(
                 phone_number=self.client_phone,
-                location_type=location_type,
-                language="ar"
-            )
-            logging.info(f"Location sent: {location_type}")
-            return {"status": "success", "data": result["result"]}
+                location_name=section.title,
+                address=fields.get("location") or section.heading,
+                contact_info=fields.get("contact", ""),
+                maps_url=fields.get("google maps") or branch_search_url(section.title),
+                hours=fields.get("hours", ""),
+                on_status=self._on_delivery
+            ), abandon=False)
+            if result is None:
+                return None
+            if "message_id" not in result:
+                return {"status": "error", "message": result["result"]}
+            logger.info("Location queued: %s", section.title)
+            return {"status": "queued", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error sending location: {e}")
+            logger.error("Error sending location: %s", e)
             return {"status": "error", "message": f"خطأ في إرسال الموقع: {str(e)}"}
 
     @function_tool(
@@ -187,116 +225,101 @@ Toyota models available in the Kuwaiti market.""")
                                    preferred_date: str = "") -> dict:
         """Create a new Toyota service ticket"""
         try:
-            result = create_service_ticket_tool.main(
+            result = await self._run_interruptible(context, create_service_ticket_tool.main(
                 client_id=client_id,
                 vehicle_id=vehicle_id,
-                service_type=service_type,
+                title=service_type,
                 description=description,
                 preferred_date=preferred_date
-            )
-            logging.info(f"Service ticket created for client {client_id}")
+            ), abandon=False)
+            if result is None:
+                return None
+            logger.info("Service ticket created for client %s", client_id)
             return {"status": "success", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error creating service ticket: {e}")
+            logger.error("Error creating service ticket: %s", e)
             return {"status": "error", "message": f"خطأ في إنشاء تذكرة الخدمة: {str(e)}"}
 
     @function_tool(
         name="get_service_tickets",
-        description="Retrieve all service history and current service tickets for a specific customer from Toyota Kuwait's service database. This function returns detailed service records including past maintenance, current appointments, warranty claims, service costs, and technician notes. Use this when customers inquire about their service history, want to track current service status, or need service documentation for warranty purposes."
+        description="Retrieve all service history and current service tickets for a specific customer from Toyota Kuwait's service database. This function returns detailed service records including past maintenance, current appointments, warranty claims, service costs, and technician notes. Use this when customers inquire about their service history, want to track current service status, or need service documentation for warranty purposes. Optionally narrow by vehicle_id or status; results are newest first and paginated, so pass page=2, 3... only if the customer needs older tickets."
     )
-    async def get_service_tickets(self, context: RunContext, client_id: str) -> dict:
+    async def get_service_tickets(self, context: RunContext, client_id: str,
+                                  vehicle_id: str = "", status: str = "", page: int = 1) -> dict:
         """Fetch Toyota service tickets"""
         try:
-            result = get_service_tickets_tool.main(client_id)
-            logging.info(f"Service tickets retrieved for client {client_id}")
+            result = await self._run_interruptible(context, get_service_tickets_tool.main(
+                vehicle_id=vehicle_id or None,
+                client_id=client_id,
+                status=status or None,
+                page=page
+            ))
+            if result is None:
+                return None
+            logger.info("Service tickets retrieved for client %s", client_id)
             return {"status": "success", "data": result["result"]}
         except Exception as e:
-            logging.error(f"Error getting service tickets: {e}")
+            logger.error("Error getting service tickets: %s", e)
             return {"status": "error", "message": f"خطأ في استرجاع تذاكر الخدمة: {str(e)}"}
 
     # Helper methods
-    def _normalize_car_name(self, car_name: str, available_models: dict) -> str:
-        """Return the closest matching car model name using fuzzy search"""
-        print(f"🔍 FUZZY SEARCH: Looking for '{car_name}'")
-        car_name = car_name.strip().lower()
-        print(f"🔍 FUZZY SEARCH: Normalized to '{car_name}'")
-        
-        if car_name in available_models:
-            print(f"🔍 FUZZY SEARCH: ✅ EXACT MATCH found for '{car_name}'")
-            return car_name
-        
-        print(f"🔍 FUZZY SEARCH: No exact match, trying fuzzy matching...")
-        print(f"🔍 FUZZY SEARCH: Available models: {list(available_models.keys())[:10]}...")
-        
-        # Try fuzzy matching
-        matches = get_close_matches(car_name, available_models.keys(), n=1, cutoff=0.6)
-        print(f"🔍 FUZZY SEARCH: Fuzzy matches found: {matches}")
-        
-        if matches:
-            matched_name = matches[0]
-            print(f"🔍 FUZZY SEARCH: ✅ FUZZY MATCH: '{car_name}' -> '{matched_name}'")
-            logging.warning(f"Fuzzy match: '{car_name}' -> '{matched_name}'")
-            return matched_name
-        
-        print(f"🔍 FUZZY SEARCH: ❌ NO MATCH found for '{car_name}'")
-        return None
+    def _on_delivery(self, message: Union[OutboundMessage, OutboundBatch]):
+        """Dispatcher callback: note the final WhatsApp status of a message or batch for the next turn"""
+        if message.status == DELIVERED:
+            self.delivery_updates.append(f"WhatsApp: {message.label} delivered")
+        else:
+            self.delivery_updates.append(f"WhatsApp: {message.label} failed ({message.error})")
+
+    def drain_delivery_updates(self) -> List[str]:
+        """Delivery notes since the last call, oldest first"""
+        updates = list(self.delivery_updates)
+        self.delivery_updates.clear()
+        return updates
 
-    def _get_car_image_url(self, car_name):
-        """Get image URL for specific car model with fuzzy matching"""
-        car_images = {
-            "كامري": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/fc96a3af30e07dd8da9ae20762089ce5/960x600_camry_me_2406_213.png",
-            "camry": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/fc96a3af30e07dd8da9ae20762089ce5/960x600_camry_me_2406_213.png",
-            "برادو": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/563a9350dad1053e12e4344f708f1ced/ext_2.png",
-            "prado": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/563a9350dad1053e12e4344f708f1ced/ext_2.png",
-            "لاند كروزر": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/44c7695bf5cf4abdb7ce4beec883486d/land_cruiser.png",
-            "land cruiser": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/44c7695bf5cf4abdb7ce4beec883486d/land_cruiser.png",
-            "كورولا": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/73d4a67096830328c387e6ed0664e8d4/trim_lvl_1.png",
-            "corolla": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/73d4a67096830328c387e6ed0664e8d4/trim_lvl_1.png",
-            "هايلكس": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/0fec33e3a53ae9ceb03946e1e8017eff/hilux.png",
-            "hilux": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/0fec33e3a53ae9ceb03946e1e8017eff/hilux.png",
-            "ريز": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/e8d0f7dee4cd5e16fe6322ceb56c014d/raize.png",
-            "raize": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/e8d0f7dee4cd5e16fe6322ceb56c014d/raize.png",
-            # ✅ Added Highlander and common variations
-            "هايلاندر": "https://toyota.scene7.com/is/image/toyota/highlander2023",
-            "highlander": "https://toyota.scene7.com/is/image/toyota/highlander2023",
-            "هاي لاندر": "https://toyota.scene7.com/is/image/toyota/highlander2023",
-            "hi lander": "https://toyota.scene7.com/is/image/toyota/highlander2023",
-            # ✅ Added more Toyota models
-            "فورتنر": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/fortuner2023.png",
-            "fortuner": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/fortuner2023.png",
-            "كورولا كروس": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/corolla_cross2023.png",
-            "corolla cross": "https://images.netdirector.co.uk/gforces-auto/image/upload/w_329,h_219,q_auto,c_fill,f_auto,fl_lossy/auto-client/corolla_cross2023.png"
-        }
-        
-        match = self._normalize_car_name(car_name, car_images)
-        return car_images.get(match) if match else None
-
-    def _get_car_description(self, car_name):
-        """Get description for specific car model with fuzzy matching"""
-        descriptions = {
-            "كامري": "سيارة سيدان تنفيذية فاخرة مع تقنيات متقدمة وراحة استثنائية",
-            "camry": "سيارة سيدان تنفيذية فاخرة مع تقنيات متقدمة وراحة استثنائية",
-            "برادو": "سيارة دفع رباعي فاخرة مثالية للعائلات والرحلات الطويلة",
-            "prado": "سيارة دفع رباعي فاخرة مثالية للعائلات والرحلات الطويلة",
-            "لاند كروزر": "سيارة دفع رباعي فاخرة بحجم كامل مع قدرات استثنائية على الطرق الوعرة",
-            "land cruiser": "سيارة دفع رباعي فاخرة بحجم كامل مع قدرات استثنائية على الطرق الوعرة",
-            "كورولا": "سيارة سيدان عائلية موثوقة واقتصادية مع تقنيات حديثة",
-            "corolla": "سيارة سيدان عائلية موثوقة واقتصادية مع تقنيات حديثة",
-            "هايلكس": "شاحنة بيك أب قوية ومتينة مثالية للعمل والمغامرات",
-            "hilux": "شاحنة بيك أب قوية ومتينة مثالية للعمل والمغامرات",
-            "ريز": "سيارة كروس أوفر مدمجة عملية ومناسبة للمدينة",
-            "raize": "سيارة كروس أوفر مدمجة عملية ومناسبة للمدينة",
-            # ✅ Added Highlander descriptions
-            "هايلاندر": "سيارة SUV عائلية مريحة تجمع بين الرحابة والأمان والتقنيات الحديثة",
-            "highlander": "سيارة SUV عائلية مريحة تجمع بين الرحابة والأمان والتقنيات الحديثة",
-            "هاي لاندر": "سيارة SUV عائلية مريحة تجمع بين الرحابة والأمان والتقنيات الحديثة",
-            "hi lander": "سيارة SUV عائلية مريحة تجمع بين الرحابة والأمان والتقنيات الحديثة",
-            # ✅ Added more model descriptions
-            "فورتنر": "سيارة دفع رباعي قوية وموثوقة مثالية للعائلات والمغامرات",
-            "fortuner": "سيارة دفع رباعي قوية وموثوقة مثالية للعائلات والمغامرات",
-            "كورولا كروس": "سيارة كروس أوفر عملية تجمع بين كفاءة الوقود والمساحة الداخلية",
-            "corolla cross": "سيارة كروس أوفر عملية تجمع بين كفاءة الوقود والمساحة الداخلية"
-        }
-        
-        match = self._normalize_car_name(car_name, descriptions)
-        return descriptions.get(match, "سيارة تويوتا عالية الجودة والموثوقية")
+    async def aflush_outbound(self, timeout: float = WHATSAPP_DRAIN_TIMEOUT_SECONDS):
+        """Wait (bounded) for this session's queued WhatsApp messages before the call is torn down"""
+        pending = whatsapp_dispatcher.pending(self._on_delivery)
+        if pending:
+            await asyncio.wait([asyncio.ensure_future(m.wait()) for m in pending], timeout=timeout)
+
+    def _time_tool_call(self, context: RunContext, task: asyncio.Future):
+        """Report the call's duration to the session metrics once it settles"""
+        started = time.perf_counter()
+        function_call = getattr(context, "function_call", None)
+        tool_name = getattr(function_call, "name", None) or "unknown"
+        speech_handle = getattr(context, "speech_handle", None)
+        turn_id = getattr(speech_handle, "id", None)
+
+        def _done(_):
+            self.session_metrics.record_tool(tool_name, time.perf_counter() - started, turn_id)
+
+        task.add_done_callback(_done)
+
+    async def _run_interruptible(self, context: RunContext, call, abandon: bool = True):
+        """
+        Await a tool's CRM/WhatsApp call without holding the turn if the caller barges in.
+
+        Returns the call's result, or None when the speech was interrupted first.
+        Read-only calls are cancelled on interruption (abandon=True); calls with
+        side effects keep running in the background so a ticket or message is
+        never left half-sent.
+        """
+        task = asyncio.ensure_future(call)
+        speech_handle = getattr(context, "speech_handle", None)
+        if self.session_metrics:
+            self._time_tool_call(context, task)
+        if speech_handle is None:
+            return await task
+
+        await speech_handle.wait_if_not_interrupted([task])
+        if task.done():
+            return task.result()
+
+        if abandon:
+            task.cancel()
+            logger.info("Tool call abandoned after user interruption")
+        else:
+            self._detached_calls.add(task)
+            task.add_done_callback(self._detached_calls.discard)
+            logger.info("Tool call detached after user interruption")
+        return None
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger("toyota-transcripts")
+
+TRANSCRIPT_DIR = os.getenv(
+    "TOYOTA_TRANSCRIPT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcripts"),
+)
+TRANSCRIPT_MAX_BYTES = int(os.getenv("TOYOTA_TRANSCRIPT_MAX_BYTES", str(5 * 1024 * 1024)))
+TRANSCRIPT_BACKUP_COUNT = int(os.getenv("TOYOTA_TRANSCRIPT_BACKUPS", "3"))
+TRANSCRIPT_QUEUE_SIZE = 1000
+TRANSCRIPT_BATCH_SIZE = 100
+
+
+class TranscriptWriter:
+    """
+    Per-session conversation log written from a background task.
+
+    log() only enqueues, so the turn never waits on disk. Entries are written
+    in batches on a worker thread, the file rotates by size, and aclose()
+    flushes whatever is still queued. When the queue is full new entries are
+    dropped (and counted) rather than blocking the caller.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        directory: str = TRANSCRIPT_DIR,
+        max_bytes: int = TRANSCRIPT_MAX_BYTES,
+        backup_count: int = TRANSCRIPT_BACKUP_COUNT,
+        queue_size: int = TRANSCRIPT_QUEUE_SIZE,
+    ):
+        self.session_id = session_id
+        self.path = os.path.join(directory, f"toyota_session_{session_id}.txt")
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"transcript-{self.session_id}")
+
+    def log(self, text, prefix="LOG"):
+        """Queue one transcript entry; never blocks"""
+        entry = f"\n\n--- {prefix} [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ---\n{text}"
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def aclose(self):
+        """Flush queued entries and stop the writer (shutdown callback)"""
+        if self._task is None:
+            return
+        # Waits only if the queue is full, while the running writer frees space
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        if self.dropped:
+            logger.warning("Transcript %s dropped %s entries", self.session_id, self.dropped)
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = self._drain([first])
+            stop = None in batch
+            batch = [entry for entry in batch if entry is not None]
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error("Transcript write failed: %s", e)
+            if stop:
+                break
+
+    def _drain(self, batch: List[Optional[str]]) -> List[Optional[str]]:
+        while len(batch) < TRANSCRIPT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    def _write_batch(self, entries: List[str]):
+        if not entries:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(entries))
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import wave
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from livekit import rtc
+from livekit.agents import tts as agents_tts
+from livekit.agents import utils
+from livekit.plugins import elevenlabs
+from livekit.plugins.elevenlabs.tts import VoiceSettings
+
+from toyota_chunking import split_clauses
+
+logger = logging.getLogger("toyota-tts")
+
+# ──────────────────────────
+# Voice
+# ──────────────────────────
+TTS_MODEL = "eleven_multilingual_v2"
+TTS_VOICE_ID = "nU39tgunJTx5rQiBJfzc"  # Arabic voice
+TTS_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.6, "speed": 1}
+
+# Pre-synthesized phrases, one WAV per phrase and voice configuration
+TTS_CACHE_DIR = os.getenv(
+    "TOYOTA_TTS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache"),
+)
+# Cached audio is replayed in frames of this length
+FRAME_MS = 50
+
+
+def build_tts() -> elevenlabs.TTS:
+    """The agent's ElevenLabs voice"""
+    return elevenlabs.TTS(
+        api_key=os.getenv("ELEVEN_API_KEY"),
+        model=TTS_MODEL,
+        voice_id=TTS_VOICE_ID,
+        voice_settings=VoiceSettings(**TTS_VOICE_SETTINGS),
+    )
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def phrase_key(text: str) -> str:
+    """Cache key: everything that changes the audio (voice, model, settings) plus the text"""
+    identity = json.dumps(
+        [TTS_VOICE_ID, TTS_MODEL, TTS_VOICE_SETTINGS, _normalize(text)],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:24]
+
+
+class _Synthesis:
+    """One phrase being synthesized: its frames so far, streamed to any number of listeners"""
+
+    def __init__(self):
+        self.frames: List[rtc.AudioFrame] = []
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def add(self, frame: rtc.AudioFrame):
+        self.frames.append(frame)
+        self._wake()
+
+    def finish(self):
+        self.done = True
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        while not self.done:
+            await self._changed.wait()
+
+    async def stream(self) -> AsyncIterator[rtc.AudioFrame]:
+        index = 0
+        while True:
+            if index < len(self.frames):
+                yield self.frames[index]
+                index += 1
+            elif self.done:
+                return
+            else:
+                await self._changed.wait()
+
+
+class TTSCache:
+    """
+    Pre-synthesized audio for the lines the assistant says verbatim.
+
+    Phrases are synthesized once into TTS_CACHE_DIR (WAV, keyed by voice,
+    model, settings and text). Prewarm loads what is on disk; a call fills
+    in missing phrases in the background (prepare), so the greeting and the
+    fallback reply start playing without a TTS round-trip. A phrase is
+    synthesized once per process however many callers want it: the greeting
+    played while prepare is still synthesizing it streams the same frames.
+    Changing the voice or its settings changes the keys, so stale audio is
+    never played.
+    """
+
+    def __init__(self, directory: str = TTS_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self._frames: Dict[str, List[rtc.AudioFrame]] = {}
+        self._texts: List[str] = []
+        # phrase key -> synthesis in flight
+        self._pending: Dict[str, _Synthesis] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, phrases: Iterable[str]):
+        """Load the phrases already synthesized on disk (called from prewarm; local reads only)"""
+        phrases = list(dict.fromkeys(phrases))
+        for text in phrases:
+            self._add(text, self._read(text))
+        logger.info("TTS cache loaded: %s of %s phrases", len(self._frames), len(phrases))
+
+    async def prepare(self, phrases: Iterable[str], tts: agents_tts.TTS):
+        """Synthesize the phrases not cached yet and add them (best-effort, in the background of a call)"""
+        missing = [text for text in dict.fromkeys(phrases) if phrase_key(text) not in self._frames]
+        if not missing:
+            return
+        await asyncio.gather(*(self._synthesis(tts, text).wait() for text in missing))
+        logger.info("TTS cache ready: %s phrases", len(self._frames))
+
+    def audio(self, text: str) -> Optional[AsyncIterator[rtc.AudioFrame]]:
+        """Cached frames for text as a stream for session.say(audio=...), or None"""
+        frames = self._frames.get(phrase_key(text))
+        if frames is None:
+            return None
+        self.hits += 1
+        return _replay(frames)
+
+    def stream(self, text: str, tts: agents_tts.TTS) -> AsyncIterator[rtc.AudioFrame]:
+        """
+        Audio for text for session.say(audio=...): the cached frames, or its
+        synthesis (started now unless already in flight) yielding frames as
+        they arrive. The synthesized phrase is then cached like prepare's.
+        """
+        cached = self.audio(text)
+        if cached is not None:
+            return cached
+        return self._synthesis(tts, text).stream()
+
+    async def speak(
+        self,
+        text: AsyncIterable[str],
+        synthesize: Callable[[AsyncIterable[str]], AsyncIterable[rtc.AudioFrame]],
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """
+        tts_node stage: play the cached audio when the LLM's whole reply is a
+        cached phrase, otherwise pass the text through to synthesize.
+
+        Text is held back only while it is still a prefix of a cached phrase,
+        so ordinary replies reach the TTS after their first few characters.
+        """
+        chunks = text.__aiter__()
+        head = ""
+        async for chunk in chunks:
+            head += chunk
+            if not any(phrase.startswith(_normalize(head)) for phrase in self._texts):
+                break
+        else:
+            cached = self.audio(head)
+            if cached is not None:
+                async for frame in cached:
+                    yield frame
+                return
+
+        async def _text():
+            yield head
+            async for chunk in chunks:
+                yield chunk
+
+        async for frame in synthesize(_text()):
+            yield frame
+
+    def _path(self, text: str) -> str:
+        return os.path.join(self.directory, f"{phrase_key(text)}.wav")
+
+    def _synthesis(self, tts: agents_tts.TTS, text: str) -> _Synthesis:
+        key = phrase_key(text)
+        synthesis = self._pending.get(key)
+        if synthesis is None:
+            synthesis = self._pending[key] = _Synthesis()
+            # Runs to the end even if every listener stops early, so the phrase gets cached
+            task = asyncio.create_task(self._synthesize(tts, text, synthesis))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return synthesis
+
+    async def _synthesize(self, tts: agents_tts.TTS, text: str, synthesis: _Synthesis):
+        """Synthesize text into synthesis, then save it as WAV off the event loop and cache it as read back"""
+        try:
+            async with tts.synthesize(text) as stream:
+                async for event in stream:
+                    synthesis.add(event.frame)
+            if not synthesis.frames:
+                raise ValueError("the TTS returned no audio")
+            audio = rtc.combine_audio_frames(synthesis.frames)
+            await asyncio.to_thread(self._write, text, audio)
+            self._add(text, await asyncio.to_thread(self._read, text))
+        except Exception as e:
+            logger.warning("Could not synthesize %r: %s", text[:30], e)
+        finally:
+            synthesis.finish()
+            self._pending.pop(phrase_key(text), None)
+
+    def _write(self, text: str, audio: rtc.AudioFrame):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(text)}.{os.getpid()}.tmp"
+        with wave.open(tmp_path, "wb") as wav:
+            wav.setnchannels(audio.num_channels)
+            wav.setsampwidth(2)
+            wav.setframerate(audio.sample_rate)
+            wav.writeframes(bytes(audio.data))
+        os.replace(tmp_path, self._path(text))
+
+    def _read(self, text: str) -> Optional[List[rtc.AudioFrame]]:
+        """The phrase's WAV split into FRAME_MS frames, or None if it is not on disk"""
+        try:
+            with wave.open(self._path(text), "rb") as wav:
+                sample_rate = wav.getframerate()
+                channels = wav.getnchannels()
+                pcm = wav.readframes(wav.getnframes())
+        except (OSError, wave.Error):
+            return None
+        samples = sample_rate * FRAME_MS // 1000
+        step = samples * channels * 2
+        return [
+            rtc.AudioFrame(
+                data=pcm[offset:offset + step],
+                sample_rate=sample_rate,
+                num_channels=channels,
+                samples_per_channel=len(pcm[offset:offset + step]) // (channels * 2),
+            )
+            for offset in range(0, len(pcm), step)
+        ]
+
+    def _add(self, text: str, frames: Optional[List[rtc.AudioFrame]]):
+        if frames:
+            self._frames[phrase_key(text)] = frames
+            self._texts.append(_normalize(text))
+
+
+async def synthesize_clauses(tts: agents_tts.TTS, text: AsyncIterable[str]) -> AsyncIterator[rtc.AudioFrame]:
+    """
+    Stream text to the TTS one clause at a time, flushing after each, so
+    synthesis starts on the first clause instead of waiting for the
+    provider's own buffer threshold.
+    """
+    async with tts.stream() as stream:
+
+        async def _push():
+            async for clause in split_clauses(text):
+                stream.push_text(clause)
+                stream.flush()
+            stream.end_input()
+
+        push_task = asyncio.create_task(_push())
+        try:
+            async for event in stream:
+                yield event.frame
+        finally:
+            await utils.aio.cancel_and_wait(push_task)
+
+
+async def on_first_frame(
+    frames: AsyncIterable[rtc.AudioFrame], callback: Callable[[], None]
+) -> AsyncIterator[rtc.AudioFrame]:
+    """Pass frames through, calling callback when the first one is pulled for playout"""
+    first = True
+    async for frame in frames:
+        if first:
+            first = False
+            callback()
+        yield frame
+
+
+async def _replay(frames: List[rtc.AudioFrame]) -> AsyncIterator[rtc.AudioFrame]:
+    for frame in frames:
+        yield frame
+
+
+# One cache per worker process, read from disk in prewarm
+tts_cache = TTSCache()
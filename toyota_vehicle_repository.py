@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("toyota-vehicle-repository")
+
+# How long a client's vehicle list is served from memory before re-asking the CRM
+VEHICLE_CACHE_TTL_SECONDS = float(os.getenv("TOYOTA_VEHICLE_CACHE_TTL_SECONDS", "300"))
+VEHICLE_CACHE_MAX_CLIENTS = int(os.getenv("TOYOTA_VEHICLE_CACHE_MAX_CLIENTS", "2048"))
+# Vehicles per CRM request while walking a client's list (not the tool's result page)
+CRM_VEHICLE_PAGE_SIZE = int(os.getenv("TOYOTA_CRM_VEHICLE_PAGE_SIZE", "50"))
+# Safety stop in case the CRM ignores the page parameter
+VEHICLE_MAX_PAGES = 20
+
+# fetch_page(client_id, page, limit) -> (vehicles, total_pages); raises on failure
+FetchPage = Callable[[str, int, int], Awaitable[Tuple[List[dict], Optional[int]]]]
+
+
+def vehicle_client_id(vehicle: dict) -> Optional[str]:
+    """The owning client id, whether clientId is populated or a bare id"""
+    client = vehicle.get("clientId")
+    if isinstance(client, dict):
+        return client.get("_id")
+    return client
+
+
+class VehicleRepository:
+    """
+    Per-worker cache of each client's vehicles, fetched from the CRM one client at a time.
+
+    Entries expire after a TTL and are invalidated by the CRM writes that
+    touch a client's vehicles (ticket creation, registration). Concurrent
+    lookups for the same client share one CRM request. A failed page fails
+    the lookup, so a CRM outage never reads as "no vehicles".
+    """
+
+    def __init__(
+        self,
+        fetch_page: FetchPage,
+        ttl: float = VEHICLE_CACHE_TTL_SECONDS,
+        max_clients: int = VEHICLE_CACHE_MAX_CLIENTS,
+        page_size: int = CRM_VEHICLE_PAGE_SIZE,
+    ):
+        self.fetch_page = fetch_page
+        self.ttl = ttl
+        self.max_clients = max_clients
+        self.page_size = page_size
+        self._cache: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get_client_vehicles(self, client_id: str) -> List[dict]:
+        """Return the client's vehicles, from memory when a fresh entry exists"""
+        cached = self.peek(client_id)
+        if cached is not None:
+            return cached
+
+        # A caller abandoning its turn must not cancel the fetch other callers share
+        return await asyncio.shield(self._fetch(client_id))
+
+    def prefetch(self, client_id: str) -> bool:
+        """Start fetching the client's vehicles without waiting; False if cached or already in flight"""
+        if client_id in self._inflight or self.peek(client_id) is not None:
+            return False
+        self._fetch(client_id)
+        return True
+
+    def _fetch(self, client_id: str) -> asyncio.Task:
+        task = self._inflight.get(client_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(client_id))
+            self._inflight[client_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(client_id, None))
+            # A prefetch nobody awaits must not log "exception never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _load(self, client_id: str) -> List[dict]:
+        vehicles, complete = await self._fetch_all_pages(client_id)
+        if complete:
+            self._store(client_id, vehicles)
+        return vehicles
+
+    def peek(self, client_id: str) -> Optional[List[dict]]:
+        """Cached vehicles for the client, or None if absent or expired"""
+        entry = self._cache.get(client_id)
+        if entry is None:
+            return None
+
+        expires_at, vehicles = entry
+        if expires_at < time.monotonic():
+            del self._cache[client_id]
+            return None
+
+        self._cache.move_to_end(client_id)
+        return vehicles
+
+    def invalidate(self, client_id: Optional[str] = None):
+        """Drop one client's cached vehicles, or the whole cache when no id is given"""
+        if client_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(client_id, None)
+
+    def _store(self, client_id: str, vehicles: List[dict]):
+        self._cache[client_id] = (time.monotonic() + self.ttl, vehicles)
+        self._cache.move_to_end(client_id)
+        while len(self._cache) > self.max_clients:
+            self._cache.popitem(last=False)
+
+    async def _fetch_all_pages(self, client_id: str) -> Tuple[List[dict], bool]:
+        """Walk the client's pages; the flag is False if the page cap cut the walk. Page failures propagate"""
+        vehicles: List[dict] = []
+        seen_ids = set()
+
+        for page in range(1, VEHICLE_MAX_PAGES + 1):
+            batch, total_pages = await self.fetch_page(client_id, page, self.page_size)
+            new_vehicles = [v for v in batch if v.get("_id") not in seen_ids]
+            seen_ids.update(v.get("_id") for v in new_vehicles)
+            # Filter again locally in case the CRM ignored the clientId parameter
+            vehicles.extend(v for v in new_vehicles if vehicle_client_id(v) == client_id)
+
+            if not new_vehicles or len(batch) < self.page_size:
+                break
+            if total_pages is not None and page >= total_pages:
+                break
+        else:
+            # Still more pages at the cap: usable for this turn, but not cached as the full list
+            logger.warning("Vehicle list for client %s truncated at %d pages", client_id, VEHICLE_MAX_PAGES)
+            return vehicles, False
+
+        return vehicles, True
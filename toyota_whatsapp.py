@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from toyota_http import WHATSAPP_MESSAGES_PATH, whatsapp_client
+
+logger = logging.getLogger("toyota-whatsapp")
+
+# Concurrent deliveries per job process (one call)
+WHATSAPP_SENDERS = int(os.getenv("WHATSAPP_SENDERS", "4"))
+# Graph API throughput limit of the business number (Cloud API default is 80/s)
+WHATSAPP_ACCOUNT_MESSAGES_PER_SECOND = float(os.getenv("WHATSAPP_ACCOUNT_MESSAGES_PER_SECOND", "80"))
+# Calls one worker runs at once (same setting as toyota_capacity)
+_CALLS_PER_WORKER = int(os.getenv("TOYOTA_MAX_CONCURRENT_CALLS", "8"))
+# Per-call send rate. Each call is its own process with its own dispatcher, so
+# the account limit is split between the calls a worker can run; with several
+# workers on one number, lower it further (account rate / total concurrent calls)
+WHATSAPP_MESSAGES_PER_SECOND = float(
+    os.getenv("WHATSAPP_MESSAGES_PER_SECOND", str(WHATSAPP_ACCOUNT_MESSAGES_PER_SECOND / _CALLS_PER_WORKER))
+)
+WHATSAPP_MAX_ATTEMPTS = int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "4"))
+WHATSAPP_BACKOFF_SECONDS = 0.5
+WHATSAPP_MAX_BACKOFF_SECONDS = 8.0
+# Longest a call's shutdown waits for its queued messages to go out
+WHATSAPP_DRAIN_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_DRAIN_TIMEOUT_SECONDS", "10"))
+WHATSAPP_QUEUE_SIZE = 1000
+# Messages of one batch (a fleet's vehicle images) in the queue at once, so a
+# large batch goes out concurrently without taking every sender from other calls
+WHATSAPP_BATCH_CONCURRENCY = int(os.getenv("WHATSAPP_BATCH_CONCURRENCY", "3"))
+
+# Graph API error codes worth retrying: throttling and temporary unavailability
+# (4, 80007, 130429: rate limits; 131056: too many messages to one recipient;
+# 131000/131016: internal error / service unavailable)
+RETRYABLE_ERROR_CODES = {4, 80007, 130429, 131000, 131016, 131056}
+
+QUEUED = "queued"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+
+@dataclass
+class OutboundMessage:
+    payload: dict
+    label: str
+    on_status: Optional[Callable[["OutboundMessage"], None]] = None
+    # Sent instead if payload is rejected outright (e.g. a stale media id);
+    # on_fallback is told when that happens
+    fallback: Optional[dict] = None
+    on_fallback: Optional[Callable[[], None]] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = QUEUED
+    attempts: int = 0
+    wamid: Optional[str] = None
+    error: Optional[str] = None
+    queued_at: float = field(default_factory=time.monotonic)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    async def wait(self, timeout: Optional[float] = None) -> str:
+        """Final status, or "queued" if it is still pending after timeout"""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.status
+
+
+@dataclass
+class OutboundBatch:
+    """
+    Related messages sent concurrently and reported once, in their original
+    order. Finishes "delivered" only if every message was delivered.
+    """
+
+    label: str
+    messages: List[OutboundMessage]
+    on_status: Optional[Callable[["OutboundBatch"], None]] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = QUEUED
+    error: Optional[str] = None
+    submitted: int = 0
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    async def wait(self, timeout: Optional[float] = None) -> str:
+        """Final status, or "queued" if it is still pending after timeout"""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.status
+
+
+class _TokenBucket:
+    """Spaces sends to at most rate per second, allowing short bursts"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Unconfirmed(Exception):
+    """The request may have reached WhatsApp, so sending it again could deliver it twice"""
+
+
+class _Retryable(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WhatsAppDispatcher:
+    """
+    Per-process outbound queue for WhatsApp Graph API messages.
+
+    Tools enqueue and return immediately; sender tasks deliver in the
+    background under the process's rate limit, retrying throttling, 5xx and
+    connection failures with exponential backoff (honouring Retry-After).
+    A request that may have gone out (read timeout, dropped connection) is
+    never sent again, so the caller never gets a message twice. Each
+    message's final status is reported through its on_status callback.
+    """
+
+    def __init__(
+        self,
+        senders: int = WHATSAPP_SENDERS,
+        rate_per_second: float = WHATSAPP_MESSAGES_PER_SECOND,
+        max_attempts: int = WHATSAPP_MAX_ATTEMPTS,
+        queue_size: int = WHATSAPP_QUEUE_SIZE,
+    ):
+        self.senders = senders
+        self.rate_per_second = rate_per_second
+        self.max_attempts = max_attempts
+        self.queue_size = queue_size
+        self.delivered = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._bucket: Optional[_TokenBucket] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Dict[str, Union[OutboundMessage, OutboundBatch]] = {}
+
+    def start(self):
+        """Start the sender tasks on the running loop (done lazily on first enqueue)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._bucket = _TokenBucket(self.rate_per_second)
+        self._tasks = [
+            asyncio.create_task(self._sender(), name=f"whatsapp-sender-{index}")
+            for index in range(self.senders)
+        ]
+
+    def enqueue(
+        self,
+        payload: dict,
+        label: str,
+        on_status: Optional[Callable[[OutboundMessage], None]] = None,
+        fallback: Optional[dict] = None,
+        on_fallback: Optional[Callable[[], None]] = None,
+    ) -> OutboundMessage:
+        """Queue one Graph API message; raises asyncio.QueueFull when saturated"""
+        self.start()
+        message = OutboundMessage(
+            payload=payload,
+            label=label,
+            on_status=on_status,
+            fallback=fallback,
+            on_fallback=on_fallback,
+        )
+        self._queue.put_nowait(message)
+        self._in_flight[message.id] = message
+        return message
+
+    def enqueue_batch(
+        self,
+        items: List[Tuple[dict, str]],
+        label: str,
+        on_status: Optional[Callable[[OutboundBatch], None]] = None,
+        concurrency: int = WHATSAPP_BATCH_CONCURRENCY,
+    ) -> OutboundBatch:
+        """
+        Queue (payload, label) messages as one batch with at most concurrency
+        of them in the queue at a time; on_status receives the batch once all
+        are settled. Raises asyncio.QueueFull if not even the first fits.
+        """
+        self.start()
+        batch = OutboundBatch(label=label, messages=[], on_status=on_status)
+        batch.messages = [
+            OutboundMessage(payload=payload, label=item_label, on_status=partial(self._advance, batch))
+            for payload, item_label in items
+        ]
+        if not batch.messages:
+            self._finish_batch(batch)
+            return batch
+        if self._queue.full():
+            raise asyncio.QueueFull
+        self._in_flight[batch.id] = batch
+        # A message that does not fit fails at once and submits the next
+        # one itself, so count what has been submitted rather than iterations
+        while batch.submitted < min(max(concurrency, 1), len(batch.messages)):
+            self._submit(batch)
+        return batch
+
+    def pending(self, on_status: Optional[Callable] = None) -> List[Union[OutboundMessage, OutboundBatch]]:
+        """Messages and batches not yet settled, optionally only those reporting to on_status"""
+        return [
+            message
+            for message in self._in_flight.values()
+            if on_status is None or message.on_status == on_status
+        ]
+
+    def _submit(self, batch: OutboundBatch):
+        """Queue the batch's next message"""
+        if batch.submitted >= len(batch.messages):
+            return
+        message = batch.messages[batch.submitted]
+        batch.submitted += 1
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._finish(message, FAILED, error="queue full")
+            return
+        self._in_flight[message.id] = message
+
+    def _advance(self, batch: OutboundBatch, message: OutboundMessage):
+        """A batch message settled: queue the next one, or finish the batch"""
+        if batch.submitted < len(batch.messages):
+            self._submit(batch)
+        elif all(m.done.is_set() for m in batch.messages):
+            self._finish_batch(batch)
+
+    def _finish_batch(self, batch: OutboundBatch):
+        failed = [m for m in batch.messages if m.status != DELIVERED]
+        batch.status = FAILED if failed else DELIVERED
+        if failed:
+            batch.error = f"{len(failed)} of {len(batch.messages)} failed: " + "; ".join(
+                f"{m.label} ({m.error})" for m in failed
+            )
+        batch.done.set()
+        self._in_flight.pop(batch.id, None)
+        if batch.on_status:
+            try:
+                batch.on_status(batch)
+            except Exception as e:
+                logger.error("WhatsApp status callback failed: %s", e)
+
+    async def aclose(self, timeout: float = WHATSAPP_DRAIN_TIMEOUT_SECONDS):
+        """Give every queued message up to timeout to go out, then stop the senders (worker shutdown)"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("WhatsApp queue closed with %s messages undelivered", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _sender(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as e:  # never let one message kill a sender
+                self._finish(message, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: OutboundMessage):
+        while True:
+            message.attempts += 1
+            await self._bucket.acquire()
+            try:
+                message.wamid = await self._post(message.payload)
+                self._finish(message, DELIVERED)
+                return
+            except _Retryable as e:
+                if message.attempts >= self.max_attempts:
+                    self._finish(message, FAILED, error=str(e))
+                    return
+                backoff = min(
+                    WHATSAPP_MAX_BACKOFF_SECONDS,
+                    WHATSAPP_BACKOFF_SECONDS * 2 ** (message.attempts - 1),
+                )
+                delay = max(e.retry_after or 0.0, backoff * random.uniform(0.5, 1.0))
+                logger.info("WhatsApp %s attempt %s failed (%s); retrying in %.1fs", message.label, message.attempts, e, delay)
+                await asyncio.sleep(delay)
+            except _Unconfirmed as e:
+                self._finish(message, FAILED, error=str(e))
+                return
+            except Exception as e:
+                if message.fallback is None:
+                    self._finish(message, FAILED, error=str(e))
+                    return
+                logger.info("WhatsApp %s rejected (%s); sending fallback", message.label, e)
+                message.payload, message.fallback = message.fallback, None
+                if message.on_fallback:
+                    message.on_fallback()
+
+    async def _post(self, payload: dict) -> Optional[str]:
+        """Send one message; returns its wamid, raises _Retryable for transient failures"""
+        try:
+            response = await whatsapp_client().post(WHATSAPP_MESSAGES_PATH, json=payload)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            # Nothing was sent, so trying again cannot duplicate the message
+            raise _Retryable(f"connection failed: {e!r}")
+        except httpx.TransportError as e:  # read timeouts, resets after the request went out
+            raise _Unconfirmed(f"no response, delivery unknown: {e!r}")
+
+        if response.status_code == 200:
+            messages = response.json().get("messages") or [{}]
+            return messages[0].get("id")
+
+        try:
+            error = response.json().get("error", {})
+        except ValueError:
+            error = {}
+        detail = f"HTTP {response.status_code}: {error.get('message') or response.text[:200]}"
+        retry_after = response.headers.get("Retry-After")
+        if (
+            response.status_code == 429
+            or response.status_code >= 500
+            or error.get("code") in RETRYABLE_ERROR_CODES
+        ):
+            raise _Retryable(detail, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise RuntimeError(detail)
+
+    def _finish(self, message: OutboundMessage, status: str, error: Optional[str] = None):
+        message.status = status
+        message.error = error
+        message.done.set()
+        self._in_flight.pop(message.id, None)
+        if status == DELIVERED:
+            self.delivered += 1
+        else:
+            self.failed += 1
+            logger.warning("WhatsApp %s failed after %s attempt(s): %s", message.label, message.attempts, error)
+        if message.on_status:
+            try:
+                message.on_status(message)
+            except Exception as e:
+                logger.error("WhatsApp status callback failed: %s", e)
+
+
+# One queue per process; LiveKit runs one call per job process, so the rate limit is per call
+whatsapp_dispatcher = WhatsAppDispatcher()